@@ -0,0 +1,202 @@
+"""离线端到端基准：在子进程中启动 mock_server，驱动 batch_fetch、crawl_sina_us_stock 与 get_valid_proxy。
+
+用法（在仓库根目录）::
+
+    uv run python -m benchmarks.bench_crawl --urls 2000 --latency-ms 50 --not-found 0.2
+    uv run python -m benchmarks.bench_crawl --proxy --teapot 0.02 --json bench.json
+
+数据库写入 movies.db 的临时副本（--db 指定来源，不存在时使用空库），不会修改原文件。
+每个场景报告吞吐、p50/p99 延迟（取自 crawler.metrics 直方图的估计值）、CPU 时间与
+进程峰值 RSS；模拟服务器运行在独立进程中，不计入本进程的 CPU 与内存。
+"""
+import argparse
+import asyncio
+import json
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+from benchmarks.mock_server import add_config_arguments
+from crawler import db
+from crawler.crawler import batch_fetch
+from crawler.http_client import close_clients
+from crawler.log import setup_logging
+from crawler.metrics import (
+    FETCH_OUTCOMES,
+    PROXY_ACQUIRE_SECONDS,
+    REGISTRY,
+    REQUEST_ERRORS,
+    REQUEST_LATENCY,
+    RESPONSES,
+    RETRIES,
+)
+from crawler.proxy_pool import close_proxy_pool, configure_proxy_pool, get_proxy_pool, get_valid_proxy
+from crawler.rate_limit import RateLimiter
+from crawler.sina_us_stock import crawl_sina_us_stock
+
+MOCK_FLAGS = ("latency_ms", "jitter_ms", "not_found", "forbidden", "teapot", "sec_redirect",
+              "flaky", "flaky_ban", "bad_proxies", "sina_stocks", "proxies", "seed")
+
+
+@contextmanager
+def measure(report: dict[str, Any]) -> Iterator[None]:
+    """记录墙钟时间、CPU 时间（用户态+内核态）与结束时的峰值 RSS。"""
+    REGISTRY.reset()
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    report["seconds"] = round(elapsed, 3)
+    report["cpu_seconds"] = round(cpu, 3)
+    report["cpu_percent"] = round(100 * cpu / elapsed, 1) if elapsed else 0.0
+    # Linux 上 ru_maxrss 的单位为 KiB
+    report["peak_rss_mib"] = round(after.ru_maxrss / 1024, 1)
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+async def start_mock(args: argparse.Namespace) -> tuple[asyncio.subprocess.Process, str]:
+    command = [sys.executable, "-m", "benchmarks.mock_server", "--port", "0"]
+    for name in MOCK_FLAGS:
+        command += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE)
+    assert process.stdout is not None
+    line = (await process.stdout.readline()).decode().strip()
+    if not line.startswith("listening on "):
+        process.kill()
+        raise RuntimeError(f"模拟服务器启动失败: {line!r}")
+    return process, line.removeprefix("listening on ")
+
+
+async def bench_batch_fetch(args: argparse.Namespace, base_url: str) -> dict[str, Any]:
+    limiter = RateLimiter({
+        "default": {
+            "rate": args.rate, "burst": args.rate, "min_rate": 1.0, "max_rate": args.rate,
+            "min_concurrency": 1, "max_concurrency": args.concurrency,
+            "initial_concurrency": args.concurrency,
+        },
+    })
+    urls = [f"{base_url}/subject/{subject_id}/" for subject_id in range(args.start_id, args.start_id + args.urls)]
+    report: dict[str, Any] = {"urls": len(urls)}
+    with measure(report):
+        results = await batch_fetch(urls, use_proxy=args.proxy, max_retries=args.max_retries,
+                                    workers=args.workers, limiter=limiter)
+    report["urls_per_second"] = round(len(urls) / report["seconds"], 1)
+    report["parsed"] = sum(1 for movie in results if movie)
+    report["outcomes"] = {
+        outcome: int(FETCH_OUTCOMES.value(outcome=outcome))
+        for outcome in ("done", "unchanged", "not_found", "failed")
+    }
+    # 实际发出的请求数（含重试），与 urls 之差即重试带来的额外请求
+    report["requests"] = int(sum(value for *_, value in (*RESPONSES.samples(), *REQUEST_ERRORS.samples())))
+    report["retries"] = {labels["error"]: int(value) for _, labels, value in RETRIES.samples()}
+    report["p50_ms"] = _ms(REQUEST_LATENCY.quantile(0.5))
+    report["p99_ms"] = _ms(REQUEST_LATENCY.quantile(0.99))
+    return report
+
+
+async def bench_sina(args: argparse.Namespace, base_url: str) -> dict[str, Any]:
+    url = f"{base_url}/usstock/ustotal.php"
+    durations = []
+    report: dict[str, Any] = {"runs": args.sina_runs}
+    with measure(report):
+        for _ in range(args.sina_runs):
+            start = time.perf_counter()
+            result = await crawl_sina_us_stock(url, use_proxy=args.proxy)
+            durations.append(time.perf_counter() - start)
+    report["stocks"] = result.get("data_count", 0)
+    report["last_save"] = result.get("save_result")
+    report["p50_ms"] = _ms(statistics.median(durations))
+    report["max_ms"] = _ms(max(durations))
+    return report
+
+
+async def bench_proxy(args: argparse.Namespace) -> dict[str, Any]:
+    report: dict[str, Any] = {"acquisitions": args.proxy_acquisitions}
+    with measure(report):
+        start = time.perf_counter()
+        first = await get_valid_proxy()
+        report["cold_ms"] = _ms(time.perf_counter() - start)
+        got = sum([first is not None] + [
+            await get_valid_proxy() is not None for _ in range(args.proxy_acquisitions - 1)
+        ])
+    report["acquired"] = got
+    report["p50_ms"] = _ms(PROXY_ACQUIRE_SECONDS.quantile(0.5))
+    report["p99_ms"] = _ms(PROXY_ACQUIRE_SECONDS.quantile(0.99))
+    report["pool"] = get_proxy_pool().stats()
+    return report
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    process, base_url = await start_mock(args)
+    workdir = Path(tempfile.mkdtemp(prefix="bench-crawl-"))
+    try:
+        db_path = workdir / "movies.db"
+        if args.db.exists():
+            shutil.copy(args.db, db_path)
+        await db.configure_database(f"sqlite+aiosqlite:///{db_path}")
+        await db.init_db()
+        configure_proxy_pool(api_url=f"{base_url}/get/", test_url=f"{base_url}/",
+                             min_size=args.proxies, max_size=args.proxies)
+
+        reports: dict[str, Any] = {"mock": {name: getattr(args, name) for name in MOCK_FLAGS}}
+        if args.proxy:
+            reports["get_valid_proxy"] = await bench_proxy(args)
+        reports["batch_fetch"] = await bench_batch_fetch(args, base_url)
+        reports["crawl_sina_us_stock"] = await bench_sina(args, base_url)
+        return reports
+    finally:
+        await close_clients()
+        await close_proxy_pool()
+        await db.engine.dispose()
+        process.terminate()
+        await process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_report(reports: dict[str, Any]) -> None:
+    for name, report in reports.items():
+        if name == "mock":
+            continue
+        print(f"== {name}")
+        for key, value in report.items():
+            print(f"  {key:>16}: {value}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline crawler benchmark against a local mock server")
+    parser.add_argument("--urls", type=int, default=1000, help="Number of subject URLs for batch_fetch")
+    parser.add_argument("--start-id", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=50, help="stream_fetch worker count")
+    parser.add_argument("--concurrency", type=int, default=50, help="Per-host concurrency limit")
+    parser.add_argument("--rate", type=float, default=1000.0, help="Per-host token bucket rate (req/s)")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--proxy", action="store_true", help="Route requests through the mock proxy pool")
+    parser.add_argument("--proxy-acquisitions", type=int, default=1000)
+    parser.add_argument("--sina-runs", type=int, default=5)
+    parser.add_argument("--db", type=Path, default=Path("movies.db"), help="Database copied before the run")
+    parser.add_argument("--json", type=Path, help="Also write the report as JSON")
+    parser.add_argument("--log-level", default="WARNING")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    reports = asyncio.run(run(args))
+    print_report(reports)
+    if args.json:
+        args.json.write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
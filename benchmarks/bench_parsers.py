@@ -0,0 +1,116 @@
+"""比较各详情页解析后端的吞吐与输出一致性。
+
+用法（在仓库根目录）::
+
+    uv run python -m benchmarks.bench_parsers --corpus pages/   # 目录下为 <subject_id>.html
+    uv run python -m benchmarks.bench_parsers --synthetic 200   # 无语料时生成模拟页面
+
+以 bs4 后端的输出为基准，报告每个后端的 pages/s 以及与基准不一致的页面数。
+"""
+import argparse
+import html
+import random
+import sys
+import time
+from pathlib import Path
+
+from crawler.parsers import BACKENDS, available_backends, parse_movie
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN" class="ua-windows ua-webkit">
+<head><meta http-equiv="Content-Type" content="text/html; charset=utf-8">
+<title>{title} (豆瓣)</title>
+<script type="application/ld+json">{{"name": "{title}"}}</script>
+</head>
+<body>
+<div id="wrapper">
+<div id="content">
+<h1>
+  <span property="v:itemreviewed">{title}</span>
+  <span class="year">({year})</span>
+</h1>
+<div class="grid-16-8 clearfix">
+<div class="article">
+<div id="info">
+  <span><span class='pl'>导演</span>: <span class='attrs'><a href="/celebrity/{director_id}/" rel="v:directedBy">{director}</a></span></span><br/>
+  <span class="actor"><span class='pl'>主演</span>: <span class='attrs'>{actors}</span></span><br/>
+</div>
+<div id="interest_sectl">
+  <div class="rating_wrap clearbox" rel="v:rating">
+    <strong class="ll rating_num" property="v:average">{rating}</strong>
+  </div>
+</div>
+<div class="related-info">{filler}</div>
+</div></div></div></div>
+</body></html>
+"""
+
+
+def synthetic_pages(count: int, seed: int = 0) -> list[tuple[str, str]]:
+    rng = random.Random(seed)
+    pages = []
+    for i in range(count):
+        subject_id = 1291543 + i
+        actors = " / ".join(
+            f'<a href="/celebrity/{rng.randint(1000000, 1400000)}/" rel="v:starring">演员{j}</a>'
+            for j in range(rng.randint(5, 30))
+        )
+        filler = "".join(
+            f'<p class="review">{html.escape("短评 & 剧情简介 " * rng.randint(5, 20))}</p>'
+            for _ in range(rng.randint(50, 300))
+        )
+        rating = "" if i % 17 == 0 else f"{rng.uniform(2, 9.8):.1f}"
+        page = PAGE_TEMPLATE.format(
+            title=html.escape(f"电影 {i} &amp; Movie"),
+            year=rng.randint(1950, 2026),
+            director_id=rng.randint(1000000, 1400000),
+            director=html.escape(f"导演{i}"),
+            actors=actors,
+            rating=rating,
+            filler=filler,
+        )
+        pages.append((f"https://movie.douban.com/subject/{subject_id}/", page))
+    return pages
+
+
+def load_corpus(directory: Path) -> list[tuple[str, str]]:
+    pages = []
+    for path in sorted(directory.glob("*.html")):
+        url = f"https://movie.douban.com/subject/{path.stem}/"
+        pages.append((url, path.read_text(encoding="utf-8", errors="replace")))
+    return pages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Douban subject page parsers")
+    parser.add_argument("--corpus", type=Path, help="Directory of saved <subject_id>.html pages")
+    parser.add_argument("--synthetic", type=int, default=200, help="Number of synthetic pages when no corpus is given")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per backend")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_pages(args.synthetic)
+    if not pages:
+        print("[ERROR] 语料为空")
+        return 1
+    total_bytes = sum(len(text.encode()) for _, text in pages)
+    print(f"[INFO] {len(pages)} 个页面, 平均 {total_bytes / len(pages) / 1024:.1f} KiB")
+
+    baseline = [parse_movie(text, url, backend="bs4") for url, text in pages]
+    mismatched_any = False
+    for name in list(BACKENDS) + ["auto"]:
+        if name != "auto" and name not in available_backends():
+            print(f"{name:>10}: 未安装，跳过")
+            continue
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            outputs = [parse_movie(text, url, backend=name) for url, text in pages]
+        elapsed = time.perf_counter() - start
+        mismatches = sum(1 for got, want in zip(outputs, baseline) if got != want)
+        mismatched_any |= mismatches > 0
+        rate = len(pages) * args.repeat / elapsed
+        print(f"{name:>10}: {rate:9.1f} pages/s  一致 {len(pages) - mismatches}/{len(pages)}")
+    return 1 if mismatched_any else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""比较新浪美股页面的两种解析方式：BeautifulSoup + parse_sina_us_stock_data 与单遍的 parse_sina_us_stock_text。
+
+用法（在仓库根目录）::
+
+    uv run python -m benchmarks.bench_sina_parser                     # 模拟的完整列表页
+    uv run python -m benchmarks.bench_sina_parser --page ustotal.html  # 保存的真实页面
+
+先做一致性检查：基准页面上两者的输出必须完全相同，否则退出码为 1。
+随后分别报告两种方式在基准页面上的耗时与 pages/s。
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+from bs4 import BeautifulSoup
+
+from benchmarks.mock_server import MockConfig, sina_page
+from crawler.sina_us_stock import parse_sina_us_stock_data, parse_sina_us_stock_text
+
+def parse_with_bs4(text: str) -> list[dict[str, str]]:
+    return parse_sina_us_stock_data(BeautifulSoup(text, "html.parser"))
+
+
+def check_parity(pages: list[str]) -> int:
+    mismatches = 0
+    for index, text in enumerate(pages):
+        want, got = parse_with_bs4(text), parse_sina_us_stock_text(text)
+        if got != want:
+            mismatches += 1
+            if mismatches <= 3:
+                print(f"[ERROR] 第 {index} 个页面输出不一致\n  页面: {text[:300]!r}\n  bs4: {want}\n  单遍: {got}")
+    return mismatches
+
+
+def bench(fn: Callable[[str], list[dict[str, str]]], text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark and parity-check the Sina US stock listing parsers")
+    parser.add_argument("--page", type=Path, action="append", help="Saved ustotal.php page (repeatable)")
+    parser.add_argument("--stocks", type=int, default=6000, help="Stocks on the synthetic listing page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=10, help="Parses per page and parser")
+    args = parser.parse_args()
+
+    if args.page:
+        pages = [path.read_text(encoding="utf-8", errors="replace") for path in args.page]
+    else:
+        pages = [sina_page(MockConfig(sina_stocks=args.stocks, seed=args.seed))]
+
+    mismatches = check_parity(pages)
+    print(f"[INFO] 一致性: 基准页面 {len(pages) - mismatches}/{len(pages)}")
+
+    for text in pages:
+        stocks = len(parse_sina_us_stock_text(text))
+        print(f"[INFO] 页面 {len(text.encode()) / 1024:.0f} KiB, {stocks} 条股票")
+        before = bench(parse_with_bs4, text, args.repeat)
+        after = bench(parse_sina_us_stock_text, text, args.repeat)
+        print(f"{'bs4':>10}: {before * 1000:8.1f} ms  {1 / before:7.1f} pages/s")
+        print(f"{'single':>10}: {after * 1000:8.1f} ms  {1 / after:7.1f} pages/s  ({before / after:.1f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""比较 SQLite 存储配置（PRAGMA + 索引）对写入速率与查询延迟的影响。
+
+用法（在仓库根目录）::
+
+    uv run python -m benchmarks.bench_sqlite --rows 100000
+
+before 为 SQLite 默认 PRAGMA 且没有 update_at/year/rating 索引（即旧数据库），
+after 为 config.SQLITE_PROFILE 与当前模型上的全部索引。每种配置使用一个新的临时
+数据库，依次测量批量写入（add_movies）、逐条提交（add_movie）以及刷新/导出常用查询。
+"""
+import argparse
+import asyncio
+import datetime
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import func, select
+
+from crawler import db
+from crawler.config import SQLITE_PROFILE
+from crawler.db import Movie, add_movie, add_movies, iter_stale_movies
+
+NEW_INDEXES = ("ix_movies_update_at_id", "ix_movies_year", "ix_movies_rating", "ix_sina_us_stocks_update_at")
+
+
+def movie_rows(start: int, count: int) -> list[dict[str, Any]]:
+    rng = random.Random(start)
+    return [
+        {
+            "id": subject_id,
+            "title": f"电影 {subject_id}",
+            "year": str(rng.randint(1950, 2026)),
+            "director": f"导演{subject_id % 997}",
+            "rating": None if subject_id % 17 == 0 else round(rng.uniform(2, 9.8), 1),
+            "url": f"https://movie.douban.com/subject/{subject_id}/",
+        }
+        for subject_id in range(start, start + count)
+    ]
+
+
+def spread_update_at(path: Path, seed: int = 0) -> None:
+    """把 update_at 打散到过去一年多，模拟长期运行后的数据分布（不计时）。"""
+    rng = random.Random(seed)
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    conn = sqlite3.connect(path)
+    ids = [row[0] for row in conn.execute("SELECT id FROM movies")]
+    conn.executemany(
+        "UPDATE movies SET update_at = ? WHERE id = ?",
+        [((now - datetime.timedelta(days=rng.uniform(0, 400))).isoformat(sep=" "), i) for i in ids],
+    )
+    conn.commit()
+    conn.close()
+
+
+async def timed_median(fn: Callable[[], Awaitable[Any]], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def run_profile(profile: str, indexed: bool, args: argparse.Namespace) -> dict[str, float]:
+    workdir = Path(tempfile.mkdtemp(prefix="bench-sqlite-"))
+    path = workdir / "movies.db"
+    await db.configure_database(f"sqlite+aiosqlite:///{path}", profile)
+    await db.init_db()
+    if not indexed:
+        async with db.engine.begin() as conn:
+            for index in NEW_INDEXES:
+                await conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index}")
+
+    report: dict[str, float] = {}
+    start = time.perf_counter()
+    for offset in range(0, args.rows, args.batch):
+        await add_movies(movie_rows(1_000_000 + offset, min(args.batch, args.rows - offset)))
+    report["batch insert rows/s"] = args.rows / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for row in movie_rows(50_000_000, args.single):
+        await add_movie(row)
+    report["single-commit rows/s"] = args.single / (time.perf_counter() - start)
+
+    await db.engine.dispose()
+    spread_update_at(path)
+    async with db.engine.begin() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    stale_before = now - datetime.timedelta(days=30)
+    recent_before = now - datetime.timedelta(days=7)
+
+    async def refresh_first_page() -> None:
+        async for _ in iter_stale_movies(stale_before, recent_before, str(now.year - 2), 500):
+            break
+
+    async def run_query(query: Any) -> None:
+        async with db.AsyncSessionLocal() as session:
+            (await session.execute(query)).all()
+
+    queries: dict[str, Callable[[], Awaitable[Any]]] = {
+        "refresh first page ms": refresh_first_page,
+        "year = 2001 count ms": lambda: run_query(select(func.count()).select_from(Movie).where(Movie.year == "2001")),
+        "top 50 by rating ms": lambda: run_query(select(Movie.id).order_by(Movie.rating.desc()).limit(50)),
+        "export since watermark ms": lambda: run_query(
+            select(Movie).where(Movie.update_at > now - datetime.timedelta(days=3))
+            .order_by(Movie.update_at, Movie.id).limit(1000)
+        ),
+    }
+    for label, fn in queries.items():
+        report[label] = await timed_median(fn, args.repeat) * 1000
+    await db.engine.dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict[str, float]]:
+    return {
+        "before": await run_profile("default", False, args),
+        "after": await run_profile(SQLITE_PROFILE, True, args),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark SQLite storage profiles")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows inserted through add_movies")
+    parser.add_argument("--batch", type=int, default=200, help="add_movies batch size (WRITE_BATCH_SIZE)")
+    parser.add_argument("--single", type=int, default=1000, help="Rows inserted one commit at a time")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per query (median reported)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'':>28} {'before':>12} {'after':>12}")
+    for label in results["before"]:
+        before, after = results["before"][label], results["after"][label]
+        print(f"{label:>28} {before:12.1f} {after:12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""测量 CLI 启动耗时：各模式的子进程墙钟时间、-X importtime 按顶层包汇总的导入耗时，以及 User-Agent 生成开销。
+
+用法（在仓库根目录）::
+
+    uv run python -m benchmarks.bench_startup
+    uv run python -m benchmarks.bench_startup --runs 20 --ua-calls 2000
+
+每个场景在一个新的临时目录中运行 main.py（movies.db、导出文件等都写在那里），
+新浪模式请求一个不可达的本地端口，因此只测量启动、建表与退出，不受网络影响。
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+SCENARIOS: dict[str, list[str]] = {
+    "--help": ["--help"],
+    "--sina-us-stock": ["--sina-us-stock", "--sina-url", "http://127.0.0.1:9/ustotal.php", "--log-level", "ERROR"],
+    "--export": ["--export", "sina_us_stocks", "--export-dir", "exports", "--log-level", "ERROR"],
+    "--plan": ["--plan", "--start-id", "1", "--count", "0", "--coordinator", "sqlite:///coordinator.db",
+               "--log-level", "ERROR"],
+}
+HEAVY_PACKAGES = ("sqlalchemy", "aiosqlite", "httpx", "h2", "aiohttp", "bs4", "fake_useragent", "crawler")
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def run_once(args: list[str], workdir: Path, *flags: str) -> tuple[float, str]:
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, *flags, str(MAIN), *args], cwd=workdir, capture_output=True, text=True)
+    return time.perf_counter() - start, proc.stderr
+
+
+def import_breakdown(stderr: str) -> Counter[str]:
+    """按顶层包汇总各模块自身的导入耗时（微秒）。"""
+    totals: Counter[str] = Counter()
+    for match in _IMPORTTIME_RE.finditer(stderr):
+        totals[match.group(4).split(".")[0]] += int(match.group(1))
+    return totals
+
+
+def bench_scenarios(runs: int) -> None:
+    print(f"{'scenario':>16} {'median ms':>10} {'min ms':>8} {'imports ms':>11}  heavy packages (self ms)")
+    for label, args in SCENARIOS.items():
+        samples = []
+        with tempfile.TemporaryDirectory(prefix="bench-startup-") as tmp:
+            # 第一次运行建库，不计时
+            run_once(args, Path(tmp))
+            for _ in range(runs):
+                samples.append(run_once(args, Path(tmp))[0])
+            _, stderr = run_once(args, Path(tmp), "-X", "importtime")
+        totals = import_breakdown(stderr)
+        heavy = ", ".join(f"{name} {totals[name] / 1000:.0f}" for name in HEAVY_PACKAGES if totals[name])
+        print(f"{label:>16} {statistics.median(samples) * 1000:10.0f} {min(samples) * 1000:8.0f} "
+              f"{sum(totals.values()) / 1000:11.0f}  {heavy or '-'}")
+
+
+def bench_user_agent(calls: int) -> None:
+    from fake_useragent import UserAgent
+
+    from crawler.user_agent import UserAgentProvider
+
+    browsers = ["Chrome", "Edge", "Firefox", "Safari", "Opera"]
+    start = time.perf_counter()
+    for _ in range(calls):
+        UserAgent(browsers=browsers).random
+    per_request = (time.perf_counter() - start) / calls
+
+    start = time.perf_counter()
+    provider = UserAgentProvider()
+    build = time.perf_counter() - start
+    proxies = [f"10.0.0.{i}:8080" for i in range(20)]
+    start = time.perf_counter()
+    for i in range(calls):
+        provider.get(proxies[i % len(proxies)])
+    cached = (time.perf_counter() - start) / calls
+    print(f"[INFO] User-Agent: 每次请求构造 UserAgent {per_request * 1e6:.0f} us/次, "
+          f"UserAgentProvider 构建一次 {build * 1000:.1f} ms ({len(provider)} 条) 后 {cached * 1e6:.2f} us/次 "
+          f"({per_request / cached:.0f}x)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup time per mode and User-Agent generation")
+    parser.add_argument("--runs", type=int, default=10, help="Timed runs per scenario (median reported)")
+    parser.add_argument("--ua-calls", type=int, default=500, help="User-Agent lookups to time")
+    args = parser.parse_args()
+
+    bench_scenarios(args.runs)
+    bench_user_agent(args.ua_calls)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""本地模拟服务器：代替豆瓣详情页、新浪美股 ustotal.php 与 proxy_pool 的 /get/ 接口。
+
+用法（在仓库根目录）::
+
+    uv run python -m benchmarks.mock_server --port 8000 --latency-ms 50 --not-found 0.2
+
+/get/ 轮流返回服务器额外监听的端口，这些端口同时充当 HTTP 代理：经代理发出的
+绝对路径请求（GET http://host/subject/1/）由同一组路由处理。每个 subject ID 的响应
+类型由 seed 与 ID 决定，同样的参数总能得到同样的结果；--flaky / --flaky-ban 则按请求随机
+返回 503 / 403，模拟重试可能成功的临时故障，--bad-proxies 个代理端口通过校验后对详情页请求直接断开连接。
+"""
+import argparse
+import asyncio
+import html
+import random
+from dataclasses import dataclass
+
+from aiohttp import web
+
+from benchmarks.bench_parsers import PAGE_TEMPLATE
+
+SEC_REDIRECT = "https://sec.douban.com/b?r=https%3A%2F%2Fmovie.douban.com%2F"
+SINA_CATEGORIES = ("科技类知名公司", "金融类知名公司", "制造零售类知名公司", "医药食品类知名公司")
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 20.0  # 每个响应的基础延迟
+    jitter_ms: float = 10.0  # 在基础延迟上叠加的均匀随机延迟
+    not_found: float = 0.1  # 404 比例
+    forbidden: float = 0.0  # 403 比例
+    teapot: float = 0.0  # 418 比例
+    sec_redirect: float = 0.0  # 302 跳转到 sec.douban.com 的比例
+    flaky: float = 0.0  # 每个详情页请求以该概率返回 503（与ID无关）
+    flaky_ban: float = 0.0  # 每个详情页请求以该概率返回 403（与ID无关）
+    bad_proxies: int = 0  # 前N个代理端口对详情页请求直接断开连接（校验地址仍正常返回）
+    sina_stocks: int = 600
+    proxies: int = 5  # /get/ 轮流返回的代理端口数量（均由本服务器监听）
+    seed: int = 0
+
+
+def subject_outcome(config: MockConfig, subject_id: int) -> str:
+    """某个 subject ID 的响应类型：ok / not_found / forbidden / teapot / sec_redirect。"""
+    roll = random.Random(config.seed * 1_000_003 + subject_id).random()
+    for name in ("not_found", "forbidden", "teapot", "sec_redirect"):
+        ratio = getattr(config, name)
+        if roll < ratio:
+            return name
+        roll -= ratio
+    return "ok"
+
+
+def subject_page(config: MockConfig, subject_id: int) -> str:
+    rng = random.Random(config.seed * 7_919 + subject_id)
+    actors = " / ".join(
+        f'<a href="/celebrity/{rng.randint(1000000, 1400000)}/" rel="v:starring">演员{j}</a>'
+        for j in range(rng.randint(5, 20))
+    )
+    filler = "".join(
+        f'<p class="review">{html.escape("短评 & 剧情简介 " * rng.randint(5, 20))}</p>'
+        for _ in range(rng.randint(50, 200))
+    )
+    return PAGE_TEMPLATE.format(
+        title=html.escape(f"电影 {subject_id}"),
+        year=rng.randint(1950, 2026),
+        director_id=rng.randint(1000000, 1400000),
+        director=html.escape(f"导演{subject_id % 997}"),
+        actors=actors,
+        rating="" if subject_id % 17 == 0 else f"{rng.uniform(2, 9.8):.1f}",
+        filler=filler,
+    )
+
+
+def sina_page(config: MockConfig) -> str:
+    """与 ustotal.php 结构相同的页面：第一个 col_div 无 label（中国概念股），其余按类别分组。"""
+    rng = random.Random(config.seed)
+    groups: list[list[str]] = [[] for _ in range(len(SINA_CATEGORIES) + 1)]
+    for i in range(config.sina_stocks):
+        symbol = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randint(2, 4))) + str(i)
+        name = f"公司{i}"
+        title = f"{symbol},Company {i} Inc,{name}"
+        groups[i % len(groups)].append(
+            f'<a href="//stock.finance.sina.com.cn/usstock/quotes/{symbol}.html" '
+            f'title="{title}" target="_blank">{name}({symbol})</a>'
+        )
+    divs = [f'<div class="col_div">{"".join(groups[0])}</div>']
+    for category, links in zip(SINA_CATEGORIES, groups[1:]):
+        divs.append(
+            f'<div class="col_div"><label>{len(links)}家在美上市{category}:</label>{"".join(links)}</div>'
+        )
+    return f"<html><head><meta charset=\"utf-8\"></head><body>{''.join(divs)}</body></html>"
+
+
+class MockServer:
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config
+        self.host = host
+        self.port = port
+        self._runner: web.AppRunner | None = None
+        self._sina = sina_page(config)
+        self.proxy_ports: list[int] = []
+        self._next_proxy = 0
+        self._rng = random.Random(config.seed)
+        self._bad_ports: set[int] = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/", self._index)
+        app.router.add_get("/subject/{subject_id:\\d+}/", self._subject)
+        app.router.add_get("/usstock/ustotal.php", self._sina_total)
+        app.router.add_get("/get/", self._get_proxy)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]
+        # 额外监听的端口充当不同的代理，经代理的请求仍由同一组路由处理
+        for _ in range(self.config.proxies):
+            await web.TCPSite(self._runner, self.host, 0).start()
+        self.proxy_ports = [address[1] for address in self._runner.addresses[1:]]
+        self._bad_ports = set(self.proxy_ports[:self.config.bad_proxies])
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _delay(self) -> None:
+        config = self.config
+        await asyncio.sleep((config.latency_ms + self._rng.uniform(0, config.jitter_ms)) / 1000)
+
+    async def _index(self, request: web.Request) -> web.Response:
+        # 代理校验用的测试地址，始终正常返回
+        return web.Response(text="ok")
+
+    async def _subject(self, request: web.Request) -> web.Response:
+        config = self.config
+        if request.transport is not None and request.transport.get_extra_info("sockname")[1] in self._bad_ports:
+            request.transport.close()
+            raise ConnectionResetError("bad proxy")
+        await self._delay()
+        roll = self._rng.random()
+        if roll < config.flaky:
+            return web.Response(status=503, text="service unavailable")
+        if roll < config.flaky + config.flaky_ban:
+            return web.Response(status=403, text="forbidden")
+        subject_id = int(request.match_info["subject_id"])
+        outcome = subject_outcome(self.config, subject_id)
+        if outcome == "not_found":
+            return web.Response(status=404, text="not found")
+        if outcome == "forbidden":
+            return web.Response(status=403, text="forbidden")
+        if outcome == "teapot":
+            return web.Response(status=418, text="")
+        if outcome == "sec_redirect":
+            return web.Response(status=302, headers={"Location": SEC_REDIRECT})
+        return web.Response(text=subject_page(self.config, subject_id), content_type="text/html")
+
+    async def _sina_total(self, request: web.Request) -> web.Response:
+        await self._delay()
+        return web.Response(text=self._sina, content_type="text/html")
+
+    async def _get_proxy(self, request: web.Request) -> web.Response:
+        if not self.proxy_ports:
+            return web.Response(text="")
+        port = self.proxy_ports[self._next_proxy % len(self.proxy_ports)]
+        self._next_proxy += 1
+        return web.Response(text=f"{self.host}:{port}")
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=MockConfig.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=MockConfig.jitter_ms)
+    parser.add_argument("--not-found", type=float, default=MockConfig.not_found, help="Ratio of 404 pages")
+    parser.add_argument("--forbidden", type=float, default=MockConfig.forbidden, help="Ratio of 403 pages")
+    parser.add_argument("--teapot", type=float, default=MockConfig.teapot, help="Ratio of 418 pages")
+    parser.add_argument("--sec-redirect", type=float, default=MockConfig.sec_redirect,
+                        help="Ratio of 302 redirects to sec.douban.com")
+    parser.add_argument("--flaky", type=float, default=MockConfig.flaky, help="Per-request ratio of transient 503s")
+    parser.add_argument("--flaky-ban", type=float, default=MockConfig.flaky_ban,
+                        help="Per-request ratio of transient 403s")
+    parser.add_argument("--bad-proxies", type=int, default=MockConfig.bad_proxies,
+                        help="Proxy ports that pass validation but drop subject page requests")
+    parser.add_argument("--sina-stocks", type=int, default=MockConfig.sina_stocks)
+    parser.add_argument("--proxies", type=int, default=MockConfig.proxies, help="Number of proxy ports served by /get/")
+    parser.add_argument("--seed", type=int, default=MockConfig.seed)
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        not_found=args.not_found,
+        forbidden=args.forbidden,
+        teapot=args.teapot,
+        sec_redirect=args.sec_redirect,
+        flaky=args.flaky,
+        flaky_ban=args.flaky_ban,
+        bad_proxies=args.bad_proxies,
+        sina_stocks=args.sina_stocks,
+        proxies=args.proxies,
+        seed=args.seed,
+    )
+
+
+async def serve(config: MockConfig, host: str, port: int) -> None:
+    server = MockServer(config, host, port)
+    await server.start()
+    # 第一行输出监听地址，供基准脚本在子进程中启动时读取端口
+    print(f"listening on {server.base_url}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock Douban / Sina / proxy_pool server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="0 picks a free port")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(config_from_args(args), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
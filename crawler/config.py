@@ -1,2 +1,131 @@
 PROXY_POOL_API = "http://127.0.0.1:5010/get/"
-CONCURRENT_TASKS = 10 
\ No newline at end of file
+CONCURRENT_TASKS = 10
+
+# HTTP 连接池：每个代理（或直连）一个长连接客户端，整个批次复用
+HTTP_TIMEOUT = 20
+HTTP2_ENABLED = True
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_KEEPALIVE_EXPIRY = 30.0
+HTTP_MAX_CLIENTS = 32  # 同时保留的代理客户端数量上限，超出后关闭最久未使用的
+
+# 批量写入队列：按条数或时间间隔触发一次批量 INSERT
+WRITE_BATCH_SIZE = 200
+WRITE_FLUSH_INTERVAL = 2.0  # 秒
+WRITE_QUEUE_MAXSIZE = 1000
+
+# 本地代理池：后台预取并校验代理，按健康评分分配
+PROXY_TEST_URL = "https://movie.douban.com/subject/1291543/"
+PROXY_POOL_MIN_SIZE = 5
+PROXY_POOL_MAX_SIZE = 20
+PROXY_VALIDATE_CONCURRENCY = 5
+PROXY_COOLDOWN = 300.0  # 被淘汰代理的冷却时间（秒）
+PROXY_MAX_FAILURES = 3  # 连续失败多少次后淘汰
+PROXY_ACQUIRE_TIMEOUT = 10.0
+PROXY_REVALIDATE_INTERVAL = 60.0  # 空闲代理的重新校验间隔
+
+# 按域名的自适应限速：令牌桶速率 + AIMD 并发上限，未列出的域名使用 default
+RATE_LIMITS = {
+    "default": {
+        "rate": 5.0, "burst": 5, "min_rate": 0.5, "max_rate": 50.0,
+        "min_concurrency": 1, "max_concurrency": 50, "initial_concurrency": CONCURRENT_TASKS,
+    },
+    "movie.douban.com": {
+        "rate": 2.0, "burst": 4, "min_rate": 0.2, "max_rate": 20.0,
+        "min_concurrency": 1, "max_concurrency": 30, "initial_concurrency": CONCURRENT_TASKS,
+    },
+}
+RATE_DECREASE_FACTOR = 0.5  # 遇到封禁/过载时的乘性下降系数
+RATE_BACKOFF_WINDOW = 5.0  # 秒，窗口内最多下调一次
+
+# 详情页解析后端：auto / selectolax / lxml / regex / bs4
+PARSER_BACKEND = "auto"
+
+# 持久化抓取队列（crawl_frontier 表）
+FRONTIER_CHUNK_SIZE = 100  # 每次从队列领取的URL数量
+FRONTIER_MAX_ATTEMPTS = 5  # 超过后标记为最终失败，不再领取
+FRONTIER_RETRY_BASE = 60.0  # 失败后的重新领取间隔（秒），按尝试次数指数增长
+FRONTIER_RETRY_MAX = 3600.0
+
+# 流式抓取的固定worker数量（实际HTTP并发仍由 RATE_LIMITS 自适应控制）
+STREAM_WORKERS = 50
+
+# 条件请求响应缓存（--cache）
+RESPONSE_CACHE_PATH = "./cache/responses.db"
+RESPONSE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# 评分刷新（--refresh）：按 update_at 过期程度挑选电影重新抓取
+REFRESH_STALE_DAYS = 30
+REFRESH_RECENT_STALE_DAYS = 7  # 近年上映或尚无评分的电影变化快，过期更早
+REFRESH_RECENT_YEARS = 2
+REFRESH_RECENT_WEIGHT = 3.0  # 近年/无评分电影的刷新优先级权重
+REFRESH_PAGE_SIZE = 500
+
+# 指标与日志（--metrics-port / --metrics-json / --log-level）
+METRICS_HOST = "127.0.0.1"
+METRICS_SNAPSHOT_INTERVAL = 10.0  # JSON 快照的写入间隔（秒）
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+# 分布式抓取（--plan / --worker / --merge-shards）：worker 从协调器租用 subject ID 区间
+COORDINATOR_URL = "sqlite:///./coordinator.db"  # 或 redis://127.0.0.1:6379/0
+COORDINATOR_SHARD_SIZE = 10000  # 规划时每个区间的ID数量
+COORDINATOR_BATCH_SIZE = 200  # worker 每批抓取的ID数量，批与批之间上报进度
+COORDINATOR_LEASE_TTL = 120.0  # 秒，租约超时未续期即可被其他 worker 接管
+COORDINATOR_MIN_SPLIT = 1000  # 剩余ID不少于该值的两倍时，空闲 worker 可拆走后一半
+COORDINATOR_POLL_INTERVAL = 5.0  # 暂无可租区间时的轮询间隔（秒）
+SHARD_DB_DIR = "./shards"  # 本机多进程模式下各 worker 的分片数据库目录
+
+# SQLite 存储配置：每个新连接执行的 PRAGMA（default 为 SQLite 自身的默认值）
+SQLITE_PROFILE = "tuned"
+SQLITE_PROFILES = {
+    "default": {},
+    "tuned": {
+        "journal_mode": "WAL",  # 读写互不阻塞，提交只追加 WAL 文件
+        "synchronous": "NORMAL",  # WAL 模式下断电最多丢失最后几次提交，不会损坏数据库
+        "cache_size": -65536,  # 负数单位为 KiB，即 64 MiB 页缓存
+        "mmap_size": 268435456,  # 256 MiB 内存映射读
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,  # 毫秒，多进程写入时等待锁而不是立即报错
+    },
+}
+SQLITE_POOL_SIZE = 5  # 连接池中常驻的连接数，会话之间复用连接与页缓存
+SQLITE_POOL_MAX_OVERFLOW = 5
+
+# 新浪美股增量同步：解析到的股票数少于已保存数量的该比例时，视为页面不完整，不处理下市
+SINA_DELIST_GUARD_RATIO = 0.9
+
+# 已知 subject ID 位图索引（抓取前跳过已入库 / 404 / 多次失败放弃的 ID）
+KNOWN_IDS_PATH = "./known_ids.bin"  # 位图快照文件
+KNOWN_IDS_PAGE_SIZE = 50000  # 从数据库补读时每批读取的行数
+
+# 导出（--export）
+EXPORT_DIR = "./exports"  # 导出文件与水位文件 watermarks.json 所在目录
+EXPORT_CHUNK_SIZE = 5000  # 每页读取与写入的行数，决定导出时的内存占用
+EXPORT_SAFETY_MARGIN = 60.0  # 秒，只导出早于此时长之前更新的行，等待提交较慢的写入
+
+# User-Agent 池：数据集只加载一次；同一代理（或直连）连续 N 个请求沿用同一个 UA，1 表示每个请求都更换
+USER_AGENT_BROWSERS = ("Chrome", "Edge", "Firefox", "Safari", "Opera")
+USER_AGENT_ROTATE_EVERY = 50
+
+# 抓取失败的重试（按错误类别）：第 n 次失败后等待 base_delay * 2^(n-1) 秒，不超过 max_delay，
+# 再随机缩短至多 RETRY_JITTER 的比例，避免同时失败的URL同时重试；等待中的URL不占用worker与并发名额
+RETRY_POLICIES = {
+    "proxy": {"base_delay": 0.2, "max_delay": 5.0},  # 换一个代理，很快重试
+    "timeout": {"base_delay": 2.0, "max_delay": 60.0},
+    "network": {"base_delay": 2.0, "max_delay": 60.0},
+    # 整个域名被封时由 HOST_BAN_COOLDOWN 暂停，这里只是单个页面被拒（或换代理）后的重试
+    "banned": {"base_delay": 5.0, "max_delay": 120.0},
+    "throttled": {"base_delay": 2.0, "max_delay": 120.0},  # 429/503
+    "server": {"base_delay": 2.0, "max_delay": 60.0},
+    "http": {"base_delay": 5.0, "max_delay": 60.0},
+    "parse": {"base_delay": 5.0, "max_delay": 60.0, "max_attempts": 2},  # 缺字段多半是页面本身的问题，只重试一次
+    "error": {"base_delay": 2.0, "max_delay": 60.0},
+    "write": {"base_delay": 5.0, "max_delay": 60.0, "max_attempts": 1},  # 入库失败不重新抓取，由持久化队列之后重试
+}
+RETRY_JITTER = 0.5
+HOST_BAN_COOLDOWN = 60.0  # 直连被封禁后，该域名暂停发出新请求的时间（秒）
+# 单个页面的 403/418 只按 banned 重试该URL；跳转验证页/异常请求页，或 HOST_BAN_WINDOW 秒内
+# 被拒至少 HOST_BAN_MIN_COUNT 次且占全部响应的 HOST_BAN_RATIO 以上，才视为整个域名被封
+HOST_BAN_WINDOW = 30.0
+HOST_BAN_MIN_COUNT = 5
+HOST_BAN_RATIO = 0.5
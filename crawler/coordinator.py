@@ -0,0 +1,361 @@
+"""分布式抓取协调：把 subject ID 区间租给多台机器/多个进程上的 worker。
+
+协调器只保存区间（Shard）的租约状态，后端可以是单机共享的 SQLite 文件，也可以
+是 Redis 兼容服务（redis.asyncio 为可选依赖）。worker 每抓完一批就上报进度并续约；
+租约超时未续期的区间会被其他 worker 接管，没有空闲区间时空闲 worker 会把剩余最多
+的区间拆走后一半（工作窃取）。拆分点总在原 worker 已上报进度之后至少一批，
+因此同一个ID不会被两个 worker 同时抓取。租约过期时间使用墙钟时间，多机部署时
+各机器时钟需大致同步。
+"""
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Protocol, TypeVar
+from urllib.parse import urlsplit
+
+from crawler.config import (
+    COORDINATOR_BATCH_SIZE,
+    COORDINATOR_LEASE_TTL,
+    COORDINATOR_MIN_SPLIT,
+    COORDINATOR_POLL_INTERVAL,
+)
+from crawler.crawler import stream_fetch
+from crawler.frontier import DONE, FAILED, NOT_FOUND, SUBJECT_URL, UNCHANGED
+from crawler.rate_limit import RateLimiter
+from crawler.writer import MovieWriter
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+
+@dataclass
+class Shard:
+    """一个 subject ID 区间 [start_id, end_id)，next_id 之前的ID已抓取完毕。"""
+
+    shard_id: str
+    start_id: int
+    end_id: int
+    next_id: int
+    worker: str | None = None
+    token: str | None = None
+    expires_at: float = 0.0
+    done: bool = False
+
+    @property
+    def remaining(self) -> int:
+        return max(self.end_id - self.next_id, 0)
+
+    def leased(self, now: float) -> bool:
+        return self.worker is not None and self.expires_at > now and not self.done
+
+
+def _apply(shards: dict[str, Shard], mutate: Callable[[dict[str, Shard]], R]) -> tuple[R, list[Shard]]:
+    """执行修改并返回结果与发生变化（含新增）的区间。"""
+    before = {shard_id: dataclasses.replace(shard) for shard_id, shard in shards.items()}
+    result = mutate(shards)
+    changed = [shard for shard_id, shard in shards.items() if before.get(shard_id) != shard]
+    return result, changed
+
+
+class LeaseBackend(Protocol):
+    async def update(self, mutate: Callable[[dict[str, Shard]], R]) -> R:
+        """在后端的互斥范围内读出全部区间、执行 mutate 并写回变化的区间。"""
+        ...
+
+    async def close(self) -> None: ...
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    shard_id TEXT PRIMARY KEY,
+    start_id INTEGER NOT NULL,
+    end_id INTEGER NOT NULL,
+    next_id INTEGER NOT NULL,
+    worker TEXT,
+    token TEXT,
+    expires_at REAL NOT NULL,
+    done INTEGER NOT NULL
+);
+"""
+_FIELDS = [field.name for field in dataclasses.fields(Shard)]
+
+
+def _shard_from_row(row: tuple[Any, ...]) -> Shard:
+    values = dict(zip(_FIELDS, row))
+    values["done"] = bool(values["done"])
+    return Shard(**values)
+
+
+class SqliteLeaseBackend:
+    """单机多进程共享的 SQLite 后端，BEGIN IMMEDIATE 保证读改写的原子性。"""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, isolation_level=None, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = asyncio.Lock()
+
+    async def update(self, mutate: Callable[[dict[str, Shard]], R]) -> R:
+        # sqlite3 的锁等待会阻塞线程，放到线程池中执行
+        async with self._lock:
+            return await asyncio.to_thread(self._update, mutate)
+
+    def _update(self, mutate: Callable[[dict[str, Shard]], R]) -> R:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._conn.execute(f"SELECT {', '.join(_FIELDS)} FROM shards")
+            shards = {row[0]: _shard_from_row(row) for row in rows}
+            result, changed = _apply(shards, mutate)
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO shards ({', '.join(_FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(_FIELDS))})",
+                [dataclasses.astuple(shard) for shard in changed],
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return result
+
+    async def close(self) -> None:
+        self._conn.close()
+
+
+# 只释放自己持有的锁
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLeaseBackend:
+    """Redis 兼容服务后端：区间以 JSON 存在一个 hash 中，读改写由带过期时间的锁保护。"""
+
+    def __init__(self, url: str, prefix: str = "crawler:shards", lock_timeout: float = 10.0) -> None:
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("Redis 后端需要安装 redis 包（uv add redis）") from e
+        self._redis = aioredis.from_url(url)
+        self._key = prefix
+        self._lock_key = f"{prefix}:lock"
+        self._lock_timeout = lock_timeout
+
+    async def update(self, mutate: Callable[[dict[str, Shard]], R]) -> R:
+        token = uuid.uuid4().hex
+        while not await self._redis.set(self._lock_key, token, nx=True, px=int(self._lock_timeout * 1000)):
+            await asyncio.sleep(0.01)
+        try:
+            raw = await self._redis.hgetall(self._key)
+            shards = {key.decode(): Shard(**json.loads(value)) for key, value in raw.items()}
+            result, changed = _apply(shards, mutate)
+            if changed:
+                await self._redis.hset(
+                    self._key,
+                    mapping={shard.shard_id: json.dumps(dataclasses.asdict(shard)) for shard in changed},
+                )
+        finally:
+            await self._redis.eval(_RELEASE_LOCK, 1, self._lock_key, token)
+        return result
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def open_backend(url: str) -> LeaseBackend:
+    """sqlite:///path/to/coordinator.db 或 redis://host:port/db。"""
+    scheme = urlsplit(url).scheme
+    if scheme == "sqlite":
+        return SqliteLeaseBackend(url.removeprefix("sqlite:///"))
+    if scheme in ("redis", "rediss"):
+        return RedisLeaseBackend(url)
+    raise ValueError(f"不支持的协调器地址: {url}")
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Coordinator:
+    """区间规划、租用、续约与完成；所有状态修改都在后端的一次原子更新中完成。"""
+
+    def __init__(
+        self,
+        backend: LeaseBackend,
+        lease_ttl: float = COORDINATOR_LEASE_TTL,
+        batch_size: int = COORDINATOR_BATCH_SIZE,
+        min_split: int = COORDINATOR_MIN_SPLIT,
+    ) -> None:
+        self.backend = backend
+        self.lease_ttl = lease_ttl
+        self.batch_size = batch_size
+        self.min_split = max(min_split, batch_size)
+
+    async def plan(self, start_id: int, end_id: int, shard_size: int) -> int:
+        """把 [start_id, end_id) 中尚未规划的部分切成区间，返回新增的区间数。"""
+        def mutate(shards: dict[str, Shard]) -> int:
+            first = max([start_id, *(shard.end_id for shard in shards.values())])
+            added = 0
+            for start in range(first, end_id, shard_size):
+                end = min(start + shard_size, end_id)
+                shards[f"{start:012d}"] = Shard(f"{start:012d}", start, end, start)
+                added += 1
+            return added
+
+        return await self.backend.update(mutate)
+
+    async def acquire(self, worker: str) -> Shard | None:
+        """租用一个区间：优先最小的空闲或租约已过期的区间，其次拆分他人剩余最多的区间。"""
+        def mutate(shards: dict[str, Shard]) -> Shard | None:
+            now = time.time()
+            free = []
+            for shard in shards.values():
+                if shard.done or shard.leased(now):
+                    continue
+                if not shard.remaining:
+                    shard.done, shard.worker, shard.token = True, None, None
+                    continue
+                free.append(shard)
+            if free:
+                shard = min(free, key=lambda s: s.start_id)
+                if shard.worker is not None and shard.worker != worker:
+                    logger.info("接管过期租约: %s (原 worker %s)", shard.shard_id, shard.worker)
+            else:
+                victims = [
+                    s for s in shards.values()
+                    if s.leased(now) and s.worker != worker and s.remaining >= 2 * self.min_split
+                ]
+                if not victims:
+                    return None
+                victim = max(victims, key=lambda s: s.remaining)
+                # 原 worker 可能正在抓取 [next_id, next_id + batch_size)，拆分点必须在此之后
+                split = victim.next_id + max(victim.remaining // 2, self.batch_size)
+                shard = Shard(f"{split:012d}", split, victim.end_id, split)
+                victim.end_id = split
+                shards[shard.shard_id] = shard
+                logger.info("拆分区间 %s，新区间 [%d, %d)", victim.shard_id, shard.start_id, shard.end_id)
+            shard.worker = worker
+            shard.token = uuid.uuid4().hex
+            shard.expires_at = now + self.lease_ttl
+            return dataclasses.replace(shard)
+
+        return await self.backend.update(mutate)
+
+    async def heartbeat(self, lease: Shard, next_id: int) -> Shard | None:
+        """上报进度并续约，返回最新的区间（end_id 可能因被拆分而变小）；租约已被接管时返回 None。"""
+        def mutate(shards: dict[str, Shard]) -> Shard | None:
+            shard = shards.get(lease.shard_id)
+            if shard is None or shard.token != lease.token or shard.done:
+                return None
+            shard.next_id = max(shard.next_id, min(next_id, shard.end_id))
+            shard.expires_at = time.time() + self.lease_ttl
+            return dataclasses.replace(shard)
+
+        return await self.backend.update(mutate)
+
+    async def complete(self, lease: Shard) -> bool:
+        def mutate(shards: dict[str, Shard]) -> bool:
+            shard = shards.get(lease.shard_id)
+            if shard is None or shard.token != lease.token:
+                return False
+            shard.next_id = shard.end_id
+            shard.done, shard.worker, shard.token = True, None, None
+            return True
+
+        return await self.backend.update(mutate)
+
+    async def status(self) -> dict[str, int]:
+        def mutate(shards: dict[str, Shard]) -> dict[str, int]:
+            now = time.time()
+            return {
+                "shards": len(shards),
+                "done": sum(1 for s in shards.values() if s.done or not s.remaining),
+                "leased": sum(1 for s in shards.values() if s.leased(now)),
+                "workers": len({s.worker for s in shards.values() if s.leased(now)}),
+                "remaining_ids": sum(s.remaining for s in shards.values() if not s.done),
+            }
+
+        return await self.backend.update(mutate)
+
+    async def finished(self) -> bool:
+        status = await self.status()
+        return status["done"] == status["shards"]
+
+
+async def run_worker(
+    coordinator: Coordinator,
+    worker_id: str | None = None,
+    use_proxy: bool = True,
+    max_retries: int = 3,
+    poll_interval: float = COORDINATOR_POLL_INTERVAL,
+    url_template: str = SUBJECT_URL,
+    **fetch_kwargs: Any,
+) -> dict[str, Any]:
+    """循环租用区间并抓取，直到所有区间完成；返回各结果的数量与写入统计。"""
+    worker_id = worker_id or default_worker_id()
+    fetch_kwargs.setdefault("limiter", RateLimiter())
+    totals: dict[str, Any] = {DONE: 0, UNCHANGED: 0, NOT_FOUND: 0, FAILED: 0}
+    async with MovieWriter() as writer:
+        while True:
+            lease = await coordinator.acquire(worker_id)
+            if lease is None:
+                if await coordinator.finished():
+                    break
+                await asyncio.sleep(poll_interval)
+                continue
+            logger.info("%s 租用区间 [%d, %d)", worker_id, lease.next_id, lease.end_id)
+            await _crawl_lease(coordinator, lease, totals, url_template, use_proxy=use_proxy,
+                               max_retries=max_retries, writer=writer, **fetch_kwargs)
+    totals["write"] = writer.totals
+    return totals
+
+
+async def _crawl_lease(
+    coordinator: Coordinator,
+    lease: Shard,
+    totals: dict[str, Any],
+    url_template: str,
+    **stream_kwargs: Any,
+) -> None:
+    current: Shard | None = lease
+    next_id = lease.next_id
+
+    async def keepalive() -> None:
+        # 单批耗时可能超过租约时长，后台按 1/3 租期续约
+        nonlocal current
+        while current is not None:
+            await asyncio.sleep(coordinator.lease_ttl / 3)
+            current = await coordinator.heartbeat(current, next_id)
+
+    task = asyncio.create_task(keepalive())
+    try:
+        while current is not None and next_id < current.end_id:
+            batch_end = min(next_id + coordinator.batch_size, current.end_id)
+            urls = (url_template.format(subject_id) for subject_id in range(next_id, batch_end))
+            # stream_fetch 只在结果所在批次提交后才产出 done，返回时本批次已全部落库，此时上报进度
+            # 不会让崩溃丢失的行被跳过
+            async for _, outcome, _ in stream_fetch(urls, **stream_kwargs):
+                totals[outcome] += 1
+            next_id = batch_end
+            if current is not None:
+                current = await coordinator.heartbeat(current, next_id)
+        if current is None:
+            logger.warning("区间 %s 的租约已被接管，停止抓取", lease.shard_id)
+        else:
+            await coordinator.complete(current)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
@@ -1,101 +1,414 @@
-import httpx
 import asyncio
-from bs4 import BeautifulSoup
-from crawler.proxy_pool import get_valid_proxy
-from crawler.db import add_movie
-import random
-from fake_useragent import UserAgent
-from crawler.config import CONCURRENT_TASKS
-import re
-
-async def fetch_movie(url, use_proxy=True):
-    proxy = await get_valid_proxy() if use_proxy else None
+import datetime
+import logging
+import time
+from contextlib import nullcontext
+from collections.abc import AsyncIterable, Iterable, Mapping
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Final
+from urllib.parse import urlsplit
+from crawler.parsers import extract_subject_id, parse_movie
+from crawler.http_client import DIRECT_ROUTE, PROXY_ROUTE, HttpClientManager, get_client_manager
+from crawler.proxy_pool import BAN_STATUSES, get_valid_proxy, is_ban_response, is_block_response, report_proxy
+from crawler.config import (
+    FRONTIER_CHUNK_SIZE,
+    HOST_BAN_COOLDOWN,
+    REFRESH_PAGE_SIZE,
+    REFRESH_RECENT_STALE_DAYS,
+    REFRESH_RECENT_WEIGHT,
+    REFRESH_RECENT_YEARS,
+    REFRESH_STALE_DAYS,
+    STREAM_WORKERS,
+)
+from crawler.db import add_movie, iter_stale_movies, refresh_movies, top_stale_movies, touch_movies
+from crawler.frontier import DONE, FAILED, NOT_FOUND, UNCHANGED, Frontier
+from crawler.metrics import (
+    BANS,
+    FETCH_OUTCOMES,
+    PARSE_SECONDS,
+    QUEUE_DEPTH,
+    REQUEST_ERRORS,
+    REQUEST_LATENCY,
+    RESPONSES,
+    RETRIES,
+)
+from crawler.rate_limit import BACKOFF_STATUSES, RateLimiter
+from crawler.response_cache import ResponseCache
+from crawler.retry import FetchError, FetchOutcome, RetryScheduler, classify_exception
+from crawler.user_agent import get_user_agent_provider
+from crawler.writer import MovieWriter, format_counts
+
+if TYPE_CHECKING:
+    from crawler.known_ids import KnownIds
+    from crawler.parse_executor import ParseExecutor
+
+logger = logging.getLogger(__name__)
+
+_STOP: Final = object()
+
+
+@dataclass(slots=True)
+class _Pending:
+    """等待抓取的URL；重试时避开上次失败所用的代理。"""
+
+    url: str
+    attempt: int = 1
+    avoid_proxy: str | None = None
+
+
+async def fetch_movie(url, use_proxy=True, clients: HttpClientManager | None = None,
+                      writer: MovieWriter | None = None,
+                      limiter: RateLimiter | None = None,
+                      parse_executor: "ParseExecutor | None" = None,
+                      cache: ResponseCache | None = None,
+                      avoid_proxy: str | None = None, retry: bool = False) -> FetchOutcome:
+    """抓取并解析单个详情页（不重试），失败时 FetchOutcome.error 给出错误类别。
+
+    retry 表示该URL之前失败过：重试时再次被拒只说明该页面本身受限，不计入域名的封禁判断。
+    """
+    proxy = await get_valid_proxy(exclude=(avoid_proxy,) if avoid_proxy else ()) if use_proxy else None
     headers = {
-        "User-Agent": UserAgent(browsers=['Chrome', 'Edge', 'Firefox', 'Safari', 'Opera']).random,
+        "User-Agent": get_user_agent_provider().get(proxy),
         "Referer": "https://movie.douban.com/",
         "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"
     }
+    # 已缓存的页面发送条件请求，未变化时跳过解析与入库
+    entry = await cache.lookup(url) if cache is not None else None
+    if entry is not None:
+        headers.update(entry.conditional_headers())
+    host = limiter.for_url(url) if limiter else None
+    host_name = host.host if host else urlsplit(url).hostname or ""
+    status = None
+
+    def failed(error: FetchError) -> FetchOutcome:
+        return FetchOutcome(FAILED, error=error, http_status=status, proxy=proxy)
+
     try:
-        if proxy:
-            async with httpx.AsyncClient(proxy=f"http://{proxy}", timeout=20) as client:
-                resp = await client.get(url, headers=headers)
-        else:
-            async with httpx.AsyncClient(timeout=20) as client:
-                resp = await client.get(url, headers=headers)
+        # 限速器只包住网络请求本身，解析与入库不占用该域名的并发名额
+        async with (
+            host.slot() if host else nullcontext(),
+            (clients or get_client_manager()).lease(proxy) as client,
+        ):
+            start = time.monotonic()
+            resp = await client.get(url, headers=headers)
+        latency = time.monotonic() - start
+        status = resp.status_code
+        REQUEST_LATENCY.observe(latency, host=host_name, route=PROXY_ROUTE if proxy else DIRECT_ROUTE)
+        RESPONSES.inc(host=host_name, status=resp.status_code)
+        # 回报代理健康状况：封禁信号直接淘汰，5xx 计为失败
+        location = resp.headers.get('location', '')
+        text = resp.text if resp.status_code == 200 else ''
+        banned = is_ban_response(resp.status_code, location, text)
+        if banned:
+            BANS.inc(host=host_name)
+            get_user_agent_provider().rotate(proxy)
+        report_proxy(proxy, ok=not banned and resp.status_code < 500,
+                     latency=latency, banned=banned)
+        if host:
+            # 单个页面的 403/418 只让该URL按 banned 重试；跳转验证页/异常请求页，
+            # 或窗口内大部分请求被拒，才说明对整个域名的访问受限
+            mostly_rejected = not retry and host.record_response(resp.status_code in BAN_STATUSES)
+            host_banned = mostly_rejected or is_block_response(resp.status_code, location, text)
+            host.feedback(resp.status_code, banned=host_banned)
+            # 代理被封禁只淘汰该代理；直连被封禁说明本机IP受限，整个域名暂停一段时间
+            if host_banned and proxy is None:
+                host.park(HOST_BAN_COOLDOWN)
+        if resp.status_code == 304 and cache is not None and entry is not None:
+            await cache.mark_not_modified(url)
+            return FetchOutcome(UNCHANGED, http_status=status, proxy=proxy)
         if resp.status_code == 200:
-            soup = BeautifulSoup(resp.text, "html.parser")
             # 检查是否被豆瓣安全拦截
-            if '有异常请求从你的 IP 发出' in resp.text or 'sec.douban.com' in resp.text:
-                print(f"[ERROR] 有异常请求从你的 IP 发出，请 登录 使用豆瓣: {url}")
-                return None
-            # 解析字段
-            title = soup.find("span", property="v:itemreviewed")
-            year = soup.find("span", class_="year")
-            director = soup.find("a", rel="v:directedBy")
-            rating = soup.find("strong", class_="ll rating_num", property="v:average")
-            # 提取URL中的id
-            match = re.search(r"subject/(\d+)(/|$)", url)
-            url_id = match.group(1) if match else None
-            movie_data = {
-                "id": int(url_id) if url_id else None,
-                "title": title.text.strip() if title else None,
-                "year": year.text.strip("() ") if year else None,
-                "director": director.text.strip() if director else None,
-                "rating": float(rating.text.strip()) if rating and rating.text.strip() else None,
-                "url": url
-            }
+            if banned:
+                logger.error("有异常请求从你的 IP 发出，请 登录 使用豆瓣: %s", url)
+                return failed(FetchError.BANNED)
+            if cache is not None and await cache.is_unchanged(entry, resp.content):
+                return FetchOutcome(UNCHANGED, http_status=status, proxy=proxy)
+            with PARSE_SECONDS.time(page="movie"):
+                if parse_executor is not None:
+                    movie_data = await parse_executor.parse_movie(resp.content, resp.encoding, url)
+                else:
+                    movie_data = parse_movie(resp.text, url)
             if not all([movie_data["id"], movie_data["title"], movie_data["year"], movie_data["director"]]):
-                print(f"[DEBUG] Parsed data missing fields: {movie_data}")
-                print(f"[DEBUG] Response text (first 500 chars): {resp.text[:500]}")
-                return None
+                logger.debug("Parsed data missing fields: %s", movie_data)
+                logger.debug("Response text (first 500 chars): %s", resp.text[:500])
+                return failed(FetchError.PARSE)
+            if writer is not None:
+                # 交给写入队列批量落库，不阻塞抓取；调用方等 committed 确认后再记为 done
+                committed = await writer.put(movie_data)
+                if cache is not None:
+                    # 页面在数据落库后才写入缓存，否则写入失败后重新抓取会被当作"未变化"跳过
+                    committed = asyncio.ensure_future(
+                        _store_after_commit(committed, cache, url, resp.headers, resp.content))
+                return FetchOutcome(DONE, movie_data, http_status=status, proxy=proxy, committed=committed)
             result = await add_movie(movie_data)
             if result == 'success':
-                print(f"[INFO] 插入成功: {movie_data['id']} {movie_data['title']}")
+                logger.debug("插入成功: %s %s", movie_data['id'], movie_data['title'])
             elif result == 'duplicate':
-                print(f"[INFO] 重复插入: {movie_data['id']} {movie_data['title']}")
+                logger.debug("重复插入: %s %s", movie_data['id'], movie_data['title'])
             else:
-                print(f"[ERROR] 插入失败: {movie_data['id']} {movie_data['title']}")
-            return movie_data
+                logger.error("插入失败: %s %s", movie_data['id'], movie_data['title'])
+                return failed(FetchError.WRITE)
+            if cache is not None:
+                await cache.store(url, resp.headers, resp.content)
+            return FetchOutcome(DONE, movie_data, http_status=status, proxy=proxy)
         elif resp.status_code == 404 or resp.status_code == 302:
             # 检查是否跳转到 sec.douban.com
-            location = resp.headers.get('location', '')
             if 'sec.douban.com' in location:
-                print(f"[ERROR] 有异常请求从你的 IP 发出，请 登录 使用豆瓣")
-                return None
-            print(f"[WARN] 页面不存在: {url}")
-            return 'not_found'
+                logger.error("有异常请求从你的 IP 发出，请 登录 使用豆瓣")
+                return failed(FetchError.BANNED)
+            logger.debug("页面不存在: %s", url)
+            return FetchOutcome(NOT_FOUND, http_status=status, proxy=proxy)
         elif resp.status_code in (403, 418):
-            print(f"[WARN] 被禁止/反爬: {url} (status {resp.status_code})")
-            return None
+            logger.warning("被禁止/反爬: %s (status %s)", url, resp.status_code)
+            return failed(FetchError.BANNED)
+        elif resp.status_code in BACKOFF_STATUSES:
+            logger.warning("服务端过载: %s (status %s)", url, resp.status_code)
+            return failed(FetchError.THROTTLED)
         else:
-            print(f"[ERROR] 未知HTTP错误: {url} (status {resp.status_code})")
-            print(f"[DEBUG] Response text (first 500 chars): {resp.text[:500]}")
-            return None
+            logger.error("未知HTTP错误: %s (status %s)", url, resp.status_code)
+            logger.debug("Response text (first 500 chars): %s", resp.text[:500])
+            return failed(FetchError.SERVER if resp.status_code >= 500 else FetchError.HTTP)
     except Exception as e:
-        print(f"[DEBUG] Exception: {e}")
-        return None
-
-async def batch_fetch(urls, delay=1, use_proxy=True, max_retries=3):
-    sem = asyncio.Semaphore(CONCURRENT_TASKS)
-    results = [None] * len(urls)
-    async def sem_fetch(url, idx):
-        for attempt in range(1, max_retries + 1):
-            async with sem:
-                movie = await fetch_movie(url, use_proxy=use_proxy)
-                if movie and movie != 'not_found':
-                    results[idx] = movie
-                    break
-                elif movie == 'not_found':
-                    results[idx] = None
-                    break
-                else:
-                    print(f"[ERROR] Failed to fetch: {url} (attempt {attempt}/{max_retries})")
-                    if attempt < max_retries:
-                        await asyncio.sleep(1)
-        if not results[idx] and (movie != 'not_found'):
-            print(f"[ERROR] Final fail: {url}")
-        await asyncio.sleep(delay + random.uniform(0, 1))
-        return results[idx]
-    tasks = [sem_fetch(url, idx) for idx, url in enumerate(urls)]
-    await asyncio.gather(*tasks)
-    return results 
\ No newline at end of file
+        if status is None:
+            REQUEST_ERRORS.inc(host=host_name)
+            report_proxy(proxy, ok=False)
+        logger.debug("Exception: %r", e)
+        return failed(classify_exception(e, proxy))
+
+async def _store_after_commit(committed: asyncio.Future[bool], cache: ResponseCache, url: str,
+                              headers: Mapping[str, str], content: bytes) -> bool:
+    if not await committed:
+        return False
+    await cache.store(url, headers, content)
+    return True
+
+async def stream_fetch(urls: Iterable[str] | AsyncIterable[str], use_proxy=True, max_retries=3,
+                       workers=STREAM_WORKERS,
+                       clients: HttpClientManager | None = None,
+                       writer: MovieWriter | None = None,
+                       limiter: RateLimiter | None = None,
+                       parse_executor: "ParseExecutor | None" = None,
+                       cache: ResponseCache | None = None,
+                       known: "KnownIds | None" = None):
+    """流式抓取：URL经有界队列分发给固定数量的worker，按完成顺序产出 (url, 结果状态, movie_data)。
+
+    URL来源可以是普通或异步可迭代对象，会被按需消费，内存占用与URL总数无关。
+    交给写入队列的结果在所在批次提交后才按 done 产出，写入失败按 failed 产出。
+    提供 known 时，subject ID 已在索引中的URL不发请求、也不产出结果，
+    本次确认入库或不存在的ID会加入索引。
+    失败的URL按错误类别退避后放入延迟队列（RetryScheduler），到期后重新排队，
+    worker 不会在等待重试时空占；每个URL最多尝试 max_retries 次。
+    """
+    # 整个批次共享同一组连接池，避免每个URL重新握手
+    clients = clients or get_client_manager()
+    # 并发与请求间隔交给按域名自适应的限速器，不再固定信号量+sleep
+    limiter = limiter or RateLimiter()
+    own_writer = writer is None
+    writer = writer or MovieWriter()
+    await writer.start()
+    # 队列中除了数据还有 _STOP 哨兵
+    url_queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=workers * 2)
+    result_queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=workers * 2)
+    retries: RetryScheduler[_Pending] = RetryScheduler()
+    # 已交给写入队列、等待提交确认的结果
+    committing: set[asyncio.Task[None]] = set()
+    # 已排队但尚未得出最终结果的URL数（含等待重试的）；URL来源耗尽且归零后通知worker退出
+    unfinished = 0
+    source_done = False
+    closing = False
+    # 提交确认任务中抛出的异常，结束时抛给调用方
+    errors: list[BaseException] = []
+
+    def stop_when_drained():
+        if source_done and unfinished == 0:
+            for _ in range(workers):
+                url_queue.put_nowait(_STOP)
+
+    async def enqueue(url):
+        nonlocal unfinished
+        if known is not None and known.contains_url(url):
+            FETCH_OUTCOMES.inc(outcome="known")
+            return
+        unfinished += 1
+        await url_queue.put(_Pending(url))
+
+    async def produce():
+        nonlocal source_done
+        try:
+            if isinstance(urls, AsyncIterable):
+                async for url in urls:
+                    await enqueue(url)
+            else:
+                for url in urls:
+                    await enqueue(url)
+        finally:
+            source_done = True
+            stop_when_drained()
+
+    async def redispatch():
+        # 到期的重试重新排到URL队列末尾
+        while True:
+            await url_queue.put(await retries.get())
+
+    async def work():
+        try:
+            while (pending := await url_queue.get()) is not _STOP:
+                url = pending.url
+                parked = limiter.for_url(url).parked_for()
+                if parked > 0:
+                    # 域名被封禁暂停期间不占用worker，到期后再抓取
+                    retries.schedule(pending, parked)
+                    continue
+                result = await fetch_movie(
+                    url, use_proxy=use_proxy, clients=clients, writer=writer, limiter=limiter,
+                    parse_executor=parse_executor, cache=cache, avoid_proxy=pending.avoid_proxy,
+                    retry=pending.attempt > 1)
+                error = result.error
+                if error is not None and retries.should_retry(error, pending.attempt, max_retries):
+                    delay = retries.backoff(error, pending.attempt)
+                    # 每次重试只计入 RETRIES 指标，日志用 DEBUG，避免大量瞬时故障刷屏
+                    RETRIES.inc(error=error)
+                    logger.debug("Failed to fetch: %s (%s, attempt %d/%d), retry in %.1fs",
+                                 url, error, pending.attempt, max_retries, delay)
+                    retries.schedule(_Pending(url, pending.attempt + 1, result.proxy), delay)
+                    continue
+                if result.committed is not None:
+                    # 等所在批次提交后再产出结果，worker 不等待，继续抓取下一个URL
+                    task = asyncio.create_task(finish(url, result))
+                    committing.add(task)
+                    task.add_done_callback(finish_done)
+                    continue
+                await finish(url, result)
+        finally:
+            # 出错退出时也要通知主循环，否则它会一直等在 result_queue.get() 上；
+            # 主循环关闭时已不再读取结果队列，不能等待
+            if not closing:
+                await result_queue.put(_STOP)
+
+    async def finish(url, result):
+        nonlocal unfinished
+        try:
+            if result.committed is not None and not await result.committed:
+                result = FetchOutcome(FAILED, result.movie, FetchError.WRITE, result.http_status, result.proxy)
+            if result.error is not None:
+                logger.error("Final fail: %s (%s)", url, result.error)
+            FETCH_OUTCOMES.inc(outcome=result.status)
+            # done 在提交确认后才会到这里，索引（以及退出时保存的快照）中不会有未落库的ID
+            if known is not None and result.status in (DONE, NOT_FOUND):
+                known.add_url(url)
+            await result_queue.put((url, result.status, result.movie))
+        finally:
+            unfinished -= 1
+            stop_when_drained()
+
+    def finish_done(task):
+        committing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    producer = asyncio.create_task(produce())
+    dispatcher = asyncio.create_task(redispatch())
+    consumers = [asyncio.create_task(work()) for _ in range(workers)]
+    try:
+        finished = 0
+        while finished < workers:
+            QUEUE_DEPTH.set(url_queue.qsize(), queue="url")
+            QUEUE_DEPTH.set(result_queue.qsize(), queue="result")
+            QUEUE_DEPTH.set(len(retries), queue="retry")
+            item = await result_queue.get()
+            if item is _STOP:
+                finished += 1
+                # worker 在放入 _STOP 的同一步中结束，出错时其余 worker 可能等不到退出通知，立即抛出
+                for consumer in consumers:
+                    if consumer.done() and not consumer.cancelled() and consumer.exception() is not None:
+                        await consumer
+                continue
+            yield item
+        # 让URL来源及提交确认中抛出的异常传递给调用方
+        await producer
+        if errors:
+            raise errors[0]
+    finally:
+        closing = True
+        tasks = (producer, dispatcher, *consumers, *committing)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if own_writer:
+            totals = await writer.close()
+            logger.info("写入统计 - %s", format_counts(totals))
+        logger.info("限速器状态: %s", limiter.snapshot())
+
+async def batch_fetch(urls, use_proxy=True, max_retries=3, **kwargs):
+    """抓取一组URL，按输入顺序返回 movie_data 列表（失败、不存在或因 known 跳过为 None）。"""
+    found = {}
+    async for url, _, movie in stream_fetch(urls, use_proxy=use_proxy, max_retries=max_retries, **kwargs):
+        found[url] = movie
+    return [found.get(url) for url in urls]
+
+async def frontier_fetch(frontier: Frontier, use_proxy=True, max_retries=3,
+                         chunk_size=FRONTIER_CHUNK_SIZE, **kwargs):
+    """从持久化队列中按块领取URL并流式抓取，结果分批写回队列，返回各结果的数量。"""
+    async def claimed_urls():
+        while claimed := await frontier.claim(chunk_size):
+            for url in claimed:
+                yield url
+
+    totals = {DONE: 0, UNCHANGED: 0, NOT_FOUND: 0, FAILED: 0}
+    outcomes = {}
+    try:
+        async for url, outcome, _ in stream_fetch(claimed_urls(), use_proxy=use_proxy,
+                                                  max_retries=max_retries, **kwargs):
+            outcomes[url] = outcome
+            totals[outcome] += 1
+            if len(outcomes) >= chunk_size:
+                await frontier.mark(outcomes)
+                outcomes = {}
+    finally:
+        await frontier.mark(outcomes)
+    return totals
+
+def refresh_priority(movie, now: datetime.datetime, recent_year: str) -> float:
+    """刷新优先级：未更新的天数，近年上映或尚无评分的电影加权。"""
+    age_days = (now - movie.update_at).total_seconds() / 86400
+    is_recent = (movie.year or "") >= recent_year or movie.rating is None
+    return age_days * (REFRESH_RECENT_WEIGHT if is_recent else 1.0)
+
+async def refresh_fetch(stale_days=REFRESH_STALE_DAYS, recent_stale_days=REFRESH_RECENT_STALE_DAYS,
+                        limit=None, use_proxy=True, max_retries=3, **kwargs):
+    """重新抓取过期的电影并只更新变化的列，返回各结果与写入的统计。"""
+    # SQLite 中的 update_at 为不带时区的 UTC 时间
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    recent_stale_days = min(recent_stale_days, stale_days)
+    recent_year = str(now.year - REFRESH_RECENT_YEARS)
+
+    stale_before = now - datetime.timedelta(days=stale_days)
+    recent_stale_before = now - datetime.timedelta(days=recent_stale_days)
+
+    async def stale_urls():
+        if limit is not None:
+            # 只刷新一部分时在 SQL 中按优先级对全部过期电影排序后取前 limit 部
+            for movie in await top_stale_movies(stale_before, recent_stale_before, recent_year,
+                                                now, REFRESH_RECENT_WEIGHT, limit):
+                yield movie.url
+            return
+        # 全部刷新时按 (update_at, id) 分页，优先级只用于页内排序
+        async for page in iter_stale_movies(stale_before, recent_stale_before, recent_year, REFRESH_PAGE_SIZE):
+            page.sort(key=lambda movie: refresh_priority(movie, now, recent_year), reverse=True)
+            for movie in page:
+                yield movie.url
+
+    totals = {DONE: 0, UNCHANGED: 0, NOT_FOUND: 0, FAILED: 0}
+    checked: list[int] = []
+    async with MovieWriter(write_batch=refresh_movies) as writer:
+        async for url, outcome, _ in stream_fetch(stale_urls(), use_proxy=use_proxy, max_retries=max_retries,
+                                                  writer=writer, **kwargs):
+            totals[outcome] += 1
+            # 未变化或已下架的电影只记录本次检查时间，避免下次再被选中
+            if outcome in (UNCHANGED, NOT_FOUND) and (movie_id := extract_subject_id(url)) is not None:
+                checked.append(movie_id)
+                if len(checked) >= REFRESH_PAGE_SIZE:
+                    await touch_movies(checked)
+                    checked = []
+        await touch_movies(checked)
+    return {**totals, "write": writer.totals}
@@ -1,11 +1,29 @@
 import datetime
-from typing import Any, Literal, Sequence
+from typing import Any, AsyncIterator, Literal, Sequence
 
-from sqlalchemy import DateTime, Float, Integer, String, UniqueConstraint, func, select
+from sqlalchemy import (
+    ColumnElement,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    and_,
+    case,
+    event,
+    func,
+    or_,
+    select,
+    update,
+)
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
+from crawler.config import SQLITE_POOL_MAX_OVERFLOW, SQLITE_POOL_SIZE, SQLITE_PROFILE, SQLITE_PROFILES
+from crawler.metrics import db_writer
+
 
 class Base(DeclarativeBase):
     """SQLAlchemy 异步模型基类。"""
@@ -29,7 +47,13 @@ class Movie(Base):
         default=lambda: datetime.datetime.now(datetime.UTC),
         onupdate=lambda: datetime.datetime.now(datetime.UTC),
     )
-    __table_args__ = (UniqueConstraint('url', name='_url_uc'),)
+    __table_args__ = (
+        UniqueConstraint('url', name='_url_uc'),
+        # 刷新按 (update_at, id) 键集分页，导出按 update_at 水位增量读取
+        Index('ix_movies_update_at_id', 'update_at', 'id'),
+        Index('ix_movies_year', 'year'),
+        Index('ix_movies_rating', 'rating'),
+    )
 
 class SinaUSStock(Base):
     __tablename__ = 'sina_us_stocks'
@@ -45,20 +69,127 @@ class SinaUSStock(Base):
         default=lambda: datetime.datetime.now(datetime.UTC),
         onupdate=lambda: datetime.datetime.now(datetime.UTC),
     )
-    __table_args__ = (UniqueConstraint('symbol', name='_symbol_uc'),)
+    # 下市时间；下市的股票保留在表中，重新出现在列表中时清空
+    delisted_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, nullable=True)
+    __table_args__ = (
+        UniqueConstraint('symbol', name='_symbol_uc'),
+        Index('ix_sina_us_stocks_update_at', 'update_at'),
+    )
+
+class SinaUSStockHistory(Base):
+    """新浪美股列表的变更记录：listed / changed（更名或变更分类）/ delisted。"""
+
+    __tablename__ = 'sina_us_stock_history'
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    symbol: Mapped[str] = mapped_column(String, nullable=False)
+    change: Mapped[str] = mapped_column(String, nullable=False)
+    # 变更后的值；delisted 记录下市前的值
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    category: Mapped[str] = mapped_column(String, nullable=False)
+    # 仅在对应字段发生变化时记录原值
+    previous_name: Mapped[str | None] = mapped_column(String, nullable=True)
+    previous_category: Mapped[str | None] = mapped_column(String, nullable=True)
+    changed_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, default=lambda: datetime.datetime.now(datetime.UTC)
+    )
+    __table_args__ = (
+        Index('ix_sina_us_stock_history_symbol', 'symbol', 'changed_at'),
+    )
+
+class CrawlFrontier(Base):
+    """持久化的抓取队列，记录每个URL的抓取状态，支持断点续爬。"""
+
+    __tablename__ = 'crawl_frontier'
+    url: Mapped[str] = mapped_column(String, primary_key=True)
+    subject_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # pending / in_flight / done / not_found / failed
+    state: Mapped[str] = mapped_column(String, nullable=False, default='pending')
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_eligible_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, default=lambda: datetime.datetime.now(datetime.UTC)
+    )
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime,
+        default=lambda: datetime.datetime.now(datetime.UTC),
+        onupdate=lambda: datetime.datetime.now(datetime.UTC),
+    )
+    __table_args__ = (
+        Index('ix_crawl_frontier_state_next', 'state', 'next_eligible_at'),
+        Index('ix_crawl_frontier_subject_id', 'subject_id'),
+    )
 
 DATABASE_URL = "sqlite+aiosqlite:///./movies.db"
-engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+
+
+def create_engine_for(url: str, profile: str = SQLITE_PROFILE) -> AsyncEngine:
+    """按存储配置创建引擎：SQLite 连接建立时执行 profile 中的 PRAGMA，连接由连接池复用。"""
+    engine = create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=SQLITE_POOL_MAX_OVERFLOW,
+    )
+    pragmas = SQLITE_PROFILES[profile]
+    if pragmas and engine.dialect.name == "sqlite":
+        @event.listens_for(engine.sync_engine, "connect")
+        def set_pragmas(dbapi_connection: Any, _record: Any) -> None:
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+    return engine
+
+
+engine = create_engine_for(DATABASE_URL)
 AsyncSessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
     engine, expire_on_commit=False
 )
 
 
+async def configure_database(url: str, profile: str = SQLITE_PROFILE) -> None:
+    """切换到另一个数据库（如基准测试用的 movies.db 副本），释放原连接池。"""
+    global engine, AsyncSessionLocal
+    previous = engine
+    engine = create_engine_for(url, profile)
+    AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+    await previous.dispose()
+
+
 async def init_db() -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all 不会给已存在的表补建列和索引，旧数据库在这里迁移
+        await conn.run_sync(_add_missing_columns)
+        created = await conn.run_sync(_create_missing_indexes)
+        if created:
+            await conn.exec_driver_sql("ANALYZE")
 
 
+def _add_missing_columns(connection: Any) -> None:
+    # 只用于后来新增的可空列，ALTER TABLE ADD COLUMN 不会改写已有的行
+    for table in Base.metadata.sorted_tables:
+        existing = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+
+
+def _create_missing_indexes(connection: Any) -> int:
+    existing = {
+        name for (name,) in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")
+    }
+    created = 0
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
+                created += 1
+    return created
+
+
+@db_writer("add_movie")
 async def add_movie(movie_data: dict[str, Any]) -> Literal["success", "duplicate", "fail"]:
     async with AsyncSessionLocal() as session:
         movie = Movie(**movie_data)
@@ -75,6 +206,187 @@ async def add_movie(movie_data: dict[str, Any]) -> Literal["success", "duplicate
                 return 'fail'
 
 
+def is_storable_movie(movie_data: dict[str, Any]) -> bool:
+    """能否写入 movies 表：id、title 与 url 都不为空，否则 add_movies 会将其计为失败。"""
+    return bool(movie_data.get("id") and movie_data.get("title") and movie_data.get("url"))
+
+
+@db_writer("add_movies")
+async def add_movies(movie_items: Sequence[dict[str, Any]]) -> dict[str, int]:
+    """批量插入电影数据，单条 INSERT ... ON CONFLICT DO NOTHING 语句完成，id/url 冲突计为重复。"""
+    if not movie_items:
+        return {"success": 0, "duplicate": 0, "fail": 0}
+
+    payload: list[dict[str, Any]] = []
+    skipped = 0
+    now = datetime.datetime.now(datetime.UTC)
+    for item in movie_items:
+        if not is_storable_movie(item):
+            skipped += 1
+            continue
+        payload.append(
+            {
+                "id": item["id"],
+                "title": item["title"],
+                "year": item.get("year"),
+                "director": item.get("director"),
+                "rating": item.get("rating"),
+                "url": item["url"],
+                "created_at": now,
+                "update_at": now,
+            }
+        )
+
+    if not payload:
+        return {"success": 0, "duplicate": 0, "fail": skipped}
+
+    stmt = (
+        sqlite_insert(Movie)
+        .values(payload)
+        .on_conflict_do_nothing()
+        .returning(Movie.id)
+    )
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            result = await session.execute(stmt)
+            inserted = len(result.scalars().all())
+
+    return {
+        "success": inserted,
+        "duplicate": len(payload) - inserted,
+        "fail": skipped,
+    }
+
+
+REFRESH_COLUMNS = ("title", "year", "director", "rating")
+
+
+def _stale_filter(
+    stale_before: datetime.datetime,
+    recent_stale_before: datetime.datetime,
+    recent_year: str,
+) -> tuple[ColumnElement[bool], ColumnElement[bool]]:
+    is_recent = or_(Movie.year >= recent_year, Movie.rating.is_(None))
+    stale = or_(
+        Movie.update_at < stale_before,
+        and_(is_recent, Movie.update_at < recent_stale_before),
+    )
+    return stale, is_recent
+
+
+async def iter_stale_movies(
+    stale_before: datetime.datetime,
+    recent_stale_before: datetime.datetime,
+    recent_year: str,
+    page_size: int = 500,
+) -> AsyncIterator[list[Movie]]:
+    """按 (update_at, id) 键集分页遍历需要刷新的电影，每次产出一页。
+
+    普通电影在 stale_before 之前更新过即视为过期；近几年上映（year >= recent_year）
+    或尚无评分的电影变化更快，使用更近的 recent_stale_before。
+    """
+    stale, _ = _stale_filter(stale_before, recent_stale_before, recent_year)
+    last_key: tuple[datetime.datetime, int] | None = None
+    while True:
+        if last_key is None:
+            queries = [select(Movie).where(stale).order_by(Movie.update_at, Movie.id)]
+        else:
+            # 与导出相同，拆成两段查询沿 (update_at, id) 索引定位，不用行值比较
+            queries = [
+                select(Movie).where(stale, Movie.update_at == last_key[0], Movie.id > last_key[1])
+                .order_by(Movie.id),
+                select(Movie).where(stale, Movie.update_at > last_key[0])
+                .order_by(Movie.update_at, Movie.id),
+            ]
+        page: list[Movie] = []
+        async with AsyncSessionLocal() as session:
+            for query in queries:
+                page += (await session.execute(query.limit(page_size - len(page)))).scalars().all()
+                if len(page) >= page_size:
+                    break
+        if not page:
+            return
+        last_key = (page[-1].update_at, page[-1].id)
+        yield page
+
+
+async def top_stale_movies(
+    stale_before: datetime.datetime,
+    recent_stale_before: datetime.datetime,
+    recent_year: str,
+    now: datetime.datetime,
+    recent_weight: float,
+    limit: int,
+) -> list[Movie]:
+    """按刷新优先级（未更新的天数，近年上映或尚无评分的乘以 recent_weight）从全部过期电影中取前 limit 部。"""
+    stale, is_recent = _stale_filter(stale_before, recent_stale_before, recent_year)
+    priority = (func.julianday(now) - func.julianday(Movie.update_at)) * case(
+        (is_recent, recent_weight), else_=1.0
+    )
+    query = select(Movie).where(stale).order_by(priority.desc(), Movie.id).limit(limit)
+    async with AsyncSessionLocal() as session:
+        return list((await session.execute(query)).scalars().all())
+
+
+@db_writer("refresh_movies")
+async def refresh_movies(movie_items: Sequence[dict[str, Any]]) -> dict[str, int]:
+    """用重新抓取的数据更新已有电影，只写入发生变化的列并刷新 update_at。
+
+    新数据中为 None 的字段不会覆盖已有值；表中不存在的电影按新增插入。
+    """
+    items = {item["id"]: item for item in movie_items if item.get("id")}
+    skipped = len(movie_items) - len(items)
+    if not items:
+        return {"updated": 0, "unchanged": 0, "inserted": 0, "fail": skipped}
+
+    now = datetime.datetime.now(datetime.UTC)
+    updates: list[dict[str, Any]] = []
+    unchanged = 0
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            rows = await session.execute(
+                select(Movie.id, *(getattr(Movie, column) for column in REFRESH_COLUMNS))
+                .where(Movie.id.in_(list(items)))
+            )
+            existing = {row.id: row for row in rows}
+            for movie_id, row in existing.items():
+                item = items[movie_id]
+                changes = {
+                    column: item[column]
+                    for column in REFRESH_COLUMNS
+                    if item.get(column) is not None and item[column] != getattr(row, column)
+                }
+                if not changes:
+                    unchanged += 1
+                updates.append({"id": movie_id, "update_at": now, **changes})
+            if updates:
+                # ORM 按主键批量 UPDATE，列集合相同的行合并为一次 executemany
+                await session.execute(update(Movie), updates)
+
+    missing = [item for movie_id, item in items.items() if movie_id not in existing]
+    inserted = await add_movies(missing) if missing else {"success": 0, "fail": 0}
+    return {
+        "updated": len(updates) - unchanged,
+        "unchanged": unchanged,
+        "inserted": inserted["success"],
+        "fail": skipped + inserted["fail"],
+    }
+
+
+@db_writer("touch_movies")
+async def touch_movies(movie_ids: Sequence[int]) -> None:
+    """只刷新 update_at（页面未变化或已下架时记录本次检查）。"""
+    if not movie_ids:
+        return
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(
+                update(Movie)
+                .where(Movie.id.in_(list(movie_ids)))
+                .values(update_at=datetime.datetime.now(datetime.UTC))
+            )
+
+
 async def add_sina_stock(
     stock_data: dict[str, Any]
 ) -> Literal["success", "duplicate", "fail"]:
@@ -85,6 +397,40 @@ async def add_sina_stock(
         return "success"
     return "duplicate"
 
+@db_writer("merge_movies")
+async def merge_movies(source_url: str, page_size: int = 1000) -> dict[str, int]:
+    """把另一个数据库（如分片worker的数据库）中的电影合并进当前数据库，update_at 较新的一方胜出。"""
+    source = create_engine_for(source_url)
+    columns = [column.name for column in Movie.__table__.columns]
+    read = 0
+    merged = 0
+    try:
+        last_id = 0
+        while True:
+            async with source.connect() as conn:
+                rows = (
+                    await conn.execute(
+                        select(Movie.__table__).where(Movie.id > last_id).order_by(Movie.id).limit(page_size)
+                    )
+                ).mappings().all()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            read += len(rows)
+            insert = sqlite_insert(Movie).values([{key: row[key] for key in columns} for row in rows])
+            stmt = insert.on_conflict_do_update(
+                index_elements=[Movie.id],
+                set_={key: insert.excluded[key] for key in ("title", "year", "director", "rating", "update_at")},
+                where=Movie.update_at < insert.excluded.update_at,
+            ).returning(Movie.id)
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    merged += len((await session.execute(stmt)).scalars().all())
+    finally:
+        await source.dispose()
+    return {"read": read, "merged": merged}
+
+
 async def get_max_id() -> int:
     async with AsyncSessionLocal() as session:
         result = await session.execute(select(func.max(Movie.id)))
@@ -92,6 +438,57 @@ async def get_max_id() -> int:
         return max_id or 0
 
 
+async def load_sina_snapshot() -> dict[str, tuple[str, str]]:
+    """当前在列表中（未下市）的 sina_us_stocks 快照：symbol -> (name, category)。"""
+    async with AsyncSessionLocal() as session:
+        rows = await session.execute(
+            select(SinaUSStock.symbol, SinaUSStock.name, SinaUSStock.category)
+            .where(SinaUSStock.delisted_at.is_(None))
+        )
+        return {symbol: (name, category) for symbol, name, category in rows.all()}
+
+
+@db_writer("apply_sina_changes")
+async def apply_sina_changes(
+    upserts: Sequence[dict[str, str]],
+    delisted: Sequence[str],
+    history: Sequence[dict[str, Any]],
+) -> None:
+    """在一个事务中写入增量同步的结果：新增/变更（含重新上市）用一条 INSERT ... ON CONFLICT，
+    下市的股票保留并记录 delisted_at，所有变化记入变更历史。"""
+    now = datetime.datetime.now(datetime.UTC)
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            if upserts:
+                stmt = sqlite_insert(SinaUSStock).values(
+                    [{**entry, "created_at": now, "update_at": now} for entry in upserts]
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[SinaUSStock.symbol],
+                    set_={
+                        "category": stmt.excluded.category,
+                        "name": stmt.excluded.name,
+                        "update_at": now,
+                        "delisted_at": None,
+                    },
+                )
+                await session.execute(stmt)
+            if delisted:
+                await session.execute(
+                    update(SinaUSStock)
+                    .where(SinaUSStock.symbol.in_(delisted))
+                    .values(delisted_at=now, update_at=now)
+                )
+            if history:
+                await session.execute(
+                    sqlite_insert(SinaUSStockHistory).values([
+                        {"previous_name": None, "previous_category": None, **entry, "changed_at": now}
+                        for entry in history
+                    ])
+                )
+
+
+@db_writer("upsert_sina_stocks")
 async def upsert_sina_stocks(
     stock_items: Sequence[dict[str, Any]]
 ) -> dict[str, int]:
@@ -142,6 +539,7 @@ async def upsert_sina_stocks(
                     "category": stmt.excluded.category,
                     "name": stmt.excluded.name,
                     "update_at": now,
+                    "delisted_at": None,
                 },
             )
             await session.execute(stmt)
@@ -0,0 +1,279 @@
+"""把 movies / sina_us_stocks 流式导出为 JSONL、CSV 或 Parquet，支持按 update_at 水位增量导出。
+
+按 (update_at, id) 键集分页读取，每页一个短的只读事务：内存占用只与页大小有关，
+也不会长时间持有 SQLite 的读锁而挡住正在运行的爬虫写入（或阻止 WAL checkpoint）。
+每次导出先写临时文件，完成后再改名并更新水位文件，中断时不会留下半个文件或错误的水位。
+
+写入方在提交前就用 Python 取好了 update_at，提交较慢的行可能在时间戳更晚的行导出之后才出现。
+因此只导出 update_at 早于“当前时间 - safety_margin”的行，水位不会越过这个截止时间，
+更晚的行留给下一次导出。导出不执行建表与迁移，只读取数据库中已有的列。
+"""
+import csv
+import datetime
+import importlib.util
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, AsyncIterator, Final, Protocol, Sequence
+
+from sqlalchemy import Column, DateTime, Float, Integer, inspect, select
+
+from crawler import db
+from crawler.config import EXPORT_CHUNK_SIZE, EXPORT_DIR, EXPORT_SAFETY_MARGIN
+from crawler.db import Base, Movie, SinaUSStock
+
+logger = logging.getLogger(__name__)
+
+EXPORT_TABLES: Final[dict[str, type[Base]]] = {
+    "movies": Movie,
+    "sina_us_stocks": SinaUSStock,
+}
+EXPORT_FORMATS: Final[tuple[str, ...]] = ("jsonl", "csv", "parquet")
+WATERMARK_FILE: Final[str] = "watermarks.json"
+
+Key = tuple[datetime.datetime, int]
+Page = Sequence[Sequence[Any]]
+
+
+class ExportWriter(Protocol):
+    """按列顺序接收一页行元组。"""
+
+    def __init__(self, path: Path, columns: list[Column[Any]]) -> None: ...
+
+    def write(self, rows: Page) -> None: ...
+
+    def close(self) -> None: ...
+
+
+def _isoformat(value: Any) -> str:
+    # 与 str(datetime) 相同，CSV 中的时间列因此无需转换
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ")
+    raise TypeError(f"无法序列化为JSON: {type(value).__name__}")
+
+
+class JsonlWriter:
+    def __init__(self, path: Path, columns: list[Column[Any]]) -> None:
+        self._file = open(path, "w", encoding="utf-8")
+        self._names = [column.name for column in columns]
+        self._encode = json.JSONEncoder(ensure_ascii=False, default=_isoformat).encode
+
+    def write(self, rows: Page) -> None:
+        names, encode = self._names, self._encode
+        self._file.writelines(encode(dict(zip(names, row))) + "\n" for row in rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class CsvWriter:
+    def __init__(self, path: Path, columns: list[Column[Any]]) -> None:
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([column.name for column in columns])
+
+    def write(self, rows: Page) -> None:
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter:
+    """每页写成一个 row group，内存中只保留当前页。需要可选依赖 pyarrow。"""
+
+    def __init__(self, path: Path, columns: list[Column[Any]]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        def arrow_type(column: Column[Any]) -> Any:
+            if isinstance(column.type, Integer):
+                return pa.int64()
+            if isinstance(column.type, Float):
+                return pa.float64()
+            if isinstance(column.type, DateTime):
+                return pa.timestamp("us")
+            return pa.string()
+
+        self._pa = pa
+        self._schema = pa.schema([pa.field(column.name, arrow_type(column)) for column in columns])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write(self, rows: Page) -> None:
+        pa = self._pa
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), self._schema)]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+WRITERS: Final[dict[str, type[ExportWriter]]] = {
+    "jsonl": JsonlWriter,
+    "csv": CsvWriter,
+    "parquet": ParquetWriter,
+}
+
+
+def check_format(fmt: str) -> None:
+    if fmt not in WRITERS:
+        raise ValueError(f"不支持的导出格式: {fmt}，可选 {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise RuntimeError("导出 Parquet 需要安装 pyarrow：uv sync --extra export")
+
+
+def load_watermarks(directory: str | Path = EXPORT_DIR) -> dict[str, Key]:
+    """各表上次导出到的 (update_at, id)。"""
+    path = Path(directory) / WATERMARK_FILE
+    if not path.exists():
+        return {}
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return {
+        table: (datetime.datetime.fromisoformat(mark["update_at"]), mark["id"])
+        for table, mark in data.items()
+    }
+
+
+def save_watermark(table: str, key: Key, directory: str | Path = EXPORT_DIR) -> None:
+    path = Path(directory) / WATERMARK_FILE
+    data = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    data[table] = {"update_at": key[0].isoformat(sep=" "), "id": key[1]}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+async def existing_columns(model: type[Base]) -> list[Column[Any]]:
+    """表定义中在当前数据库里已存在的列（按表定义顺序）；表不存在时为空。"""
+    table = Base.metadata.tables[model.__tablename__]
+
+    def read(connection: Any) -> set[str]:
+        inspector = inspect(connection)
+        if not inspector.has_table(table.name):
+            return set()
+        return {column["name"] for column in inspector.get_columns(table.name)}
+
+    async with db.engine.connect() as conn:
+        names = await conn.run_sync(read)
+    return [column for column in table.columns if column.name in names]
+
+
+async def iter_table_pages(
+    model: type[Base],
+    since: Key | None = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    until: datetime.datetime | None = None,
+    columns: Sequence[Column[Any]] | None = None,
+) -> AsyncIterator[Page]:
+    """按 (update_at, id) 键集分页读取整表或 since 之后更新的行，每次产出一页行元组。
+
+    列顺序同 columns（默认为表定义）。全量导出时先按 id 读出 update_at 为空的旧数据行，
+    增量导出不包含这些行；给出 until 时只读取 update_at 早于它的行。
+    """
+    table = Base.metadata.tables[model.__tablename__]
+    selected = list(columns) if columns is not None else list(table.columns)
+    update_at, row_id = table.c.update_at, table.c.id
+    update_index = selected.index(update_at)
+    id_index = selected.index(row_id)
+    columns_query = select(*selected)
+    dated = columns_query.where(update_at < until) if until is not None else columns_query
+
+    async def fetch(*queries: Any) -> list[Any]:
+        # 每页一个短事务，页与页之间不持有读锁
+        rows: list[Any] = []
+        async with db.AsyncSessionLocal() as session:
+            for query in queries:
+                rows += (await session.execute(query.limit(chunk_size - len(rows)))).all()
+                if len(rows) >= chunk_size:
+                    break
+        return rows
+
+    if since is None:
+        last_id = None
+        while True:
+            query = columns_query.where(update_at.is_(None))
+            if last_id is not None:
+                query = query.where(row_id > last_id)
+            page = await fetch(query.order_by(row_id))
+            if not page:
+                break
+            last_id = page[-1][id_index]
+            yield page
+
+    key = since
+    while True:
+        if key is None:
+            queries = [dated.where(update_at.is_not(None)).order_by(update_at, row_id)]
+        else:
+            # 拆成两段查询，都能沿 (update_at, id) 索引直接定位；
+            # 行值比较 (update_at, id) > (?, ?) 只按 update_at 定位，同一时间戳的大量行会被反复扫描
+            queries = [
+                dated.where(update_at == key[0], row_id > key[1]).order_by(row_id),
+                dated.where(update_at > key[0]).order_by(update_at, row_id),
+            ]
+        page = await fetch(*queries)
+        if not page:
+            return
+        key = (page[-1][update_index], page[-1][id_index])
+        yield page
+
+
+async def export_table(
+    table: str,
+    fmt: str = "jsonl",
+    directory: str | Path = EXPORT_DIR,
+    incremental: bool = False,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    safety_margin: float = EXPORT_SAFETY_MARGIN,
+) -> dict[str, Any]:
+    """导出一张表，返回导出的行数、文件路径与水位。
+
+    全量导出写入 <directory>/<table>.<fmt>；增量导出只包含上次水位之后更新的行，
+    写入带时间戳的新文件，没有新行时不生成文件。两者完成后都会更新水位。
+    最近 safety_margin 秒内更新的行可能还有更早时间戳的行未提交，留到下一次导出。
+    """
+    check_format(fmt)
+    model = EXPORT_TABLES[table]
+    columns = await existing_columns(model)
+    if not columns:
+        logger.warning("%s: 数据库中没有这张表，跳过导出", table)
+        return {"table": table, "rows": 0, "path": None, "since": None}
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    since = load_watermarks(directory).get(table) if incremental else None
+    # SQLite 中的 update_at 为不带时区的 UTC 时间
+    until = datetime.datetime.now(datetime.UTC).replace(tzinfo=None) - datetime.timedelta(seconds=safety_margin)
+    if incremental:
+        stamp = datetime.datetime.now(datetime.UTC).strftime("%Y%m%dT%H%M%S")
+        path = directory / f"{table}-{stamp}.{fmt}"
+    else:
+        path = directory / f"{table}.{fmt}"
+    tmp = path.with_name(path.name + ".tmp")
+
+    names = [column.name for column in columns]
+    update_index, id_index = names.index("update_at"), names.index("id")
+    rows = 0
+    last_key: Key | None = None
+    writer = WRITERS[fmt](tmp, columns)
+    try:
+        async for page in iter_table_pages(model, since, chunk_size, until, columns):
+            writer.write(page)
+            rows += len(page)
+            if page[-1][update_index] is not None:
+                last_key = (page[-1][update_index], page[-1][id_index])
+    except BaseException:
+        writer.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    writer.close()
+
+    if incremental and rows == 0:
+        tmp.unlink(missing_ok=True)
+        logger.info("%s: 水位 %s 之后没有更新的行", table, since)
+        return {"table": table, "rows": 0, "path": None, "since": since}
+    os.replace(tmp, path)
+    if last_key is not None:
+        save_watermark(table, last_key, directory)
+    logger.info("%s: 导出 %d 行到 %s", table, rows, path)
+    return {"table": table, "rows": rows, "path": str(path), "since": since}
@@ -0,0 +1,182 @@
+import datetime
+import itertools
+from typing import Container, Final, Iterable, Literal, Mapping
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from crawler import db
+from crawler.config import (
+    FRONTIER_MAX_ATTEMPTS,
+    FRONTIER_RETRY_BASE,
+    FRONTIER_RETRY_MAX,
+)
+from crawler.db import CrawlFrontier
+from crawler.metrics import db_writer
+from crawler.parsers import extract_subject_id
+
+PENDING: Final[str] = "pending"
+IN_FLIGHT: Final[str] = "in_flight"
+DONE: Final[str] = "done"
+NOT_FOUND: Final[str] = "not_found"
+FAILED: Final[str] = "failed"
+# 命中响应缓存、页面未变化；在队列中按 done 记录
+UNCHANGED: Final[str] = "unchanged"
+
+Outcome = Literal["done", "unchanged", "not_found", "failed"]
+
+SUBJECT_URL: Final[str] = "https://movie.douban.com/subject/{}/"
+_SEED_CHUNK: Final[int] = 5000
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.UTC)
+
+
+class Frontier:
+    """基于 crawl_frontier 表的持久化抓取队列。
+
+    claim() 把可领取的URL原子地标记为 in_flight，抓取结束后由 mark() 写回
+    done / not_found / failed；失败的URL按尝试次数指数退避后才可再次领取，
+    超过 max_attempts 次即不再领取。进程崩溃遗留的 in_flight 由 recover() 放回队列。
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = FRONTIER_MAX_ATTEMPTS,
+        retry_base: float = FRONTIER_RETRY_BASE,
+        retry_max: float = FRONTIER_RETRY_MAX,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+
+    async def seed_urls(self, urls: Iterable[str]) -> int:
+        """把URL加入队列，已存在的URL保持原状态，返回新加入的数量。"""
+        now = _now()
+        inserted = 0
+        async with db.AsyncSessionLocal() as session:
+            async with session.begin():
+                for chunk in itertools.batched(urls, _SEED_CHUNK):
+                    rows = [
+                        {
+                            "url": url,
+                            "subject_id": extract_subject_id(url),
+                            "state": PENDING,
+                            "attempts": 0,
+                            "next_eligible_at": now,
+                            "updated_at": now,
+                        }
+                        for url in chunk
+                    ]
+                    stmt = (
+                        sqlite_insert(CrawlFrontier)
+                        .values(rows)
+                        .on_conflict_do_nothing()
+                        .returning(CrawlFrontier.url)
+                    )
+                    result = await session.execute(stmt)
+                    inserted += len(result.scalars().all())
+        return inserted
+
+    async def seed_range(self, start_id: int, count: int, skip: Container[int] = ()) -> int:
+        """按豆瓣 subject ID 连续区间加入队列，skip 中的 ID（如已知ID索引）不加入。"""
+        return await self.seed_urls(
+            SUBJECT_URL.format(subject_id)
+            for subject_id in range(start_id, start_id + count)
+            if subject_id not in skip
+        )
+
+    async def recover(self) -> int:
+        """把上次运行遗留的 in_flight 状态放回 pending，返回恢复的数量。"""
+        async with db.AsyncSessionLocal() as session:
+            async with session.begin():
+                result = await session.execute(
+                    update(CrawlFrontier)
+                    .where(CrawlFrontier.state == IN_FLIGHT)
+                    .values(state=PENDING, updated_at=_now())
+                    .returning(CrawlFrontier.url)
+                )
+                recovered = len(result.scalars().all())
+        return recovered
+
+    async def claim(self, limit: int) -> list[str]:
+        """领取最多 limit 个到期的URL（按 subject ID 升序），并标记为 in_flight。"""
+        now = _now()
+        eligible = (
+            select(CrawlFrontier.url)
+            .where(
+                or_(
+                    CrawlFrontier.state == PENDING,
+                    and_(
+                        CrawlFrontier.state == FAILED,
+                        CrawlFrontier.attempts < self.max_attempts,
+                    ),
+                ),
+                CrawlFrontier.next_eligible_at <= now,
+            )
+            .order_by(CrawlFrontier.subject_id)
+            .limit(limit)
+        )
+        stmt = (
+            update(CrawlFrontier)
+            .where(CrawlFrontier.url.in_(eligible.scalar_subquery()))
+            .values(state=IN_FLIGHT, updated_at=now)
+            .returning(CrawlFrontier.url, CrawlFrontier.subject_id)
+        )
+        async with db.AsyncSessionLocal() as session:
+            async with session.begin():
+                rows = (await session.execute(stmt)).all()
+        return [url for url, _ in sorted(rows, key=lambda row: row[1] or 0)]
+
+    @db_writer("frontier_mark")
+    async def mark(self, outcomes: Mapping[str, Outcome]) -> None:
+        """写回一批URL的抓取结果。"""
+        if not outcomes:
+            return
+        now = _now()
+        by_state: dict[str, list[str]] = {}
+        for url, outcome in outcomes.items():
+            by_state.setdefault(DONE if outcome == UNCHANGED else outcome, []).append(url)
+        async with db.AsyncSessionLocal() as session:
+            async with session.begin():
+                for state in (DONE, NOT_FOUND):
+                    if by_state.get(state):
+                        await session.execute(
+                            update(CrawlFrontier)
+                            .where(CrawlFrontier.url.in_(by_state[state]))
+                            .values(state=state, updated_at=now)
+                        )
+                failed = by_state.get(FAILED)
+                if failed:
+                    rows = await session.execute(
+                        select(CrawlFrontier.url, CrawlFrontier.attempts)
+                        .where(CrawlFrontier.url.in_(failed))
+                    )
+                    params = []
+                    for url, attempts in rows.all():
+                        delay = min(self.retry_base * 2 ** attempts, self.retry_max)
+                        params.append(
+                            {
+                                "url": url,
+                                "state": FAILED,
+                                "attempts": attempts + 1,
+                                "next_eligible_at": now + datetime.timedelta(seconds=delay),
+                                "updated_at": now,
+                            }
+                        )
+                    # 按主键批量更新
+                    await session.execute(update(CrawlFrontier), params)
+
+    async def max_subject_id(self) -> int:
+        async with db.AsyncSessionLocal() as session:
+            result = await session.execute(select(func.max(CrawlFrontier.subject_id)))
+            return result.scalar() or 0
+
+    async def counts(self) -> dict[str, int]:
+        """各状态的URL数量。"""
+        async with db.AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(CrawlFrontier.state, func.count()).group_by(CrawlFrontier.state)
+            )
+            return {state: count for state, count in result.all()}
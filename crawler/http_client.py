@@ -0,0 +1,143 @@
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Final
+
+import httpx
+
+from crawler.config import (
+    HTTP2_ENABLED,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CLIENTS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_TIMEOUT,
+)
+
+DIRECT_ROUTE: Final[str] = "direct"
+PROXY_ROUTE: Final[str] = "proxy"
+
+
+class HttpClientManager:
+    """按路由（代理地址或直连）缓存长生命周期的 httpx.AsyncClient。
+
+    同一路由的请求共享连接池，复用 keep-alive 连接与 HTTP/2 多路复用，
+    避免每个 URL 都重新进行 TCP + TLS 握手。通过 lease() 取得的客户端计为使用中，
+    被 LRU 淘汰或 discard() 时等最后一个请求结束后再关闭。
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout: float = HTTP_TIMEOUT,
+        http2: bool = HTTP2_ENABLED,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        max_clients: int = HTTP_MAX_CLIENTS,
+    ) -> None:
+        self._timeout = timeout
+        self._http2 = http2
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._max_clients = max_clients
+        self._clients: OrderedDict[str, httpx.AsyncClient] = OrderedDict()
+        self._closing: set[asyncio.Task[None]] = set()
+        self._in_flight: dict[httpx.AsyncClient, int] = {}
+        # 已移出缓存、但仍有请求在使用的客户端
+        self._retired: set[httpx.AsyncClient] = set()
+
+    def client(self, proxy: str | None = None) -> httpx.AsyncClient:
+        """返回指定代理（None 表示直连）对应的共享客户端，不存在则创建。"""
+        route = proxy or DIRECT_ROUTE
+        client = self._clients.get(route)
+        if client is not None:
+            self._clients.move_to_end(route)
+            return client
+        client = httpx.AsyncClient(
+            proxy=f"http://{proxy}" if proxy else None,
+            timeout=self._timeout,
+            http2=self._http2,
+            limits=self._limits,
+        )
+        self._clients[route] = client
+        while len(self._clients) > self._max_clients:
+            _, stale = self._clients.popitem(last=False)
+            self._retire(stale)
+        return client
+
+    @asynccontextmanager
+    async def lease(self, proxy: str | None = None) -> AsyncIterator[httpx.AsyncClient]:
+        """在一次请求期间借用共享客户端，期间该客户端不会被关闭。"""
+        client = self.client(proxy)
+        self._in_flight[client] = self._in_flight.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            remaining = self._in_flight.pop(client) - 1
+            if remaining:
+                self._in_flight[client] = remaining
+            elif client in self._retired:
+                self._retired.discard(client)
+                self._close_later(client)
+
+    def discard(self, proxy: str | None) -> None:
+        """丢弃某个代理的客户端（例如代理失效后），连接在后台关闭。"""
+        client = self._clients.pop(proxy or DIRECT_ROUTE, None)
+        if client is not None:
+            self._retire(client)
+
+    def _retire(self, client: httpx.AsyncClient) -> None:
+        if self._in_flight.get(client):
+            self._retired.add(client)
+        else:
+            self._close_later(client)
+
+    def _close_later(self, client: httpx.AsyncClient) -> None:
+        task = asyncio.get_running_loop().create_task(client.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def aclose(self) -> None:
+        clients = [*self._clients.values(), *self._retired]
+        self._clients.clear()
+        self._retired.clear()
+        await asyncio.gather(
+            *(client.aclose() for client in clients),
+            *self._closing,
+            return_exceptions=True,
+        )
+
+    async def __aenter__(self) -> "HttpClientManager":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+
+_default_manager: HttpClientManager | None = None
+
+
+def get_client_manager() -> HttpClientManager:
+    """进程级共享的客户端管理器，首次调用时创建。"""
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = HttpClientManager()
+    return _default_manager
+
+
+def discard_client(proxy: str | None) -> None:
+    """丢弃共享管理器中某个代理的客户端，供代理池淘汰代理时调用。"""
+    if _default_manager is not None:
+        _default_manager.discard(proxy)
+
+
+async def close_clients() -> None:
+    """关闭共享管理器持有的全部连接，应在程序退出前调用。"""
+    global _default_manager
+    if _default_manager is not None:
+        manager, _default_manager = _default_manager, None
+        await manager.aclose()
@@ -0,0 +1,29 @@
+import json
+import logging
+import sys
+
+from crawler.config import LOG_FORMAT
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行 JSON，便于日志系统聚合。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def setup_logging(level: str = "INFO", json_format: bool = False) -> None:
+    """配置根日志：逐URL的明细在 DEBUG 级别，默认 INFO 只输出汇总与异常。"""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT))
+    logging.basicConfig(level=level.upper(), handlers=[handler], force=True)
+    # httpx 每个请求都会打 INFO 日志，抓取量大时只保留警告
+    logging.getLogger("httpx").setLevel(max(logging.WARNING, logging.getLogger().level))
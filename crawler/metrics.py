@@ -0,0 +1,311 @@
+"""进程内的抓取指标：计数器、仪表与直方图，可通过本地 HTTP 端点或定期 JSON 快照导出。"""
+import abc
+import asyncio
+import bisect
+import functools
+import json
+import logging
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Final, Iterator, ParamSpec, Sequence, TypeVar
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+LATENCY_BUCKETS: Final[tuple[float, ...]] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+    5.0, 10.0, 30.0,
+)
+
+LabelKey = tuple[str, ...]
+
+
+class _Metric(abc.ABC):
+    kind: str = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict[str, Any]) -> LabelKey:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: LabelKey) -> dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    @abc.abstractmethod
+    def reset(self) -> None:
+        """清空已记录的样本。"""
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        """按 Prometheus 文本格式展开的样本：(名称, 标签, 值)。"""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def reset(self) -> None:
+        self._values.clear()
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for key, value in self._values.items():
+            yield self.name, self._labels(key), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._values[self._key(labels)] = value
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        self._series: dict[LabelKey, _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _HistogramSeries(len(self.buckets) + 1)
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    def reset(self) -> None:
+        self._series.clear()
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q: float, **labels: Any) -> float | None:
+        """按桶线性插值估算分位数；指定的标签为空时合并所有序列。"""
+        if labels:
+            series = [s for k, s in self._series.items() if k == self._key(labels)]
+        else:
+            series = list(self._series.values())
+        counts = [sum(s.counts[i] for s in series) for i in range(len(self.buckets) + 1)]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for key, series in self._series.items():
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, series.count
+            yield f"{self.name}_sum", labels, series.sum
+            yield f"{self.name}_count", labels, series.count
+
+    def summaries(self) -> Iterator[dict[str, Any]]:
+        for key, series in self._series.items():
+            labels = self._labels(key)
+            yield {
+                "labels": labels,
+                "count": series.count,
+                "sum": round(series.sum, 6),
+                "p50": self.quantile(0.5, **labels),
+                "p99": self.quantile(0.99, **labels),
+            }
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def reset(self) -> None:
+        """清空所有已记录的样本（基准测试在各场景之间调用）。"""
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文本格式。"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict[str, Any]:
+        """JSON 友好的快照，直方图给出次数、总和与 p50/p99 估计。"""
+        metrics: dict[str, Any] = {}
+        for metric in self._metrics.values():
+            if isinstance(metric, Histogram):
+                samples = list(metric.summaries())
+            else:
+                samples = [{"labels": labels, "value": value} for _, labels, value in metric.samples()]
+            metrics[metric.name] = {"type": metric.kind, "help": metric.help, "samples": samples}
+        return {"timestamp": time.time(), "metrics": metrics}
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), "")}"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+REGISTRY: Final[Registry] = Registry()
+
+# route只取direct/proxy两个值：代理地址不断轮换，按地址打标签会让序列数无限增长
+REQUEST_LATENCY = REGISTRY.histogram(
+    "crawler_request_seconds", "HTTP request latency by direct/proxy route", ("host", "route")
+)
+RESPONSES = REGISTRY.counter("crawler_responses_total", "HTTP responses by status code", ("host", "status"))
+REQUEST_ERRORS = REGISTRY.counter("crawler_request_errors_total", "Requests that raised before a response", ("host",))
+BANS = REGISTRY.counter("crawler_bans_total", "Ban / anti-bot responses", ("host",))
+FETCH_OUTCOMES = REGISTRY.counter("crawler_fetch_outcomes_total", "Final per-URL outcomes", ("outcome",))
+RETRIES = REGISTRY.counter("crawler_retries_total", "Retries scheduled after a failed fetch", ("error",))
+PARSE_SECONDS = REGISTRY.histogram("crawler_parse_seconds", "HTML parse time", ("page",))
+DB_FLUSH_SECONDS = REGISTRY.histogram("crawler_db_flush_seconds", "Database write batch time", ("op",))
+DB_ROWS = REGISTRY.counter("crawler_db_rows_total", "Rows handled by database writers", ("op", "result"))
+QUEUE_DEPTH = REGISTRY.gauge("crawler_queue_depth", "Items waiting in internal queues", ("queue",))
+SLOT_WAIT_SECONDS = REGISTRY.histogram(
+    "crawler_slot_wait_seconds", "Time spent waiting for a per-host concurrency slot and token", ("host",)
+)
+PROXY_ACQUIRE_SECONDS = REGISTRY.histogram("crawler_proxy_acquire_seconds", "Time to obtain a proxy", ("result",))
+PROXY_POOL_SIZE = REGISTRY.gauge("crawler_proxy_pool_size", "Validated proxies in the local pool")
+
+
+def db_writer(op: str) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    """数据库写入函数的装饰器：记录每批耗时，返回统计字典时按结果累计行数。"""
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with DB_FLUSH_SECONDS.time(op=op):
+                result = await func(*args, **kwargs)
+            if isinstance(result, dict):
+                for key, value in result.items():
+                    if value:
+                        DB_ROWS.inc(value, op=op, result=key)
+            return result
+        return wrapper
+    return decorator
+
+
+async def serve_metrics(host: str, port: int, registry: Registry = REGISTRY) -> asyncio.Server:
+    """启动本地 HTTP 端点：/metrics 为 Prometheus 文本格式，/metrics.json 为 JSON 快照。"""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else "/"
+            if path.startswith("/metrics.json"):
+                status, content_type = "200 OK", "application/json"
+                body = json.dumps(registry.snapshot(), ensure_ascii=False).encode()
+            elif path.startswith("/metrics"):
+                status, content_type = "200 OK", "text/plain; version=0.0.4"
+                body = registry.render_prometheus().encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info("指标端点已启动: http://%s:%d/metrics", host, port)
+    return server
+
+
+async def write_snapshots(path: str | Path, interval: float, registry: Registry = REGISTRY) -> None:
+    """每隔 interval 秒把 JSON 快照写入 path（先写临时文件再替换），取消时再写最后一次。"""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    def dump() -> None:
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        tmp.write_text(json.dumps(registry.snapshot(), ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(target)
+
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            dump()
+    finally:
+        dump()
@@ -0,0 +1,38 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from crawler.parsers import parse_movie_bytes
+from crawler.sina_us_stock import parse_sina_us_stock_html
+
+
+class ParseExecutor:
+    """把 HTML 解析放到进程池中执行，事件循环只负责网络 IO。
+
+    worker 接收原始响应字节与编码，返回普通的 dict/list，解析吞吐可随 CPU 核数扩展。
+    使用 spawn 方式启动子进程，避免 fork 带走 aiosqlite 等后台线程的状态。
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    async def parse_movie(self, content: bytes, encoding: str | None, url: str) -> dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, parse_movie_bytes, content, encoding, url)
+
+    async def parse_sina(self, content: bytes, encoding: str | None) -> list[dict[str, str]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, parse_sina_us_stock_html, content, encoding)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "ParseExecutor":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,153 @@
+"""豆瓣电影详情页解析：可替换的后端，输出与原 BeautifulSoup 实现相同的 movie_data。
+
+auto 依次选用 selectolax、lxml（均为可选依赖）或正则定点提取；快速后端缺少
+必填字段时再用 BeautifulSoup 复核一次。
+"""
+import functools
+import html as html_lib
+import importlib.util
+import re
+from typing import Any, Callable, Final
+
+from crawler.config import PARSER_BACKEND
+
+Fields = tuple[str | None, str | None, str | None, str | None]
+
+SUBJECT_ID_RE: Final[re.Pattern[str]] = re.compile(r"subject/(\d+)(/|$)")
+REQUIRED_FIELDS: Final[tuple[str, ...]] = ("id", "title", "year", "director")
+
+_TITLE_RE = re.compile(r'<span\b[^>]*\sproperty="v:itemreviewed"[^>]*>(.*?)</span>', re.S)
+_YEAR_RE = re.compile(r'<span\b[^>]*\sclass="(?:[^"]*\s)?year(?:\s[^"]*)?"[^>]*>(.*?)</span>', re.S)
+_DIRECTOR_RE = re.compile(
+    r'<a\b[^>]*\srel="(?:[^"]*\s)?v:directedBy(?:\s[^"]*)?"[^>]*>(.*?)</a>', re.S
+)
+_RATING_RE = re.compile(
+    r'<strong\b(?=[^>]*\sclass="ll rating_num")(?=[^>]*\sproperty="v:average")[^>]*>(.*?)</strong>',
+    re.S,
+)
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def extract_subject_id(url: str) -> int | None:
+    match = SUBJECT_ID_RE.search(url)
+    return int(match.group(1)) if match else None
+
+
+def _regex_fields(text: str) -> Fields:
+    def grab(pattern: re.Pattern[str]) -> str | None:
+        match = pattern.search(text)
+        if match is None:
+            return None
+        return html_lib.unescape(_TAG_RE.sub("", match.group(1)))
+
+    return grab(_TITLE_RE), grab(_YEAR_RE), grab(_DIRECTOR_RE), grab(_RATING_RE)
+
+
+def _lxml_fields(text: str) -> Fields:
+    from lxml import html as lxml_html
+
+    root = lxml_html.fromstring(text)
+
+    def grab(xpath: str) -> str | None:
+        nodes = root.xpath(xpath)
+        return nodes[0].text_content() if nodes else None
+
+    return (
+        grab('//span[@property="v:itemreviewed"]'),
+        grab('//span[contains(concat(" ", normalize-space(@class), " "), " year ")]'),
+        grab('//a[contains(concat(" ", normalize-space(@rel), " "), " v:directedBy ")]'),
+        grab('//strong[@class="ll rating_num"][@property="v:average"]'),
+    )
+
+
+def _selectolax_fields(text: str) -> Fields:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(text)
+
+    def grab(selector: str) -> str | None:
+        node = tree.css_first(selector)
+        return node.text() if node is not None else None
+
+    return (
+        grab('span[property="v:itemreviewed"]'),
+        grab("span.year"),
+        grab('a[rel~="v:directedBy"]'),
+        grab('strong[class="ll rating_num"][property="v:average"]'),
+    )
+
+
+def _bs4_fields(text: str) -> Fields:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(text, "html.parser")
+    title = soup.find("span", property="v:itemreviewed")
+    year = soup.find("span", class_="year")
+    director = soup.find("a", rel="v:directedBy")
+    rating = soup.find("strong", class_="ll rating_num", property="v:average")
+    return (
+        title.text if title else None,
+        year.text if year else None,
+        director.text if director else None,
+        rating.text if rating else None,
+    )
+
+
+BACKENDS: Final[dict[str, Callable[[str], Fields]]] = {
+    "selectolax": _selectolax_fields,
+    "lxml": _lxml_fields,
+    "regex": _regex_fields,
+    "bs4": _bs4_fields,
+}
+_AUTO_ORDER: Final[tuple[str, ...]] = ("selectolax", "lxml", "regex")
+_OPTIONAL_MODULES: Final[dict[str, str]] = {"selectolax": "selectolax.lexbor", "lxml": "lxml.html"}
+
+
+@functools.cache
+def available_backends() -> tuple[str, ...]:
+    """当前环境中可用的后端名称。"""
+    names = []
+    for name in BACKENDS:
+        module = _OPTIONAL_MODULES.get(name)
+        if module is None or importlib.util.find_spec(module.split(".")[0]) is not None:
+            names.append(name)
+    return tuple(names)
+
+
+def resolve_backend(backend: str | None = None) -> str:
+    backend = backend or PARSER_BACKEND
+    if backend != "auto":
+        if backend not in BACKENDS:
+            raise ValueError(f"未知的解析后端: {backend}")
+        return backend
+    available = available_backends()
+    return next(name for name in _AUTO_ORDER if name in available)
+
+
+def _build_movie_data(fields: Fields, url: str) -> dict[str, Any]:
+    title, year, director, rating = fields
+    url_id = extract_subject_id(url)
+    return {
+        "id": url_id,
+        "title": title.strip() if title is not None else None,
+        "year": year.strip("() ") if year is not None else None,
+        "director": director.strip() if director is not None else None,
+        "rating": float(rating.strip()) if rating is not None and rating.strip() else None,
+        "url": url,
+    }
+
+
+def parse_movie(text: str, url: str, backend: str | None = None) -> dict[str, Any]:
+    """解析详情页，返回 movie_data 字典（字段缺失时值为 None）。"""
+    name = resolve_backend(backend)
+    movie_data = _build_movie_data(BACKENDS[name](text), url)
+    if name != "bs4" and (backend or PARSER_BACKEND) == "auto" and movie_data["id"]:
+        if not all(movie_data[key] for key in REQUIRED_FIELDS):
+            # 快速后端未取全字段时用 BeautifulSoup 复核，保证与旧实现一致
+            movie_data = _build_movie_data(_bs4_fields(text), url)
+    return movie_data
+
+
+def parse_movie_bytes(content: bytes, encoding: str | None, url: str) -> dict[str, Any]:
+    """按响应编码解码原始字节后解析，供进程池中的 worker 调用。"""
+    return parse_movie(content.decode(encoding or "utf-8", errors="replace"), url)
@@ -1,39 +1,362 @@
 import asyncio
-from typing import Final
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Container, Final
 
-import aiohttp
+from crawler.config import (
+    PROXY_ACQUIRE_TIMEOUT,
+    PROXY_COOLDOWN,
+    PROXY_MAX_FAILURES,
+    PROXY_POOL_API,
+    PROXY_POOL_MAX_SIZE,
+    PROXY_POOL_MIN_SIZE,
+    PROXY_REVALIDATE_INTERVAL,
+    PROXY_TEST_URL,
+    PROXY_VALIDATE_CONCURRENCY,
+)
+from crawler.http_client import discard_client
+from crawler.metrics import PROXY_ACQUIRE_SECONDS, PROXY_POOL_SIZE
 
-PROXY_POOL_API: Final[str] = "http://127.0.0.1:5010/get/"  # 可在config.py中配置
-REQUEST_TIMEOUT: Final[aiohttp.ClientTimeout] = aiohttp.ClientTimeout(total=5)
+if TYPE_CHECKING:
+    import aiohttp
 
+logger = logging.getLogger(__name__)
 
-async def get_proxy() -> str | None:
-    async with aiohttp.ClientSession(timeout=REQUEST_TIMEOUT) as session:
+REQUEST_TIMEOUT: Final[float] = 5.0  # 代理API请求与代理校验的超时（秒）
+BAN_STATUSES: Final[frozenset[int]] = frozenset({403, 418})
+LATENCY_ALPHA: Final[float] = 0.3  # 延迟的指数滑动平均系数
+
+
+def _client_session() -> "aiohttp.ClientSession":
+    # aiohttp 只在启用代理池时才用到，延迟导入以免拖慢其他模式的启动
+    import aiohttp
+
+    return aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+
+
+async def get_proxy(
+    session: "aiohttp.ClientSession | None" = None,
+    api_url: str = PROXY_POOL_API,
+) -> str | None:
+    if session is None:
+        async with _client_session() as own_session:
+            return await get_proxy(own_session, api_url)
+    try:
+        async with session.get(api_url) as resp:
+            if resp.status == 200:
+                proxy = await resp.text()
+                return proxy.strip() or None
+    except Exception:
+        return None
+    return None
+
+
+def is_ban_response(status: int, location: str = "", text: str = "") -> bool:
+    """判断响应是否为豆瓣的封禁/反爬信号（403/418 或跳转到 sec.douban.com）。"""
+    return status in BAN_STATUSES or is_block_response(status, location, text)
+
+
+def is_block_response(status: int, location: str = "", text: str = "") -> bool:
+    """判断响应是否针对整个IP的拦截（跳转到 sec.douban.com 或"异常请求"页面），而非单个页面被拒。"""
+    if "sec.douban.com" in location:
+        return True
+    return status == 200 and ("sec.douban.com" in text or "有异常请求从你的 IP 发出" in text)
+
+
+@dataclass
+class ProxyStats:
+    """单个代理的健康状况。"""
+
+    address: str
+    latency: float | None = None
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    bans: int = 0
+    last_checked: float = 0.0
+
+    @property
+    def success_rate(self) -> float:
+        # 拉普拉斯平滑，新代理从 0.5 起步
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    @property
+    def score(self) -> float:
+        latency = self.latency if self.latency is not None else 1.0
+        return self.success_rate / (1.0 + latency) / (1 + self.bans)
+
+
+class ProxyPool:
+    """本地代理池：后台从代理池API预取并并发校验，按健康评分分配代理。
+
+    acquire() 只从内存中取已校验的代理；调用方通过 report() 回报每次请求的
+    结果，被封禁或连续失败的代理会被移出并进入冷却期，冷却期内不会再被收录。
+    """
+
+    def __init__(
+        self,
+        api_url: str = PROXY_POOL_API,
+        test_url: str = PROXY_TEST_URL,
+        min_size: int = PROXY_POOL_MIN_SIZE,
+        max_size: int = PROXY_POOL_MAX_SIZE,
+        validate_concurrency: int = PROXY_VALIDATE_CONCURRENCY,
+        cooldown: float = PROXY_COOLDOWN,
+        max_failures: int = PROXY_MAX_FAILURES,
+        acquire_timeout: float = PROXY_ACQUIRE_TIMEOUT,
+        revalidate_interval: float = PROXY_REVALIDATE_INTERVAL,
+    ) -> None:
+        self.api_url = api_url
+        self.test_url = test_url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.validate_concurrency = validate_concurrency
+        self.cooldown = cooldown
+        self.max_failures = max_failures
+        self.acquire_timeout = acquire_timeout
+        self.revalidate_interval = revalidate_interval
+
+        self._proxies: dict[str, ProxyStats] = {}
+        self._cooldown_until: dict[str, float] = {}
+        self._need_refill = asyncio.Event()
+        self._added = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._session: "aiohttp.ClientSession | None" = None
+
+        self.hits = 0
+        self.misses = 0
+        self.validated = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    # ---- 对外接口 ----
+
+    async def acquire(self, exclude: Container[str] = ()) -> str | None:
+        """取一个评分靠前的代理（尽量避开 exclude 中的代理）；池为空时等待后台补充，超时返回 None。"""
+        self._ensure_started()
+        start = time.perf_counter()
+        proxy = self._pick(exclude)
+        if proxy is not None:
+            self.hits += 1
+            PROXY_ACQUIRE_SECONDS.observe(time.perf_counter() - start, result="hit")
+            return proxy
+        self.misses += 1
+        self._need_refill.set()
         try:
-            async with session.get(PROXY_POOL_API) as resp:
-                if resp.status == 200:
-                    proxy = await resp.text()
-                    return proxy.strip()
-        except Exception:
+            async with asyncio.timeout(self.acquire_timeout):
+                while (proxy := self._pick(exclude)) is None:
+                    self._added.clear()
+                    await self._added.wait()
+        except TimeoutError:
+            PROXY_ACQUIRE_SECONDS.observe(time.perf_counter() - start, result="timeout")
             return None
-    return None
+        PROXY_ACQUIRE_SECONDS.observe(time.perf_counter() - start, result="miss")
+        return proxy
 
+    def report(
+        self,
+        proxy: str,
+        ok: bool,
+        latency: float | None = None,
+        banned: bool = False,
+    ) -> None:
+        """回报一次真实请求的结果，用于更新评分或淘汰代理。"""
+        stats = self._proxies.get(proxy)
+        if stats is None:
+            return
+        if ok:
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            if latency is not None:
+                stats.latency = _ewma(stats.latency, latency)
+            return
+        stats.failures += 1
+        stats.consecutive_failures += 1
+        if banned:
+            stats.bans += 1
+            self.evict(proxy)
+        elif stats.consecutive_failures >= self.max_failures:
+            self.evict(proxy)
 
-async def get_valid_proxy(
-    test_url: str = "https://movie.douban.com/subject/1291543/"
-) -> str | None:
-    for _ in range(5):  # 最多尝试5次
-        proxy = await get_proxy()
-        if not proxy:
-            await asyncio.sleep(1)
-            continue
-        # 检查代理可用性
+    def evict(self, proxy: str) -> None:
+        """移出代理并进入冷却期，同时丢弃经该代理的共享客户端（进行中的请求结束后关闭）。"""
+        if self._proxies.pop(proxy, None) is not None:
+            self.evicted += 1
+            PROXY_POOL_SIZE.set(len(self._proxies))
+        discard_client(proxy)
+        self._cooldown_until[proxy] = time.monotonic() + self.cooldown
+        if len(self._proxies) < self.min_size:
+            self._need_refill.set()
+
+    def stats(self) -> dict[str, float]:
+        """命中/未命中等统计，用于评估池大小是否合适。"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._proxies),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "validated": self.validated,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "cooling": sum(1 for t in self._cooldown_until.values() if t > time.monotonic()),
+        }
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # ---- 内部实现 ----
+
+    def _ensure_started(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+
+    def _pick(self, exclude: Container[str] = ()) -> str | None:
+        if not self._proxies:
+            return None
+        ranked = sorted(self._proxies.values(), key=lambda s: s.score, reverse=True)
+        # 重试时换一个代理；池中没有其他代理时仍使用被排除的
+        ranked = [s for s in ranked if s.address not in exclude] or ranked
+        # 在前几名之间随机，避免所有请求压到同一个代理上
+        return random.choice(ranked[:3]).address
+
+    async def _maintain(self) -> None:
+        self._session = _client_session()
+        while True:
+            if len(self._proxies) < self.min_size:
+                added = await self._refill()
+                if not added:
+                    await asyncio.sleep(1)
+                continue
+            self._need_refill.clear()
+            try:
+                async with asyncio.timeout(self.revalidate_interval):
+                    await self._need_refill.wait()
+            except TimeoutError:
+                await self._revalidate_idle()
+
+    async def _refill(self) -> int:
+        want = min(self.validate_concurrency, self.max_size - len(self._proxies))
+        candidates = await asyncio.gather(*(self._fetch_candidate() for _ in range(max(want, 1))))
+        now = time.monotonic()
+        fresh = {
+            p for p in candidates
+            if p and p not in self._proxies and self._cooldown_until.get(p, 0) <= now
+        }
+        results = await asyncio.gather(*(self._validate(p) for p in fresh))
+        added = 0
+        for stats in results:
+            if stats is not None and len(self._proxies) < self.max_size:
+                self._proxies[stats.address] = stats
+                added += 1
+        if added:
+            PROXY_POOL_SIZE.set(len(self._proxies))
+            self._added.set()
+        return added
+
+    async def _fetch_candidate(self) -> str | None:
+        assert self._session is not None
+        return await get_proxy(self._session, self.api_url)
+
+    async def _revalidate_idle(self) -> None:
+        cutoff = time.monotonic() - self.revalidate_interval
+        idle = [s.address for s in self._proxies.values() if s.last_checked < cutoff]
+        results = await asyncio.gather(*(self._validate(p) for p in idle))
+        for address, stats in zip(idle, results):
+            current = self._proxies.get(address)
+            if current is None:
+                continue
+            if stats is None:
+                self.evict(address)
+            else:
+                current.latency = _ewma(current.latency, stats.latency or 0.0)
+                current.last_checked = stats.last_checked
+
+    async def _validate(self, proxy: str) -> ProxyStats | None:
+        latency = await self._check(proxy)
+        if latency is None:
+            self.rejected += 1
+            self._cooldown_until[proxy] = time.monotonic() + self.cooldown
+            return None
+        self.validated += 1
+        return ProxyStats(address=proxy, latency=latency, last_checked=time.monotonic())
+
+    async def _check(self, proxy: str) -> float | None:
+        """经代理请求 test_url，返回延迟；请求失败或被封禁时返回 None。"""
+        assert self._session is not None
+        start = time.monotonic()
         try:
-            async with aiohttp.ClientSession(timeout=REQUEST_TIMEOUT) as session:
-                async with session.get(test_url, proxy=f"http://{proxy}") as resp:
-                    if resp.status == 200:
-                        return proxy
+            async with self._session.get(
+                self.test_url, proxy=f"http://{proxy}", allow_redirects=False
+            ) as resp:
+                text = await resp.text(errors="ignore") if resp.status == 200 else ""
+                banned = is_ban_response(resp.status, resp.headers.get("location", ""), text)
+                ok = resp.status == 200 and not banned
         except Exception:
-            pass
-        await asyncio.sleep(1)
-    return None 
+            ok = False
+        return time.monotonic() - start if ok else None
+
+
+def _ewma(previous: float | None, sample: float) -> float:
+    if previous is None:
+        return sample
+    return LATENCY_ALPHA * sample + (1 - LATENCY_ALPHA) * previous
+
+
+_default_pool: ProxyPool | None = None
+
+
+def get_proxy_pool() -> ProxyPool:
+    """进程级共享的代理池，首次调用时创建，后台任务在首次 acquire 时启动。"""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = ProxyPool()
+    return _default_pool
+
+
+def configure_proxy_pool(**options: Any) -> ProxyPool:
+    """用指定参数（如 api_url、test_url）替换共享代理池，须在首次使用前或 close_proxy_pool() 之后调用。"""
+    global _default_pool
+    _default_pool = ProxyPool(**options)
+    return _default_pool
+
+
+async def get_valid_proxy(test_url: str | None = None, exclude: Container[str] = ()) -> str | None:
+    """从共享代理池取一个已校验的代理，失败时返回 None。
+
+    test_url 只在共享代理池尚未创建时生效，作为其校验地址；已创建的代理池
+    按自身的 test_url 校验，需要更换时使用 configure_proxy_pool()。
+    """
+    if test_url is not None and _default_pool is None:
+        configure_proxy_pool(test_url=test_url)
+    pool = get_proxy_pool()
+    if test_url is not None and test_url != pool.test_url:
+        logger.warning("代理池已按 %s 校验，忽略 test_url=%s", pool.test_url, test_url)
+    return await pool.acquire(exclude)
+
+
+def report_proxy(
+    proxy: str | None,
+    ok: bool,
+    latency: float | None = None,
+    banned: bool = False,
+) -> None:
+    if proxy and _default_pool is not None:
+        _default_pool.report(proxy, ok, latency=latency, banned=banned)
+
+
+async def close_proxy_pool() -> None:
+    global _default_pool
+    if _default_pool is not None:
+        pool, _default_pool = _default_pool, None
+        await pool.close()
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Final, Mapping
+from urllib.parse import urlsplit
+
+from crawler.config import (
+    HOST_BAN_MIN_COUNT,
+    HOST_BAN_RATIO,
+    HOST_BAN_WINDOW,
+    RATE_BACKOFF_WINDOW,
+    RATE_DECREASE_FACTOR,
+    RATE_LIMITS,
+)
+from crawler.metrics import SLOT_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# 除封禁信号外，这些状态码同样表示对端过载，需要退避
+BACKOFF_STATUSES: Final[frozenset[int]] = frozenset({429, 503})
+
+
+class HostLimiter:
+    """单个域名的令牌桶限速 + AIMD 自适应并发。
+
+    令牌桶限制请求速率，并发上限限制同时在途的请求数。每次成功响应都会
+    加性地抬高两者（每轮并发窗口约 +1），遇到封禁/过载信号则乘性下调；
+    同一个退避窗口内只下调一次，避免已发出的请求把限额连续砍到底。
+    被封禁时可用 park() 让该域名在冷却期内不再发出新请求；单个页面的 403/418
+    不代表整个域名被封，record_response() 在滑动窗口内统计被拒的比例来判断。
+    """
+
+    def __init__(
+        self,
+        host: str,
+        rate: float,
+        burst: float,
+        min_rate: float,
+        max_rate: float,
+        min_concurrency: int,
+        max_concurrency: int,
+        initial_concurrency: int,
+        decrease_factor: float = RATE_DECREASE_FACTOR,
+        backoff_window: float = RATE_BACKOFF_WINDOW,
+        ban_window: float = HOST_BAN_WINDOW,
+        ban_min_count: int = HOST_BAN_MIN_COUNT,
+        ban_ratio: float = HOST_BAN_RATIO,
+    ) -> None:
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.decrease_factor = decrease_factor
+        self.backoff_window = backoff_window
+        self.ban_window = ban_window
+        self.ban_min_count = ban_min_count
+        self.ban_ratio = ban_ratio
+
+        self.in_flight = 0
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._parked_until = 0.0
+        # 窗口内各响应的 (时间, 是否被拒)
+        self._responses: deque[tuple[float, bool]] = deque()
+        self._rejected = 0
+        self._cond = asyncio.Condition()
+        self._token_lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator["HostLimiter"]:
+        """占用一个并发名额并消耗一个令牌，退出时归还名额。"""
+        start = time.perf_counter()
+        while (parked := self.parked_for()) > 0:
+            await asyncio.sleep(parked)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            await self._take_token()
+            SLOT_WAIT_SECONDS.observe(time.perf_counter() - start, host=self.host)
+            yield self
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def feedback(self, status: int | None, banned: bool = False) -> None:
+        """根据响应调整限额：封禁/过载乘性下降，正常响应加性上升。"""
+        if banned or status in BACKOFF_STATUSES:
+            now = time.monotonic()
+            if now - self._last_decrease < self.backoff_window:
+                return
+            self._last_decrease = now
+            self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            logger.warning(
+                "%s 触发退避: 并发上限 %.1f, 速率 %.2f/s", self.host, self.limit, self.rate
+            )
+        elif status is not None and (status < 400 or status == 404):
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self.rate = min(self.max_rate, self.rate + 1.0 / self.limit)
+
+    def record_response(self, rejected: bool) -> bool:
+        """记录一次响应是否被拒（403/418）；窗口内被拒的次数与比例都达到阈值时返回 True。"""
+        now = time.monotonic()
+        self._responses.append((now, rejected))
+        self._rejected += rejected
+        while self._responses[0][0] <= now - self.ban_window:
+            self._rejected -= self._responses.popleft()[1]
+        return self._rejected >= self.ban_min_count and self._rejected >= self.ban_ratio * len(self._responses)
+
+    def park(self, seconds: float) -> None:
+        """在接下来 seconds 秒内暂停发出新请求（已在途的请求不受影响）。"""
+        until = time.monotonic() + seconds
+        if until > self._parked_until:
+            if self.parked_for() <= 0:
+                logger.warning("%s 被封禁，暂停新请求 %.0f 秒", self.host, seconds)
+            self._parked_until = until
+
+    def parked_for(self) -> float:
+        """距离暂停结束的秒数，未暂停时为 0。"""
+        return max(0.0, self._parked_until - time.monotonic())
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "rate": round(self.rate, 2),
+            "in_flight": self.in_flight,
+            "parked_seconds": round(self.parked_for(), 1),
+        }
+
+    async def _take_token(self) -> None:
+        async with self._token_lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+
+class RateLimiter:
+    """按域名分发 HostLimiter，配置来自 config.RATE_LIMITS（未配置的域名使用 default）。"""
+
+    def __init__(self, limits: Mapping[str, Mapping[str, Any]] = RATE_LIMITS) -> None:
+        self._limits = limits
+        self._hosts: dict[str, HostLimiter] = {}
+
+    def for_url(self, url: str) -> HostLimiter:
+        host = urlsplit(url).hostname or ""
+        limiter = self._hosts.get(host)
+        if limiter is None:
+            options = self._limits.get(host, self._limits["default"])
+            limiter = HostLimiter(host, **options)
+            self._hosts[host] = limiter
+        return limiter
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        return {host: limiter.snapshot() for host, limiter in self._hosts.items()}
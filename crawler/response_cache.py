@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Mapping, TypeVar
+
+from crawler.config import RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body BLOB NOT NULL,
+    body_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at);
+"""
+
+T = TypeVar("T")
+
+
+def body_hash(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    url: str
+    etag: str | None
+    last_modified: str | None
+    body_hash: str
+
+    def conditional_headers(self) -> dict[str, str]:
+        """重新抓取时附带的条件请求头。"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """按URL缓存响应的磁盘缓存（独立的 SQLite 文件）。
+
+    保存 ETag / Last-Modified 与 zlib 压缩后的响应体，重新抓取时发送条件请求；
+    服务器返回 304 或响应体哈希未变化时，调用方可跳过解析与入库。总大小超过
+    max_bytes 时按最近访问时间淘汰（LRU）。SQLite 读写与压缩都在一个专用线程中
+    依次执行，不阻塞事件循环。
+    """
+
+    def __init__(self, path: str | Path = RESPONSE_CACHE_PATH, max_bytes: int = RESPONSE_CACHE_MAX_BYTES) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # 连接只在 _executor 的单个线程中使用（建立与关闭除外），无需额外加锁
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.stored = 0
+        self.evicted = 0
+
+    async def _run(self, func: Callable[..., T], *args: object) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def lookup(self, url: str) -> CacheEntry | None:
+        """查找缓存条目并计入命中/未命中。"""
+        row = await self._run(self._lookup, url)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CacheEntry(url, *row)
+
+    async def is_unchanged(self, entry: CacheEntry | None, content: bytes) -> bool:
+        """响应体与缓存内容相同（服务器不支持条件请求时的兜底判断）。"""
+        if entry is None or await self._run(body_hash, content) != entry.body_hash:
+            return False
+        self.unchanged += 1
+        await self.touch(entry.url)
+        return True
+
+    async def mark_not_modified(self, url: str) -> None:
+        self.not_modified += 1
+        await self.touch(url)
+
+    async def touch(self, url: str) -> None:
+        await self._run(self._touch, url)
+
+    async def store(self, url: str, headers: Mapping[str, str], content: bytes) -> None:
+        """保存一次有效的200响应（被封禁页面等无效响应不应写入）；应在解析结果落库后调用。"""
+        await self._run(self._store, url, headers.get("etag"), headers.get("last-modified"), content)
+        self.stored += 1
+
+    # ---- 以下方法在缓存线程中执行 ----
+
+    def _lookup(self, url: str) -> tuple[str | None, str | None, str] | None:
+        return self._conn.execute(
+            "SELECT etag, last_modified, body_hash FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+
+    def _touch(self, url: str) -> None:
+        self._conn.execute(
+            "UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url)
+        )
+
+    def _store(self, url: str, etag: str | None, last_modified: str | None, content: bytes) -> None:
+        body = zlib.compress(content)
+        now = time.time()
+        previous = self._conn.execute(
+            "SELECT size FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+        self._conn.execute(
+            "INSERT INTO responses (url, etag, last_modified, body, body_hash, size, stored_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified, "
+            "body = excluded.body, body_hash = excluded.body_hash, size = excluded.size, "
+            "stored_at = excluded.stored_at, accessed_at = excluded.accessed_at",
+            (url, etag, last_modified, body, body_hash(content), len(body), now, now),
+        )
+        self._total_bytes += len(body) - (previous[0] if previous else 0)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        # 淘汰到上限的 90%，避免每次写入都触发淘汰
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT url, size FROM responses ORDER BY accessed_at"
+        )
+        victims = []
+        for url, size in rows:
+            if self._total_bytes <= target:
+                break
+            victims.append((url,))
+            self._total_bytes -= size
+        rows.close()
+        self._conn.executemany("DELETE FROM responses WHERE url = ?", victims)
+        self.evicted += len(victims)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "unchanged": self.unchanged,
+            "stored": self.stored,
+            "evicted": self.evicted,
+            "bytes": self._total_bytes,
+        }
+
+    def close(self) -> None:
+        # 等已提交的读写执行完再关闭连接
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+    def __enter__(self) -> "ResponseCache":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
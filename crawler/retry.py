@@ -0,0 +1,119 @@
+"""抓取结果的类型与失败后的延迟重试队列。
+
+fetch_movie 把每次请求归为一个 FetchOutcome：成功、未变化、不存在，或带错误类别（FetchError）的失败。
+失败的URL交给 RetryScheduler，按错误类别指数退避并加随机抖动后放进按到期时间排序的最小堆，
+到期后再交回worker；等待期间不占用worker，也不占用域名的并发名额。
+"""
+import asyncio
+import enum
+import heapq
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Generic, Mapping, TypeVar
+
+import httpx
+
+from crawler.config import RETRY_JITTER, RETRY_POLICIES
+
+T = TypeVar("T")
+
+
+class FetchError(enum.StrEnum):
+    """失败的类别，决定重试前的退避时间。"""
+
+    PROXY = "proxy"  # 经代理连接失败或连接中断：换一个代理重试
+    TIMEOUT = "timeout"
+    NETWORK = "network"  # 直连时的连接错误
+    BANNED = "banned"  # 403/418、跳转或页面指向 sec.douban.com
+    THROTTLED = "throttled"  # 429/503
+    SERVER = "server"  # 其他 5xx
+    HTTP = "http"  # 其他意外的状态码
+    PARSE = "parse"  # 200 但缺少必填字段
+    ERROR = "error"  # 其他异常
+    WRITE = "write"  # 抓取成功但批量写入失败
+
+
+@dataclass(slots=True)
+class FetchOutcome:
+    """一次请求的结果；status 为 done / unchanged / not_found / failed，失败时 error 给出类别。
+
+    交给写入队列的结果带有 committed（MovieWriter.put 的返回值），落库确认前不应视为 done。
+    """
+
+    status: str
+    movie: dict[str, Any] | None = None
+    error: FetchError | None = None
+    http_status: int | None = None
+    proxy: str | None = None
+    committed: asyncio.Future[bool] | None = None
+
+
+def classify_exception(exc: BaseException, proxy: str | None) -> FetchError:
+    """请求抛出的异常对应的错误类别；经代理时连接层面的错误都算作代理的问题。"""
+    if isinstance(exc, httpx.ProxyError):
+        return FetchError.PROXY
+    if isinstance(exc, httpx.TimeoutException) and not (proxy and isinstance(exc, httpx.ConnectTimeout)):
+        return FetchError.TIMEOUT
+    if isinstance(exc, httpx.TransportError):
+        return FetchError.PROXY if proxy else FetchError.NETWORK
+    return FetchError.ERROR
+
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    """单个错误类别的退避参数；max_attempts 为空时只受调用方的 max_retries 限制。"""
+
+    base_delay: float
+    max_delay: float
+    max_attempts: int | None = None
+
+    def delay(self, attempt: int, jitter: float = RETRY_JITTER) -> float:
+        """第 attempt 次失败后的等待时间：base_delay * 2^(attempt-1)，不超过 max_delay，再随机缩短至多 jitter 比例。"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * (1 - jitter * random.random())
+
+
+class RetryScheduler(Generic[T]):
+    """按到期时间排序的延迟队列：schedule() 放入，get() 等到最早的一项到期后取出。"""
+
+    def __init__(
+        self,
+        policies: Mapping[str, Mapping[str, Any]] = RETRY_POLICIES,
+        jitter: float = RETRY_JITTER,
+    ) -> None:
+        self.policies = {FetchError(name): RetryPolicy(**options) for name, options in policies.items()}
+        self.jitter = jitter
+        self._heap: list[tuple[float, int, T]] = []
+        # 到期时间相同时按放入顺序取出，也避免比较 item 本身
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def should_retry(self, error: FetchError, attempt: int, max_attempts: int) -> bool:
+        """第 attempt 次尝试以 error 失败后是否还应重试。"""
+        limit = self.policies[error].max_attempts
+        return attempt < (min(limit, max_attempts) if limit is not None else max_attempts)
+
+    def backoff(self, error: FetchError, attempt: int) -> float:
+        return self.policies[error].delay(attempt, self.jitter)
+
+    def schedule(self, item: T, delay: float) -> None:
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), item))
+        self._changed.set()
+
+    async def get(self) -> T:
+        while True:
+            self._changed.clear()
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            if timeout is not None and timeout <= 0:
+                return heapq.heappop(self._heap)[2]
+            try:
+                # 等到堆顶到期，或有更早到期的项被放入
+                async with asyncio.timeout(timeout):
+                    await self._changed.wait()
+            except TimeoutError:
+                pass
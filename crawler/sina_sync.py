@@ -0,0 +1,126 @@
+"""新浪美股列表的增量同步：与内存中的 sina_us_stocks 快照比较，只写入发生变化的股票。"""
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Sequence
+
+from crawler.config import SINA_DELIST_GUARD_RATIO
+from crawler.db import apply_sina_changes, load_sina_snapshot
+
+logger = logging.getLogger(__name__)
+
+Snapshot = dict[str, tuple[str, str]]
+
+
+@dataclass
+class SinaChangeset:
+    """一次同步的变更集（股票代码列表）。"""
+
+    listed: list[str] = field(default_factory=list)
+    renamed: list[str] = field(default_factory=list)
+    recategorised: list[str] = field(default_factory=list)
+    delisted: list[str] = field(default_factory=list)
+    unchanged: int = 0
+    skipped: int = 0
+    # 解析到的股票数明显少于快照时（页面可能被截断），本次不处理下市
+    delist_suppressed: bool = False
+
+    def counts(self) -> dict[str, int]:
+        return {
+            "listed": len(self.listed),
+            "renamed": len(self.renamed),
+            "recategorised": len(self.recategorised),
+            "delisted": len(self.delisted),
+            "unchanged": self.unchanged,
+            "fail": self.skipped,
+        }
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.listed or self.renamed or self.recategorised or self.delisted)
+
+
+def diff_listing(
+    snapshot: Snapshot,
+    stock_items: Sequence[dict[str, Any]],
+    delist_guard_ratio: float = SINA_DELIST_GUARD_RATIO,
+) -> tuple[SinaChangeset, list[dict[str, str]], list[dict[str, Any]]]:
+    """比较解析结果与快照，返回 (变更集, 需要写入的行, 历史记录)。"""
+    changeset = SinaChangeset()
+    listing: dict[str, tuple[str, str]] = {}
+    for item in stock_items:
+        symbol, name, category = item.get("symbol"), item.get("name"), item.get("category")
+        if not symbol or not name or not category:
+            changeset.skipped += 1
+            continue
+        # 同一代码出现多次时以最后一次为准，与 upsert_sina_stocks 一致
+        listing[symbol] = (name, category)
+
+    upserts: list[dict[str, str]] = []
+    history: list[dict[str, Any]] = []
+    for symbol, (name, category) in listing.items():
+        previous = snapshot.get(symbol)
+        if previous == (name, category):
+            changeset.unchanged += 1
+            continue
+        upserts.append({"symbol": symbol, "name": name, "category": category})
+        entry = {"symbol": symbol, "name": name, "category": category}
+        if previous is None:
+            changeset.listed.append(symbol)
+            history.append({**entry, "change": "listed"})
+            continue
+        previous_name, previous_category = previous
+        if previous_name != name:
+            changeset.renamed.append(symbol)
+        if previous_category != category:
+            changeset.recategorised.append(symbol)
+        history.append({
+            **entry,
+            "change": "changed",
+            "previous_name": previous_name if previous_name != name else None,
+            "previous_category": previous_category if previous_category != category else None,
+        })
+
+    missing = [symbol for symbol in snapshot if symbol not in listing]
+    if missing and len(listing) < len(snapshot) * delist_guard_ratio:
+        changeset.delist_suppressed = True
+    else:
+        for symbol in missing:
+            name, category = snapshot[symbol]
+            changeset.delisted.append(symbol)
+            history.append({"symbol": symbol, "name": name, "category": category, "change": "delisted"})
+    return changeset, upserts, history
+
+
+class SinaStockSync:
+    """保存上次同步后的快照，同一进程内重复同步时无需再读数据库。"""
+
+    def __init__(self, delist_guard_ratio: float = SINA_DELIST_GUARD_RATIO) -> None:
+        self.delist_guard_ratio = delist_guard_ratio
+        self._snapshot: Snapshot | None = None
+
+    async def sync(self, stock_items: Sequence[dict[str, Any]]) -> SinaChangeset:
+        if self._snapshot is None:
+            self._snapshot = await load_sina_snapshot()
+        snapshot = self._snapshot
+        changeset, upserts, history = diff_listing(snapshot, stock_items, self.delist_guard_ratio)
+        if changeset.delist_suppressed:
+            logger.warning(
+                "解析到的股票数远少于已保存的 %d 条，页面可能不完整，本次不处理下市", len(snapshot)
+            )
+        if changeset.changed:
+            await apply_sina_changes(upserts, changeset.delisted, history)
+            for entry in upserts:
+                snapshot[entry["symbol"]] = (entry["name"], entry["category"])
+            for symbol in changeset.delisted:
+                del snapshot[symbol]
+        return changeset
+
+
+_default_sync: SinaStockSync | None = None
+
+
+def get_sina_sync() -> SinaStockSync:
+    global _default_sync
+    if _default_sync is None:
+        _default_sync = SinaStockSync()
+    return _default_sync
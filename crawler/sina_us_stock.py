@@ -1,38 +1,81 @@
-import httpx
 import asyncio
-from bs4 import BeautifulSoup
-from crawler.proxy_pool import get_valid_proxy
-from crawler.db import upsert_sina_stocks
-import random
-from fake_useragent import UserAgent
+import logging
+import time
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import TYPE_CHECKING, Final
+from urllib.parse import urlsplit
+from crawler.http_client import DIRECT_ROUTE, PROXY_ROUTE, HttpClientManager, get_client_manager
+from crawler.proxy_pool import get_valid_proxy, report_proxy
+from crawler.sina_sync import get_sina_sync
+from crawler.metrics import PARSE_SECONDS, REQUEST_ERRORS, REQUEST_LATENCY, RESPONSES
+from crawler.response_cache import ResponseCache
+from crawler.writer import format_counts
+from crawler.user_agent import get_user_agent_provider
 
+if TYPE_CHECKING:
+    from crawler.parse_executor import ParseExecutor
 
-async def fetch_sina_us_stock_data(url, use_proxy=True):
+logger = logging.getLogger(__name__)
+
+
+async def fetch_sina_us_stock_data(url, use_proxy=True, clients: HttpClientManager | None = None):
+    from bs4 import BeautifulSoup
+
+    resp = await fetch_sina_us_stock_page(url, use_proxy, clients)
+    if resp is None:
+        return None
+    return BeautifulSoup(resp.text, "html.parser")
+
+
+async def fetch_sina_us_stock_page(url, use_proxy=True, clients: HttpClientManager | None = None,
+                                   conditional_headers=None):
+    """
+    获取新浪美股页面的原始响应
+    :param conditional_headers: 条件请求头（If-None-Match / If-Modified-Since）
+    :return: 状态码为200（或条件请求命中时为304）的httpx响应，失败时返回None
+    """
     proxy = await get_valid_proxy() if use_proxy else None
     headers = {
-        "User-Agent": UserAgent(browsers=['Chrome', 'Edge', 'Firefox', 'Safari', 'Opera']).random,
+        "User-Agent": get_user_agent_provider().get(proxy),
         "Referer": "https://vip.stock.finance.sina.com.cn/",
         "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"
     }
+    if conditional_headers:
+        headers.update(conditional_headers)
+    host = urlsplit(url).hostname or ""
     try:
-        if proxy:
-            async with httpx.AsyncClient(proxy=f"http://{proxy}", timeout=20) as client:
-                resp = await client.get(url, headers=headers)
-        else:
-            async with httpx.AsyncClient(timeout=20) as client:
-                resp = await client.get(url, headers=headers)
-        
-        if resp.status_code == 200:
-            soup = BeautifulSoup(resp.text, "html.parser")
-            return soup
+        async with (clients or get_client_manager()).lease(proxy) as client:
+            start = time.monotonic()
+            resp = await client.get(url, headers=headers)
+        latency = time.monotonic() - start
+        REQUEST_LATENCY.observe(latency, host=host, route=PROXY_ROUTE if proxy else DIRECT_ROUTE)
+        RESPONSES.inc(host=host, status=resp.status_code)
+        report_proxy(proxy, ok=resp.status_code < 500, latency=latency)
+
+        if resp.status_code == 200 or (resp.status_code == 304 and conditional_headers):
+            return resp
         else:
-            print(f"[ERROR] HTTP错误: {url} (status {resp.status_code})")
+            logger.error("HTTP错误: %s (status %s)", url, resp.status_code)
             return None
     except Exception as e:
-        print(f"[ERROR] 异常: {e}")
+        REQUEST_ERRORS.inc(host=host)
+        report_proxy(proxy, ok=False)
+        logger.error("异常: %r", e)
         return None
 
 
+def parse_sina_us_stock_html(content, encoding=None):
+    """
+    从原始响应字节解析新浪美股数据，可在进程池worker中执行
+    :param content: 响应字节
+    :param encoding: 响应编码
+    :return: 包含股票信息的列表
+    """
+    text = content.decode(encoding or "utf-8", errors="replace")
+    return parse_sina_us_stock_text(text)
+
+
 def parse_sina_us_stock_data(soup):
     """
     解析新浪美股网站的数据
@@ -131,54 +174,204 @@ def parse_sina_us_stock_data(soup):
     return stock_data
 
 
-async def save_sina_us_stock_data(stock_data):
+# label文本 -> category 的规则，按顺序取第一个出现的标记：(标记, 是否去掉结尾的冒号, 截取核心类别的分隔符)
+_CATEGORY_RULES: Final[tuple[tuple[str, bool, str | None], ...]] = (
+    ("家在美上市", True, "类"),  # "111家在美上市科技类知名公司:" -> "科技"
+    ("家在美知名", True, None),  # "7家在美知名ETF:" -> "ETF"
+    (":", False, None),
+)
+
+
+def label_category(label_text: str) -> str:
+    """从col_div的label文本中提取category"""
+    text = label_text.strip()
+    for marker, drop_colon, core_sep in _CATEGORY_RULES:
+        if marker in text:
+            category = text.partition(marker)[2].partition(marker)[0].strip()
+            if drop_colon and category.endswith(":"):
+                category = category[:-1]
+            if core_sep is not None:
+                category = category.partition(core_sep)[0]
+            return category
+    return text
+
+
+def stock_record(title: str, text: str, category: str) -> dict[str, str] | None:
+    """由链接的title（"代码,英文名,中文名"）与链接文本（"名称(代码)"）生成一条股票记录"""
+    if not title or title.count(",") < 2:
+        return None
+    if "(" in text and ")" in text:
+        symbol = text.rpartition("(")[2].partition(")")[0]
+        name = text.partition("(")[0]
+    else:
+        parts = title.split(",", 3)
+        symbol = parts[0]
+        name = parts[2]  # 使用中文名称而不是英文名称
+        if "(" in name and ")" in name:
+            name = name.partition("(")[0]
+    return {"category": category, "symbol": symbol, "name": name}
+
+
+@dataclass
+class _ColDiv:
+    """一个col_div的缓冲：第一个label的文本与其中全部带href链接的 (title, 文本)"""
+
+    label: list[str] | None = None
+    anchors: list[tuple[str, list[str]]] = field(default_factory=list)
+
+
+class SinaListingParser(HTMLParser):
+    """单遍扫描新浪美股页面，按col_div缓冲链接并在div闭合时生成股票记录
+
+    不构建文档树，只跟踪 col_div、其中第一个 label 与带 href 的链接，实体由 HTMLParser 解码。
+    按 ustotal.php 的实际结构处理：col_div 不嵌套（内层的 col_div 按普通 div 处理），
+    未闭合的链接在下一个链接或所在 col_div 闭合时结束。
     """
-    保存新浪美股数据到数据库
-    :param stock_data: 股票数据列表
-    :return: 保存结果
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.stock_data: list[dict[str, str]] = []
+        self._index = 0
+        # 打开的div是否为当前col_div本身
+        self._divs: list[bool] = []
+        self._div: _ColDiv | None = None
+        self._text: list[str] | None = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag == "div":
+            classes = self._attr(attrs, "class")
+            is_col_div = self._div is None and classes is not None and "col_div" in classes.split()
+            if is_col_div:
+                self._div = _ColDiv()
+            self._divs.append(is_col_div)
+        elif self._div is None:
+            return
+        elif tag == "a":
+            self._text = None
+            if self._attr(attrs, "href") is not None:
+                self._text = []
+                self._div.anchors.append((self._attr(attrs, "title") or "", self._text))
+        elif tag == "label" and self._div.label is None:
+            self._text = self._div.label = []
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in ("a", "label"):
+            self._text = None
+        elif tag == "div" and self._divs and self._divs.pop():
+            self._emit()
+
+    def handle_data(self, data: str) -> None:
+        if self._text is not None:
+            self._text.append(data)
+
+    def _emit(self) -> None:
+        div, self._div, self._text = self._div, None, None
+        if div is None:
+            return
+        if self._index == 0:
+            # 第一个col_div没有label，使用"中国"作为category
+            category = "中国"
+        elif div.label is None:
+            category = "未知"
+        else:
+            category = label_category("".join(div.label))
+        self._index += 1
+        for title, text in div.anchors:
+            record = stock_record(title, "".join(text), category)
+            if record is not None:
+                self.stock_data.append(record)
+
+    def close(self) -> None:
+        super().close()
+        self._emit()
+
+    @staticmethod
+    def _attr(attrs: list[tuple[str, str | None]], name: str) -> str | None:
+        # 属性重复时以最后一次为准，无值属性视为空字符串
+        for key, value in reversed(attrs):
+            if key == name:
+                return value or ""
+        return None
+
+
+def parse_sina_us_stock_text(text: str) -> list[dict[str, str]]:
     """
-    result = await upsert_sina_stocks(stock_data)
+    单遍解析新浪美股页面文本，在 ustotal.php 的页面结构上与 parse_sina_us_stock_data(BeautifulSoup(text, "html.parser")) 结果相同
+    :param text: 页面HTML
+    :return: 包含股票信息的列表
+    """
+    parser = SinaListingParser()
+    parser.feed(text)
+    parser.close()
+    return parser.stock_data
 
-    if result["success"]:
-        print(f"[INFO] 成功保存 {result['success']} 条新股票数据")
-    if result["duplicate"]:
-        print(f"[INFO] 更新 {result['duplicate']} 条已有股票数据")
-    if result["fail"]:
-        print(f"[WARN] 跳过 {result['fail']} 条字段不完整的股票数据")
 
-    print(
-        f"[INFO] 保存完成 - 成功: {result['success']}, 重复: {result['duplicate']}, 失败: {result['fail']}"
-    )
-    return result
+async def save_sina_us_stock_data(stock_data):
+    """
+    增量保存新浪美股数据：只写入新上市、更名或变更分类的股票，并记录下市
+    :param stock_data: 股票数据列表
+    :return: 各类变更的数量
+    """
+    changeset = await get_sina_sync().sync(stock_data)
+    counts = changeset.counts()
+    logger.info("同步完成 - %s", format_counts(counts))
+    for kind in ("listed", "renamed", "recategorised", "delisted"):
+        symbols = getattr(changeset, kind)
+        if symbols:
+            logger.debug("%s: %s", kind, ", ".join(symbols))
+    return counts
 
 
-async def crawl_sina_us_stock(url="https://vip.stock.finance.sina.com.cn/usstock/ustotal.php", use_proxy=True):
+async def crawl_sina_us_stock(url="https://vip.stock.finance.sina.com.cn/usstock/ustotal.php", use_proxy=True,
+                              parse_executor: "ParseExecutor | None" = None,
+                              cache: ResponseCache | None = None):
     """
     爬取并保存新浪美股数据
     :param url: 爬取的URL
     :param use_proxy: 是否使用代理
+    :param parse_executor: 可选的解析进程池，提供时解析不在事件循环中执行
+    :param cache: 可选的响应缓存，页面未变化时跳过解析与入库
     :return: 爬取结果
     """
-    print(f"[INFO] 开始爬取新浪美股数据: {url}")
+    logger.info("开始爬取新浪美股数据: %s", url)
     
     # 获取网页内容
-    soup = await fetch_sina_us_stock_data(url, use_proxy)
-    if not soup:
-        print("[ERROR] 获取网页内容失败")
+    entry = await cache.lookup(url) if cache is not None else None
+    resp = await fetch_sina_us_stock_page(
+        url, use_proxy, conditional_headers=entry.conditional_headers() if entry else None
+    )
+    if resp is None:
+        logger.error("获取网页内容失败")
         return {"status": "failed", "message": "获取网页内容失败"}
+
+    if cache is not None:
+        if resp.status_code == 304:
+            await cache.mark_not_modified(url)
+            logger.info("页面未修改(304)，跳过解析与保存")
+            return {"status": "unchanged"}
+        if await cache.is_unchanged(entry, resp.content):
+            logger.info("页面内容未变化，跳过解析与保存")
+            return {"status": "unchanged"}
     
     # 解析数据
-    stock_data = parse_sina_us_stock_data(soup)
+    with PARSE_SECONDS.time(page="sina"):
+        if parse_executor is not None:
+            stock_data = await parse_executor.parse_sina(resp.content, resp.encoding)
+        else:
+            stock_data = parse_sina_us_stock_text(resp.text)
     if not stock_data:
-        print("[ERROR] 解析数据失败")
+        logger.error("解析数据失败")
         return {"status": "failed", "message": "解析数据失败"}
     
-    print(f"[INFO] 解析到 {len(stock_data)} 条股票数据")
+    logger.info("解析到 %d 条股票数据", len(stock_data))
     
     # 保存数据
     result = await save_sina_us_stock_data(stock_data)
-    
-    print("[INFO] 新浪美股数据爬取完成")
+    # 保存成功后才缓存页面，保存失败时下次仍会重新解析
+    if cache is not None:
+        await cache.store(url, resp.headers, resp.content)
+
+    logger.info("新浪美股数据爬取完成")
     return {
         "status": "success",
         "data_count": len(stock_data),
@@ -0,0 +1,102 @@
+"""User-Agent 池：fake_useragent 数据集只加载、过滤一次，按代理会话沿用同一个 UA 并定期轮换。
+
+每次请求都构造 UserAgent(...) 会重新读取并过滤整个数据集（每次约 60 ms，且阻塞事件循环），
+这里首次使用时把符合条件的 UA 预先放进数组，之后每次只是一次随机抽取。
+同一代理（或直连）在 USER_AGENT_ROTATE_EVERY 个请求内使用同一个 UA，像同一个浏览器会话，
+而不是同一 IP 每个请求都换一次浏览器指纹。
+"""
+import logging
+import random
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Final, Iterable
+
+from crawler.config import HTTP_MAX_CLIENTS, USER_AGENT_BROWSERS, USER_AGENT_ROTATE_EVERY
+
+logger = logging.getLogger(__name__)
+
+# fake_useragent 不可用或数据格式变化时使用的 UA
+FALLBACK_USER_AGENTS: Final[tuple[str, ...]] = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/131.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/18.1 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:133.0) Gecko/20100101 Firefox/133.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0",
+)
+
+
+@dataclass(slots=True)
+class _Session:
+    agent: str
+    remaining: int
+
+
+class UserAgentProvider:
+    """预先过滤的 UA 数组 + 按代理地址（None 为直连）的会话轮换。"""
+
+    def __init__(
+        self,
+        browsers: Iterable[str] = USER_AGENT_BROWSERS,
+        rotate_every: int = USER_AGENT_ROTATE_EVERY,
+        max_sessions: int = HTTP_MAX_CLIENTS,
+    ) -> None:
+        self._agents = load_user_agents(browsers)
+        self.rotate_every = max(1, rotate_every)
+        self.max_sessions = max_sessions
+        # 与 HttpClientManager 一样只保留最近使用的若干个代理会话
+        self._sessions: OrderedDict[str | None, _Session] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+    def random(self) -> str:
+        return random.choice(self._agents)
+
+    def get(self, proxy: str | None = None) -> str:
+        """返回该代理会话当前的 UA，用满 rotate_every 次后换一个新的。"""
+        session = self._sessions.get(proxy)
+        if session is None or session.remaining <= 0:
+            session = _Session(self.random(), self.rotate_every)
+            self._sessions[proxy] = session
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(proxy)
+        session.remaining -= 1
+        return session.agent
+
+    def rotate(self, proxy: str | None = None) -> None:
+        """丢弃该代理会话的 UA（例如被封禁后），下次请求重新抽取。"""
+        self._sessions.pop(proxy, None)
+
+
+def load_user_agents(browsers: Iterable[str] = USER_AGENT_BROWSERS) -> tuple[str, ...]:
+    """fake_useragent 数据集中符合条件的全部 UA，过滤条件与 UserAgent(browsers=...).random 相同。
+
+    逐个调用 ua.random 每次都要重新过滤数据集，这里直接读取 UserAgent 的数据属性
+    （fake_useragent 2.x，依赖版本限定在 <3）；读取失败时退回 FALLBACK_USER_AGENTS。
+    """
+    try:
+        from fake_useragent import UserAgent
+
+        ua = UserAgent(browsers=list(browsers))
+        agents = tuple(
+            entry["useragent"] for entry in ua.data_browsers
+            if entry["browser"] in ua.browsers and entry["os"] in ua.os and entry["type"] in ua.platforms
+        )
+    except Exception as e:
+        logger.warning("无法从 fake_useragent 加载 User-Agent，使用内置列表: %r", e)
+        return FALLBACK_USER_AGENTS
+    return agents or FALLBACK_USER_AGENTS
+
+
+_default_provider: UserAgentProvider | None = None
+
+
+def get_user_agent_provider() -> UserAgentProvider:
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = UserAgentProvider()
+    return _default_provider
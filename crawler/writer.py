@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Final, Sequence
+
+from crawler.config import WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL, WRITE_QUEUE_MAXSIZE
+from crawler.db import add_movies, is_storable_movie
+from crawler.metrics import QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+WriteBatch = Callable[[Sequence[dict[str, Any]]], Awaitable[dict[str, int]]]
+Validate = Callable[[dict[str, Any]], bool]
+
+_STOP: Final = object()
+
+
+class MovieWriter:
+    """异步写入队列：抓取协程只负责入队，由单个写入任务批量落库。
+
+    当缓冲区达到 batch_size 条或距第一条入队超过 flush_interval 秒时触发一次
+    批量写入；close() 会写完队列中剩余的数据后再返回。put() 返回的 Future 在所在批次
+    提交后置为 True，写入失败（或写入任务退出时仍未写入）置为 False，调用方据此确认落库。
+    validate 不通过的行（写入函数会计为失败）不交给 write_batch，Future 直接置为 False。
+    """
+
+    def __init__(
+        self,
+        batch_size: int = WRITE_BATCH_SIZE,
+        flush_interval: float = WRITE_FLUSH_INTERVAL,
+        max_queue: int = WRITE_QUEUE_MAXSIZE,
+        write_batch: WriteBatch = add_movies,
+        validate: Validate = is_storable_movie,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._write_batch = write_batch
+        self._validate = validate
+        self._queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=max_queue)
+        self._task: asyncio.Task[None] | None = None
+        self.totals: dict[str, int] = {}
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, movie_data: dict[str, Any]) -> "asyncio.Future[bool]":
+        """入队一条解析结果并返回其提交结果；队列已满时等待，从而对抓取端形成背压。"""
+        if self._task is None:
+            await self.start()
+        committed: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+        await self._queue.put((movie_data, committed))
+        return committed
+
+    async def close(self) -> dict[str, int]:
+        """写完队列中剩余数据并停止写入任务，返回累计的写入统计。"""
+        if self._task is not None:
+            await self._queue.put(_STOP)
+            await self._task
+            self._task = None
+        return self.totals
+
+    async def __aenter__(self) -> "MovieWriter":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch: list[tuple[dict[str, Any], asyncio.Future[bool]]] = []
+        deadline = 0.0
+        try:
+            while True:
+                timeout = max(deadline - loop.time(), 0) if batch else None
+                try:
+                    async with asyncio.timeout(timeout):
+                        item = await self._queue.get()
+                except TimeoutError:
+                    await self._flush(batch)
+                    batch = []
+                    continue
+                QUEUE_DEPTH.set(self._queue.qsize(), queue="writer")
+                if item is _STOP:
+                    await self._flush(batch)
+                    batch = []
+                    return
+                if not batch:
+                    deadline = loop.time() + self.flush_interval
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    await self._flush(batch)
+                    batch = []
+        finally:
+            # 被取消时缓冲区与队列中的数据都没有落库
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not _STOP:
+                    batch.append(item)
+            _resolve(batch, False)
+
+    async def _flush(self, batch: list[tuple[dict[str, Any], "asyncio.Future[bool]"]]) -> dict[str, int]:
+        if not batch:
+            return {}
+        # 不完整的行写入函数只会计为失败，不交给它写入，直接确认为未落库
+        rows: list[tuple[dict[str, Any], asyncio.Future[bool]]] = []
+        invalid: list[tuple[dict[str, Any], asyncio.Future[bool]]] = []
+        for entry in batch:
+            (rows if self._validate(entry[0]) else invalid).append(entry)
+        _resolve(invalid, False)
+        try:
+            result = dict(await self._write_batch([movie_data for movie_data, _ in rows])) if rows else {}
+        except Exception as e:
+            logger.error("批量写入失败(%d条): %s", len(rows), e)
+            result = {"fail": len(rows)}
+            _resolve(rows, False)
+        else:
+            _resolve(rows, True)
+        if invalid:
+            result["fail"] = result.get("fail", 0) + len(invalid)
+        for key, value in result.items():
+            self.totals[key] = self.totals.get(key, 0) + value
+        logger.debug("批量写入 %d 条 - %s", len(batch), format_counts(result))
+        return result
+
+
+def _resolve(batch: Sequence[tuple[Any, "asyncio.Future[bool]"]], committed: bool) -> None:
+    for _, future in batch:
+        if not future.done():
+            future.set_result(committed)
+
+
+COUNT_LABELS: Final[dict[str, str]] = {
+    "success": "成功",
+    "duplicate": "重复",
+    "updated": "更新",
+    "unchanged": "未变化",
+    "inserted": "新增",
+    "listed": "新上市",
+    "renamed": "更名",
+    "recategorised": "变更分类",
+    "delisted": "下市",
+    "fail": "失败",
+}
+
+
+def format_counts(counts: dict[str, int]) -> str:
+    return ", ".join(f"{COUNT_LABELS.get(key, key)}: {value}" for key, value in counts.items())
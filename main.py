@@ -1,10 +1,26 @@
 import argparse
 import asyncio
-from crawler.crawler import batch_fetch
-from crawler.db import init_db, get_max_id
-from crawler.sina_us_stock import crawl_sina_us_stock
+import contextlib
+import logging
+from pathlib import Path
+from crawler.config import (
+    COORDINATOR_SHARD_SIZE,
+    COORDINATOR_URL,
+    EXPORT_DIR,
+    KNOWN_IDS_PATH,
+    METRICS_HOST,
+    METRICS_SNAPSHOT_INTERVAL,
+    REFRESH_STALE_DAYS,
+    SHARD_DB_DIR,
+)
+from crawler.log import setup_logging
 import sys
 
+# 各子系统（SQLAlchemy、httpx、aiohttp、bs4、fake_useragent 等）在用到它们的模式中才导入，
+# --help 与短时间的定时任务不必为用不到的依赖付出导入时间
+
+logger = logging.getLogger(__name__)
+
 async def main():
     parser = argparse.ArgumentParser(description="Douban Movie Crawler and Sina US Stock Crawler")
     parser.add_argument('urls', nargs='*', help='Movie page URLs')
@@ -12,26 +28,201 @@ async def main():
     parser.add_argument('--count', type=int, default=100, help='Number of sequential new URLs to crawl')
     parser.add_argument('--sina-us-stock', action='store_true', help='Crawl Sina US stock data')
     parser.add_argument('--sina-url', default='https://vip.stock.finance.sina.com.cn/usstock/ustotal.php', help='URL for Sina US stock data')
+    parser.add_argument('--refresh', action='store_true', help='Re-crawl stale movies and update changed columns')
+    parser.add_argument('--stale-days', type=float, default=REFRESH_STALE_DAYS, help='Refresh movies not updated for this many days')
+    parser.add_argument('--refresh-limit', type=int, default=None, help='Maximum number of movies to refresh (default: all stale)')
+    parser.add_argument('--cache', action='store_true', help='Use the on-disk response cache (conditional GET, skip unchanged pages)')
+    parser.add_argument('--parse-workers', type=int, default=0, help='Parse HTML in N worker processes (default: parse inline)')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='Log level (per-URL details are DEBUG)')
+    parser.add_argument('--log-json', action='store_true', help='Emit one JSON object per log line')
+    parser.add_argument('--metrics-port', type=int, default=None, help='Serve /metrics (Prometheus) and /metrics.json on this local port')
+    parser.add_argument('--metrics-json', default=None, help='Periodically write a JSON metrics snapshot to this file')
+    parser.add_argument('--metrics-interval', type=float, default=METRICS_SNAPSHOT_INTERVAL, help='Seconds between JSON metrics snapshots')
+    parser.add_argument('--coordinator', default=COORDINATOR_URL, help='Lease coordinator: sqlite:///path or redis://host:port/db')
+    parser.add_argument('--plan', action='store_true', help='Split --count ids after --start-id (default: current max id) into leasable shards')
+    parser.add_argument('--start-id', type=int, default=None, help='First subject id for --plan')
+    parser.add_argument('--worker', action='store_true', help='Lease id ranges from the coordinator and crawl them until all are done')
+    parser.add_argument('--shard-db', default=None, help='Write results to this SQLite file instead of movies.db')
+    parser.add_argument('--local-workers', type=int, default=0, help='Spawn N worker processes with per-shard databases, then merge them')
+    parser.add_argument('--merge-shards', nargs='+', default=None, metavar='DB', help='Merge per-shard databases into movies.db')
+    parser.add_argument('--export', nargs='+', default=None, choices=['movies', 'sina_us_stocks'], metavar='TABLE', help='Export tables (movies, sina_us_stocks) and exit')
+    parser.add_argument('--export-format', default='jsonl', choices=['jsonl', 'csv', 'parquet'], help='Export file format (parquet needs pyarrow)')
+    parser.add_argument('--export-dir', default=EXPORT_DIR, help='Directory for exported files and the watermark file')
+    parser.add_argument('--incremental', action='store_true', help='Only export rows updated since the last export watermark')
+    parser.add_argument('--known-ids', default=KNOWN_IDS_PATH, help='Snapshot file of the known subject id bitmap')
+    parser.add_argument('--no-known-ids', action='store_true', help='Do not skip stored / 404 / abandoned subject ids before fetching')
     args = parser.parse_args()
+    setup_logging(args.log_level, args.log_json)
+    from crawler.db import configure_database, init_db
 
-    await init_db()
+    if args.shard_db:
+        Path(args.shard_db).parent.mkdir(parents=True, exist_ok=True)
+        await configure_database(f"sqlite+aiosqlite:///{args.shard_db}")
+    # 导出只读数据库，不执行建表与迁移
+    if not args.export:
+        await init_db()
     use_proxy = args.proxy
+    parse_executor = None
+    if args.parse_workers > 0:
+        from crawler.parse_executor import ParseExecutor
+        parse_executor = ParseExecutor(args.parse_workers)
+    cache = None
+    if args.cache:
+        from crawler.response_cache import ResponseCache
+        cache = ResponseCache()
+    server = snapshots = None
+    if args.metrics_port or args.metrics_json:
+        from crawler.metrics import serve_metrics, write_snapshots
+        server = await serve_metrics(METRICS_HOST, args.metrics_port) if args.metrics_port else None
+        snapshots = (
+            asyncio.create_task(write_snapshots(args.metrics_json, args.metrics_interval))
+            if args.metrics_json else None
+        )
+    try:
+        await crawl(args, use_proxy, parse_executor, cache)
+    finally:
+        if parse_executor is not None:
+            parse_executor.close()
+        if cache is not None:
+            logger.info("响应缓存统计: %s", cache.stats())
+            cache.close()
+        if snapshots is not None:
+            snapshots.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await snapshots
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+async def crawl(args, use_proxy, parse_executor, cache):
+    # 导出数据表后退出，不发起任何请求
+    if args.export:
+        from crawler.export import export_table
+        for table in args.export:
+            result = await export_table(table, args.export_format, args.export_dir, incremental=args.incremental)
+            logger.info("导出结果: %s", result)
+        return
 
     # 如果指定了--sina-us-stock参数，则爬取新浪美股数据
     if args.sina_us_stock:
-        result = await crawl_sina_us_stock(args.sina_url, use_proxy=use_proxy)
-        print(f"[INFO] 新浪美股数据爬取结果: {result}")
+        from crawler.sina_us_stock import crawl_sina_us_stock
+        result = await crawl_sina_us_stock(args.sina_url, use_proxy=use_proxy, parse_executor=parse_executor,
+                                           cache=cache)
+        logger.info("新浪美股数据爬取结果: %s", result)
+        return
+
+    # 刷新已有电影的评分等字段
+    if args.refresh:
+        from crawler.crawler import refresh_fetch
+        result = await refresh_fetch(stale_days=args.stale_days, limit=args.refresh_limit,
+                                     use_proxy=use_proxy, parse_executor=parse_executor, cache=cache)
+        logger.info("刷新结果: %s", result)
+        return
+
+    if args.merge_shards:
+        await merge_shards(args.merge_shards)
         return
 
-    # 否则执行原有的豆瓣电影爬取逻辑
-    if args.urls:
-        urls = args.urls
-    else:
-        # 自动批量生成新URL
-        max_id = await get_max_id()
-        urls = [f"https://movie.douban.com/subject/{max_id + i + 1}/" for i in range(args.count)]
-        print(f"[INFO] 当前最大id: {max_id}，即将爬取: {urls}")
-    results = await batch_fetch(urls, use_proxy=use_proxy)
+    # 抓取前用已知ID索引跳过已入库、404 与多次失败放弃的ID
+    from crawler.crawler import batch_fetch, frontier_fetch
+    from crawler.db import get_max_id
+    from crawler.frontier import Frontier
+    from crawler.known_ids import load_known_ids
+    from crawler.proxy_pool import get_proxy_pool
+
+    plan_only = args.plan and not (args.worker or args.local_workers)
+    known = None if args.no_known_ids or plan_only else await load_known_ids(args.known_ids)
+    try:
+        # 分布式模式：规划区间 / 作为 worker 租用区间 / 本机启动多个 worker 进程
+        if args.plan or args.worker or args.local_workers:
+            await distributed(args, use_proxy, parse_executor, cache, known)
+            return
+
+        # 否则执行原有的豆瓣电影爬取逻辑
+        if args.urls:
+            results = await batch_fetch(args.urls, use_proxy=use_proxy, parse_executor=parse_executor, cache=cache,
+                                        known=known)
+        else:
+            # 从持久化队列续爬：先恢复上次中断的任务，再在已知最大id之后追加新id
+            frontier = Frontier()
+            recovered = await frontier.recover()
+            max_id = max(await get_max_id(), await frontier.max_subject_id())
+            seeded = await frontier.seed_range(max_id + 1, args.count, skip=known if known is not None else ())
+            logger.info("当前最大id: %d，新增 %d 个待抓取id，恢复 %d 个中断任务", max_id, seeded, recovered)
+            totals = await frontier_fetch(frontier, use_proxy=use_proxy, parse_executor=parse_executor,
+                                          cache=cache)
+            logger.info("本次抓取结果: %s，队列状态: %s", totals, await frontier.counts())
+        if use_proxy:
+            logger.info("代理池统计: %s", get_proxy_pool().stats())
+    finally:
+        # 分片 worker 只读快照，由父进程统一保存
+        if known is not None and not args.shard_db:
+            known.save(args.known_ids)
+
+async def distributed(args, use_proxy, parse_executor, cache, known=None):
+    from crawler.coordinator import Coordinator, open_backend, run_worker
+    from crawler.db import get_max_id
+
+    coordinator = Coordinator(open_backend(args.coordinator))
+    try:
+        if args.plan:
+            start_id = args.start_id if args.start_id is not None else await get_max_id() + 1
+            added = await coordinator.plan(start_id, start_id + args.count, COORDINATOR_SHARD_SIZE)
+            logger.info("新增 %d 个区间，协调器状态: %s", added, await coordinator.status())
+        if args.worker:
+            totals = await run_worker(coordinator, use_proxy=use_proxy, parse_executor=parse_executor, cache=cache,
+                                      known=known)
+            logger.info("worker 抓取结果: %s", totals)
+        if args.local_workers:
+            if known is not None:
+                # worker 子进程从同一个快照加载索引
+                known.save(args.known_ids)
+            shard_dbs = await spawn_workers(args)
+            await merge_shards(shard_dbs)
+        logger.info("协调器状态: %s", await coordinator.status())
+    finally:
+        await coordinator.backend.close()
+
+async def spawn_workers(args):
+    """在本机启动多个 worker 子进程，每个进程写入自己的分片数据库，返回这些数据库的路径。"""
+    shard_dbs = [str(Path(SHARD_DB_DIR) / f"worker-{i}.db") for i in range(args.local_workers)]
+    command = [sys.executable, sys.argv[0], '--worker', '--coordinator', args.coordinator,
+               '--log-level', args.log_level]
+    if args.proxy:
+        command.append('--proxy')
+    if args.cache:
+        command.append('--cache')
+    if args.parse_workers:
+        command += ['--parse-workers', str(args.parse_workers)]
+    command += ['--no-known-ids'] if args.no_known_ids else ['--known-ids', args.known_ids]
+    processes = [
+        await asyncio.create_subprocess_exec(*command, '--shard-db', shard_db)
+        for shard_db in shard_dbs
+    ]
+    codes = await asyncio.gather(*(process.wait() for process in processes))
+    if any(codes):
+        logger.warning("部分 worker 异常退出: %s", codes)
+    return shard_dbs
+
+async def merge_shards(shard_dbs):
+    from crawler.db import merge_movies
+
+    for shard_db in shard_dbs:
+        if not Path(shard_db).exists():
+            logger.warning("分片数据库不存在: %s", shard_db)
+            continue
+        result = await merge_movies(f"sqlite+aiosqlite:///{shard_db}")
+        logger.info("合并 %s: %s", shard_db, result)
+
+async def run():
+    try:
+        await main()
+    finally:
+        # 关闭共享的HTTP连接池与代理池后台任务；本次运行没有导入的模块也就没有需要关闭的资源
+        if "crawler.http_client" in sys.modules:
+            await sys.modules["crawler.http_client"].close_clients()
+        if "crawler.proxy_pool" in sys.modules:
+            await sys.modules["crawler.proxy_pool"].close_proxy_pool()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(run())
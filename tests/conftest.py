@@ -0,0 +1,45 @@
+import pytest
+
+from benchmarks.mock_server import MockConfig, MockServer
+from crawler import db
+from crawler.http_client import close_clients
+from crawler.rate_limit import RateLimiter
+
+# 测试中不限速：速率与并发固定，不随响应自适应
+FAST_LIMITS = {
+    "default": {
+        "rate": 1000.0, "burst": 100, "min_rate": 1000.0, "max_rate": 1000.0,
+        "min_concurrency": 10, "max_concurrency": 10, "initial_concurrency": 10,
+    },
+}
+
+
+@pytest.fixture
+async def database(tmp_path):
+    """在临时目录中建一个空的 movies.db，测试结束后释放连接池。"""
+    await db.configure_database(f"sqlite+aiosqlite:///{tmp_path / 'movies.db'}")
+    await db.init_db()
+    yield
+    await db.engine.dispose()
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter(FAST_LIMITS)
+
+
+@pytest.fixture
+async def start_mock_server():
+    """启动低延迟的 MockServer，参数同 MockConfig；测试结束后关闭服务器与共享的HTTP客户端。"""
+    servers = []
+
+    async def start(**options):
+        server = MockServer(MockConfig(**{"latency_ms": 1, "jitter_ms": 1, **options}))
+        await server.start()
+        servers.append(server)
+        return server
+
+    yield start
+    await close_clients()
+    for server in servers:
+        await server.close()
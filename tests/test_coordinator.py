@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from crawler.coordinator import Coordinator, SqliteLeaseBackend
+
+
+@pytest.fixture
+async def coordinator(tmp_path):
+    coordinator = Coordinator(SqliteLeaseBackend(tmp_path / "coordinator.db"), lease_ttl=30,
+                              batch_size=10, min_split=10)
+    yield coordinator
+    await coordinator.backend.close()
+
+
+async def test_acquire_prefers_lowest_free_shard(coordinator):
+    assert await coordinator.plan(0, 300, 100) == 3
+    first = await coordinator.acquire("a")
+    second = await coordinator.acquire("b")
+    assert (first.start_id, first.end_id) == (0, 100)
+    assert (second.start_id, second.end_id) == (100, 200)
+
+
+async def test_acquire_splits_largest_leased_shard_in_half(coordinator):
+    await coordinator.plan(0, 1000, 1000)
+    owner = await coordinator.acquire("a")
+
+    stolen = await coordinator.acquire("b")
+
+    assert (stolen.start_id, stolen.end_id, stolen.next_id) == (500, 1000, 500)
+    current = await coordinator.heartbeat(owner, owner.next_id)
+    assert current.end_id == 500
+
+
+async def test_split_point_stays_after_reported_progress(coordinator):
+    await coordinator.plan(0, 1000, 1000)
+    owner = await coordinator.acquire("a")
+    await coordinator.heartbeat(owner, 900)
+
+    stolen = await coordinator.acquire("b")
+
+    # 剩余 100 个ID，一半不足一批时至少留给原 worker 一批
+    assert stolen.start_id == 950
+    assert stolen.start_id >= 900 + coordinator.batch_size
+
+
+async def test_no_split_below_twice_min_split(coordinator):
+    await coordinator.plan(0, 1000, 1000)
+    owner = await coordinator.acquire("a")
+    await coordinator.heartbeat(owner, 985)
+
+    assert await coordinator.acquire("b") is None
+    assert await coordinator.acquire("a") is None
+
+
+async def test_expired_lease_is_taken_over(tmp_path):
+    coordinator = Coordinator(SqliteLeaseBackend(tmp_path / "coordinator.db"), lease_ttl=0.05,
+                              batch_size=10, min_split=10)
+    try:
+        await coordinator.plan(0, 100, 100)
+        stale = await coordinator.acquire("a")
+        await asyncio.sleep(0.1)
+
+        taken = await coordinator.acquire("b")
+
+        assert taken.shard_id == stale.shard_id and taken.worker == "b"
+        assert await coordinator.heartbeat(stale, 50) is None
+        assert await coordinator.complete(taken)
+        assert await coordinator.finished()
+    finally:
+        await coordinator.backend.close()
@@ -0,0 +1,192 @@
+import asyncio
+import contextlib
+import time
+
+import httpx
+import pytest
+
+from benchmarks.mock_server import subject_outcome
+from crawler import crawler
+from crawler.config import HOST_BAN_MIN_COUNT
+from crawler.crawler import fetch_movie, stream_fetch
+from crawler.frontier import DONE, FAILED, NOT_FOUND
+from crawler.known_ids import KnownIds
+from crawler.metrics import REQUEST_LATENCY, RESPONSES
+from crawler.retry import FetchError
+from crawler.writer import MovieWriter
+
+
+def subject_urls(server, ids):
+    return [f"{server.base_url}/subject/{i}/" for i in ids]
+
+
+async def test_isolated_403s_do_not_park_the_host(database, start_mock_server, limiter):
+    server = await start_mock_server(not_found=0, forbidden=0.02)
+    ids = range(1, 301)
+    forbidden = {url for i, url in zip(ids, subject_urls(server, ids))
+                 if subject_outcome(server.config, i) == "forbidden"}
+    assert forbidden
+
+    start = time.monotonic()
+    outcomes = {}
+    async with MovieWriter(flush_interval=0.05) as writer:
+        async for url, outcome, _ in stream_fetch(subject_urls(server, ids), use_proxy=False, max_retries=1,
+                                                  writer=writer, limiter=limiter):
+            outcomes[url] = outcome
+
+    # 单个页面的 403 只让该URL失败，不会让整个域名暂停
+    assert time.monotonic() - start < 10
+    assert limiter.for_url(server.base_url).parked_for() == 0
+    assert {url for url, outcome in outcomes.items() if outcome == FAILED} == forbidden
+    assert sum(outcome == DONE for outcome in outcomes.values()) == 300 - len(forbidden)
+
+
+async def test_block_page_parks_the_host(database, start_mock_server, limiter):
+    server = await start_mock_server(not_found=0, sec_redirect=1.0)
+
+    result = await fetch_movie(subject_urls(server, [1])[0], use_proxy=False, limiter=limiter)
+
+    assert result.error == FetchError.BANNED
+    assert limiter.for_url(server.base_url).parked_for() > 0
+
+
+async def test_mostly_rejected_direct_requests_park_the_host(database, start_mock_server, limiter):
+    server = await start_mock_server(not_found=0, forbidden=1.0)
+    host = limiter.for_url(server.base_url)
+    # 重试时再次被拒只说明该页面本身受限，不计入封禁判断
+    for url in subject_urls(server, range(1, HOST_BAN_MIN_COUNT + 1)):
+        await fetch_movie(url, use_proxy=False, limiter=limiter, retry=True)
+    assert host.parked_for() == 0
+
+    for url in subject_urls(server, range(1, HOST_BAN_MIN_COUNT)):
+        assert (await fetch_movie(url, use_proxy=False, limiter=limiter)).error == FetchError.BANNED
+    assert host.parked_for() == 0
+
+    await fetch_movie(subject_urls(server, [HOST_BAN_MIN_COUNT])[0], use_proxy=False, limiter=limiter)
+    assert host.parked_for() > 0
+
+
+async def collect(urls, limiter, **kwargs):
+    kwargs.setdefault("writer", MovieWriter(flush_interval=0.05))
+    async with asyncio.timeout(30):
+        return [item async for item in stream_fetch(urls, use_proxy=False, limiter=limiter, **kwargs)]
+
+
+async def test_results_arrive_in_completion_order(database, start_mock_server, limiter):
+    slow = await start_mock_server(latency_ms=300, not_found=0)
+    fast = await start_mock_server(not_found=0)
+    urls = subject_urls(slow, [1]) + subject_urls(fast, range(2, 12))
+
+    results = await collect(urls, limiter)
+
+    assert [url for url, _, _ in results][-1] == urls[0]
+    assert sorted(url for url, _, _ in results) == sorted(urls)
+    assert all(outcome == DONE and movie is not None for _, outcome, movie in results)
+
+
+async def test_known_urls_are_skipped_without_requests(database, start_mock_server, limiter):
+    server = await start_mock_server(not_found=0)
+    urls = subject_urls(server, range(1, 11))
+    known = KnownIds()
+    known.update(range(1, 6))
+    before = RESPONSES.value(host=server.host, status=200)
+
+    results = await collect(urls, limiter, known=known)
+
+    assert sorted(url for url, _, _ in results) == sorted(urls[5:])
+    assert RESPONSES.value(host=server.host, status=200) - before == 5
+
+
+async def test_rows_that_fail_to_write_are_failed(database, start_mock_server, limiter):
+    async def failing_write(items):
+        raise RuntimeError("disk full")
+
+    server = await start_mock_server(not_found=0.3)
+    urls = subject_urls(server, range(1, 21))
+    async with MovieWriter(write_batch=failing_write, flush_interval=0.05) as writer:
+        results = await collect(urls, limiter, writer=writer)
+
+    outcomes = {url: outcome for url, outcome, _ in results}
+    assert set(outcomes.values()) == {FAILED, NOT_FOUND}
+    for i, url in zip(range(1, 21), urls):
+        assert outcomes[url] == (NOT_FOUND if subject_outcome(server.config, i) == "not_found" else FAILED)
+
+
+async def test_retries_stop_at_max_retries(database, start_mock_server, limiter):
+    server = await start_mock_server(flaky=1.0)
+    urls = subject_urls(server, range(1, 4))
+    before = RESPONSES.value(host=server.host, status=503)
+
+    results = await collect(urls, limiter, max_retries=2)
+
+    assert {outcome for _, outcome, _ in results} == {FAILED}
+    assert RESPONSES.value(host=server.host, status=503) - before == 2 * len(urls)
+
+
+async def test_empty_source_ends_immediately(database, limiter):
+    assert await collect([], limiter, writer=None) == []
+
+
+async def test_source_error_is_raised_after_in_flight_urls(database, start_mock_server, limiter):
+    server = await start_mock_server(not_found=0)
+
+    async def urls():
+        for url in subject_urls(server, range(1, 4)):
+            yield url
+        raise ValueError("source failed")
+
+    seen = []
+    with pytest.raises(ValueError, match="source failed"):
+        async with asyncio.timeout(30):
+            async for url, _, _ in stream_fetch(urls(), use_proxy=False, limiter=limiter,
+                                                writer=MovieWriter(flush_interval=0.05)):
+                seen.append(url)
+    assert sorted(seen) == sorted(subject_urls(server, range(1, 4)))
+
+
+async def test_worker_error_is_raised_instead_of_hanging(database, limiter, monkeypatch):
+    async def broken_fetch(url, **kwargs):
+        raise RuntimeError("worker failed")
+
+    monkeypatch.setattr(crawler, "fetch_movie", broken_fetch)
+    with pytest.raises(RuntimeError, match="worker failed"):
+        await collect([f"http://127.0.0.1:9/subject/{i}/" for i in range(100)], limiter, workers=4,
+                      writer=None)
+
+
+async def test_commit_error_is_raised_instead_of_hanging(database, start_mock_server, limiter):
+    class BrokenWriter(MovieWriter):
+        async def put(self, item):
+            future = asyncio.get_running_loop().create_future()
+            future.set_exception(RuntimeError("commit check failed"))
+            return future
+
+    server = await start_mock_server(not_found=0)
+    async with BrokenWriter() as writer:
+        with pytest.raises(RuntimeError, match="commit check failed"):
+            await collect(subject_urls(server, range(1, 6)), limiter, writer=writer)
+
+
+async def test_latency_is_labelled_by_route_not_proxy_address(database, start_mock_server, limiter, monkeypatch):
+    server = await start_mock_server(not_found=0)
+    proxies = iter(f"http://10.0.0.{i}:8080" for i in range(1, 6))
+
+    async def rotating_proxy(exclude=()):
+        return next(proxies)
+
+    class DirectClients:
+        @contextlib.asynccontextmanager
+        async def lease(self, proxy):
+            async with httpx.AsyncClient() as client:
+                yield client
+
+    monkeypatch.setattr(crawler, "get_valid_proxy", rotating_proxy)
+    REQUEST_LATENCY.reset()
+
+    for url in subject_urls(server, range(1, 6)):
+        await fetch_movie(url, clients=DirectClients(), limiter=limiter)
+    await fetch_movie(subject_urls(server, [6])[0], use_proxy=False, limiter=limiter)
+
+    series = [summary["labels"] for summary in REQUEST_LATENCY.summaries()]
+    assert sorted(labels["route"] for labels in series) == ["direct", "proxy"]
+    assert next(s["count"] for s in REQUEST_LATENCY.summaries() if s["labels"]["route"] == "proxy") == 5
@@ -0,0 +1,73 @@
+import datetime
+import json
+import sqlite3
+
+from sqlalchemy import update
+
+from crawler import db
+from crawler.db import Movie, add_movies
+from crawler.export import export_table, load_watermarks
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+def _movie(movie_id):
+    return {"id": movie_id, "title": f"t{movie_id}", "url": f"https://movie.douban.com/subject/{movie_id}/"}
+
+
+async def _set_update_at(movie_ids, moment):
+    async with db.AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(update(Movie).where(Movie.id.in_(movie_ids)).values(update_at=moment))
+
+
+def _exported_ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+async def test_incremental_export_holds_back_recent_rows(database, tmp_path):
+    await add_movies([_movie(i) for i in range(1, 6)])
+    await _set_update_at([1, 2, 3], _utcnow() - datetime.timedelta(hours=1))
+
+    full = await export_table("movies", directory=tmp_path, safety_margin=60)
+    # 4、5 刚刚写入，可能还有更早时间戳的事务未提交
+    assert _exported_ids(full["path"]) == [1, 2, 3]
+    watermark = load_watermarks(tmp_path)["movies"]
+    assert watermark[1] == 3 and watermark[0] < _utcnow() - datetime.timedelta(seconds=60)
+
+    # 一个提交较慢、时间戳早于 4、5 的写入
+    await add_movies([_movie(6)])
+    await _set_update_at([6], _utcnow() - datetime.timedelta(minutes=30))
+    await _set_update_at([4, 5], _utcnow() - datetime.timedelta(minutes=10))
+
+    incremental = await export_table("movies", directory=tmp_path, incremental=True, safety_margin=60)
+    assert _exported_ids(incremental["path"]) == [6, 4, 5]
+
+    nothing = await export_table("movies", directory=tmp_path, incremental=True, safety_margin=60)
+    assert nothing["rows"] == 0 and nothing["path"] is None
+
+
+async def test_export_reads_only_existing_columns(tmp_path):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE sina_us_stocks (id INTEGER PRIMARY KEY, category VARCHAR, symbol VARCHAR, "
+                     "name VARCHAR, created_at DATETIME, update_at DATETIME)")
+        conn.execute("INSERT INTO sina_us_stocks VALUES (1, '科技', 'AAPL', '苹果', NULL, '2024-01-01 00:00:00')")
+    await db.configure_database(f"sqlite+aiosqlite:///{path}")
+    try:
+        result = await export_table("sina_us_stocks", directory=tmp_path / "exports")
+        missing = await export_table("movies", directory=tmp_path / "exports")
+    finally:
+        await db.engine.dispose()
+
+    with open(result["path"], encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert rows == [{"id": 1, "category": "科技", "symbol": "AAPL", "name": "苹果", "created_at": None,
+                     "update_at": "2024-01-01 00:00:00"}]
+    assert missing["rows"] == 0 and missing["path"] is None
+    # 导出不执行迁移
+    with sqlite3.connect(path) as conn:
+        assert "delisted_at" not in {row[1] for row in conn.execute("PRAGMA table_info(sina_us_stocks)")}
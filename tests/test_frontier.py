@@ -0,0 +1,101 @@
+import asyncio
+import datetime
+
+from sqlalchemy import select
+
+from crawler import db
+from crawler.db import CrawlFrontier
+from crawler.frontier import DONE, FAILED, IN_FLIGHT, NOT_FOUND, PENDING, SUBJECT_URL, UNCHANGED, Frontier
+
+
+def url(subject_id):
+    return SUBJECT_URL.format(subject_id)
+
+
+async def row(subject_id):
+    async with db.AsyncSessionLocal() as session:
+        return (await session.execute(select(CrawlFrontier).where(CrawlFrontier.url == url(subject_id)))).scalar_one()
+
+
+async def test_seed_range_skips_known_and_existing_ids(database):
+    frontier = Frontier()
+    assert await frontier.seed_range(100, 10, skip={101, 105}) == 8
+    # 已在队列中的URL保持原状态，不重复加入
+    assert await frontier.seed_range(105, 10) == 6
+    assert await frontier.counts() == {PENDING: 14}
+    assert await frontier.max_subject_id() == 114
+
+
+async def test_claim_returns_lowest_ids_and_marks_them_in_flight(database):
+    frontier = Frontier()
+    await frontier.seed_urls([url(i) for i in (30, 10, 20, 40)])
+
+    assert await frontier.claim(3) == [url(10), url(20), url(30)]
+    assert await frontier.counts() == {IN_FLIGHT: 3, PENDING: 1}
+    assert await frontier.claim(3) == [url(40)]
+    assert await frontier.claim(3) == []
+
+
+async def test_concurrent_claims_do_not_overlap(database):
+    frontier = Frontier()
+    await frontier.seed_range(1, 100)
+
+    claimed = await asyncio.gather(*(frontier.claim(15) for _ in range(8)))
+
+    urls = [u for chunk in claimed for u in chunk]
+    assert len(urls) == len(set(urls)) == 100
+
+
+async def test_mark_records_final_states(database):
+    frontier = Frontier()
+    await frontier.seed_range(1, 3)
+    await frontier.claim(3)
+
+    await frontier.mark({url(1): DONE, url(2): UNCHANGED, url(3): NOT_FOUND})
+
+    # 未变化的页面在队列中按 done 记录
+    assert await frontier.counts() == {DONE: 2, NOT_FOUND: 1}
+    assert await frontier.claim(10) == []
+
+
+async def test_failed_urls_back_off_before_being_claimed_again(database):
+    frontier = Frontier(retry_base=60, retry_max=90)
+    await frontier.seed_range(1, 1)
+    await frontier.claim(1)
+
+    before = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    await frontier.mark({url(1): FAILED})
+    failed = await row(1)
+    assert (failed.state, failed.attempts) == (FAILED, 1)
+    assert datetime.timedelta(seconds=59) < failed.next_eligible_at - before < datetime.timedelta(seconds=61)
+    assert await frontier.claim(1) == []
+
+    await frontier.mark({url(1): FAILED})
+    # 第 n 次失败等待 retry_base * 2^(n-1) 秒，不超过 retry_max
+    assert (await row(1)).next_eligible_at - before < datetime.timedelta(seconds=91)
+
+
+async def test_failed_urls_are_abandoned_after_max_attempts(database):
+    frontier = Frontier(max_attempts=2, retry_base=0)
+    await frontier.seed_range(1, 1)
+
+    assert await frontier.claim(1) == [url(1)]
+    await frontier.mark({url(1): FAILED})
+    assert await frontier.claim(1) == [url(1)]
+    await frontier.mark({url(1): FAILED})
+
+    assert await frontier.claim(1) == []
+    assert (await row(1)).attempts == 2
+    assert await frontier.counts() == {FAILED: 1}
+
+
+async def test_recover_returns_in_flight_urls_to_the_queue(database):
+    frontier = Frontier()
+    await frontier.seed_range(1, 5)
+    await frontier.claim(3)
+    await frontier.mark({url(1): DONE})
+
+    assert await frontier.recover() == 2
+    assert await frontier.counts() == {DONE: 1, PENDING: 4}
+    assert await frontier.claim(10) == [url(i) for i in range(2, 6)]
+    assert await frontier.recover() == 4
@@ -0,0 +1,102 @@
+import datetime
+
+import pytest
+
+from crawler.config import FRONTIER_MAX_ATTEMPTS
+from crawler.crawler import stream_fetch
+from crawler.db import add_movies
+from crawler.frontier import FAILED, NOT_FOUND, Frontier
+from crawler.known_ids import KnownIds, load_known_ids
+from crawler.writer import MovieWriter
+
+
+def test_add_and_contains():
+    known = KnownIds()
+    known.update([0, 7, 8, 1_000_003])
+    assert 7 in known and 8 in known and 1_000_003 in known
+    assert 6 not in known and 1_000_004 not in known
+    assert -1 not in known and "7" not in known
+    assert len(known) == 4
+
+
+def test_url_helpers():
+    known = KnownIds()
+    known.add_url("https://movie.douban.com/subject/1292052/")
+    known.add_url("https://example.com/no-subject")
+    assert known.contains_url("https://movie.douban.com/subject/1292052/")
+    assert not known.contains_url("https://movie.douban.com/subject/1292053/")
+    assert len(known) == 1
+
+
+def test_save_and_load_round_trip(tmp_path):
+    watermark = datetime.datetime(2025, 1, 2, 3, 4, 5, 600000)
+    known = KnownIds(watermark=watermark)
+    known.update([1, 64, 12_345_678])
+    path = tmp_path / "known_ids.bin"
+
+    known.save(path)
+    loaded = KnownIds.load(path)
+
+    assert loaded is not None
+    assert loaded.watermark == watermark
+    assert [i for i in (1, 2, 64, 12_345_678) if i in loaded] == [1, 64, 12_345_678]
+    assert not path.with_name(path.name + ".tmp").exists()
+
+
+def test_load_rejects_missing_or_foreign_files(tmp_path):
+    assert KnownIds.load(tmp_path / "missing.bin") is None
+    (tmp_path / "short.bin").write_bytes(b"DK")
+    assert KnownIds.load(tmp_path / "short.bin") is None
+    (tmp_path / "other.bin").write_bytes(b"XXXX" + bytes(20))
+    assert KnownIds.load(tmp_path / "other.bin") is None
+
+
+async def test_load_known_ids_reads_movies_and_final_frontier_states(database, tmp_path):
+    await add_movies([{"id": 10, "title": "t", "url": "https://movie.douban.com/subject/10/"}])
+    frontier = Frontier()
+    await frontier.seed_range(20, 4)
+    await frontier.mark({"https://movie.douban.com/subject/20/": NOT_FOUND})
+    # 失败次数达到上限的ID不会再被领取，同样计入索引
+    for _ in range(FRONTIER_MAX_ATTEMPTS):
+        await frontier.mark({"https://movie.douban.com/subject/21/": FAILED})
+    await frontier.mark({"https://movie.douban.com/subject/22/": FAILED})
+
+    path = tmp_path / "known_ids.bin"
+    known = await load_known_ids(path)
+    assert [i for i in range(10, 24) if i in known] == [10, 20, 21]
+
+    known.save(path)
+    await add_movies([{"id": 30, "title": "t", "url": "https://movie.douban.com/subject/30/"}])
+    reloaded = await load_known_ids(path)
+    assert 30 in reloaded and 10 in reloaded
+
+
+@pytest.fixture
+async def mock_server(start_mock_server):
+    return await start_mock_server(not_found=0.2)
+
+
+async def _crawl(server, limiter, known, **writer_options):
+    urls = [f"{server.base_url}/subject/{i}/" for i in range(1, 31)]
+    outcomes = {}
+    async with MovieWriter(flush_interval=0.05, **writer_options) as writer:
+        async for url, outcome, _ in stream_fetch(urls, use_proxy=False, max_retries=1, writer=writer,
+                                                  limiter=limiter, known=known):
+            outcomes[url] = outcome
+    return outcomes
+
+
+async def test_ids_are_added_only_after_commit(database, mock_server, limiter):
+    async def failing_write(items):
+        raise RuntimeError("disk full")
+
+    known = KnownIds()
+    outcomes = await _crawl(mock_server, limiter, known, write_batch=failing_write)
+    # 写入失败的ID按 failed 产出且不进入索引，404 的ID仍然记录
+    not_found = {url for url, outcome in outcomes.items() if outcome == NOT_FOUND}
+    assert set(outcomes.values()) == {FAILED, NOT_FOUND}
+    assert {url for url in outcomes if known.contains_url(url)} == not_found
+
+    outcomes = await _crawl(mock_server, limiter, known)
+    assert set(outcomes.values()) == {"done"}
+    assert all(known.contains_url(f"{mock_server.base_url}/subject/{i}/") for i in range(1, 31))
@@ -0,0 +1,166 @@
+import asyncio
+import time
+
+import pytest
+
+from crawler import proxy_pool
+from crawler.proxy_pool import ProxyPool, ProxyStats, is_ban_response, is_block_response
+
+
+class FakePool(ProxyPool):
+    """代理API依次返回 candidates，校验结果取自 latencies（不在其中的代理校验失败）。"""
+
+    def __init__(self, candidates, latencies, **options):
+        super().__init__(**{"min_size": 2, "max_size": 4, "validate_concurrency": 2, "max_failures": 2,
+                            "cooldown": 60.0, "acquire_timeout": 1.0, **options})
+        self.candidates = list(candidates)
+        self.latencies = latencies
+        self.checked = []
+
+    async def _fetch_candidate(self):
+        return self.candidates.pop(0) if self.candidates else None
+
+    async def _check(self, proxy):
+        self.checked.append(proxy)
+        return self.latencies.get(proxy)
+
+
+@pytest.fixture
+def discarded(monkeypatch):
+    """记录被丢弃的共享客户端。"""
+    addresses = []
+    monkeypatch.setattr(proxy_pool, "discard_client", addresses.append)
+    return addresses
+
+
+async def filled(pool, size):
+    pool._ensure_started()
+    async with asyncio.timeout(5):
+        while len(pool._proxies) < size:
+            await asyncio.sleep(0.01)
+    return pool
+
+
+def test_score_prefers_reliable_fast_unbanned_proxies():
+    fast = ProxyStats("a", latency=0.1, successes=9, failures=1)
+    slow = ProxyStats("b", latency=2.0, successes=9, failures=1)
+    flaky = ProxyStats("c", latency=0.1, successes=1, failures=9)
+    banned = ProxyStats("d", latency=0.1, successes=9, failures=1, bans=1)
+    assert fast.score > slow.score
+    assert fast.score > flaky.score
+    assert fast.score > banned.score
+    # 新代理按 0.5 的成功率起步
+    assert ProxyStats("e").success_rate == 0.5
+
+
+def test_ban_signals():
+    assert is_ban_response(403) and is_ban_response(418)
+    assert is_ban_response(302, "https://sec.douban.com/b?r=x")
+    assert is_ban_response(200, text="有异常请求从你的 IP 发出")
+    assert not is_ban_response(200, text="<html>ok</html>") and not is_ban_response(404)
+    # 单个页面的 403 不是针对整个IP的拦截
+    assert not is_block_response(403) and is_block_response(302, "https://sec.douban.com/")
+
+
+async def test_refill_keeps_only_validated_proxies(discarded):
+    pool = FakePool(["a", "bad", "b", "c"], {"a": 0.1, "b": 0.2, "c": 0.3})
+    try:
+        assert await pool.acquire() in {"a", "b", "c"}
+        # 每轮最多并发校验 validate_concurrency 个候选，直到不少于 min_size
+        await filled(pool, 3)
+        assert set(pool._proxies) == {"a", "b", "c"}
+        assert pool.stats()["rejected"] == 1 and pool.stats()["validated"] == 3
+        # 校验失败的代理进入冷却期
+        assert pool.stats()["cooling"] == 1
+    finally:
+        await pool.close()
+
+
+async def test_acquire_avoids_excluded_proxy(discarded):
+    pool = FakePool(["a", "b"], {"a": 0.1, "b": 0.1})
+    try:
+        await filled(pool, 2)
+        assert {await pool.acquire(exclude=("a",)) for _ in range(20)} == {"b"}
+        # 池中只剩被排除的代理时仍然返回它
+        pool.evict("b")
+        assert await pool.acquire(exclude=("a",)) == "a"
+    finally:
+        await pool.close()
+
+
+async def test_acquire_times_out_when_nothing_validates(discarded):
+    pool = FakePool(["bad"], {}, acquire_timeout=0.1)
+    try:
+        assert await pool.acquire() is None
+        assert pool.stats()["misses"] == 1
+    finally:
+        await pool.close()
+
+
+async def test_report_updates_latency_and_evicts(discarded):
+    pool = FakePool(["a", "b", "c"], {"a": 1.0, "b": 1.0, "c": 1.0}, min_size=3)
+    try:
+        await filled(pool, 3)
+        pool.report("a", ok=True, latency=0.0)
+        assert pool._proxies["a"].latency == pytest.approx(0.7)
+        assert pool._proxies["a"].successes == 1
+
+        # 连续失败 max_failures 次淘汰，成功会清零连续失败次数
+        pool.report("b", ok=False)
+        pool.report("b", ok=True)
+        pool.report("b", ok=False)
+        assert "b" in pool._proxies
+        pool.report("b", ok=False)
+        assert "b" not in pool._proxies
+
+        # 封禁立即淘汰
+        pool.report("c", ok=False, banned=True)
+        assert "c" not in pool._proxies
+        assert discarded == ["b", "c"]
+        assert pool.stats()["evicted"] == 2
+    finally:
+        await pool.close()
+
+
+async def test_evicted_proxy_is_not_readded_during_cooldown(discarded):
+    pool = FakePool(["a", "b"], {"a": 0.1, "b": 0.1, "c": 0.1})
+    try:
+        await filled(pool, 2)
+        pool.evict("a")
+        # 低于 min_size 时后台补充，冷却中的代理即使再次由API返回也不收录
+        pool.candidates = ["a", "c"]
+        await filled(pool, 2)
+        assert set(pool._proxies) == {"b", "c"}
+        assert pool.checked.count("a") == 1
+    finally:
+        await pool.close()
+
+
+async def test_revalidation_evicts_failing_idle_proxies(discarded):
+    pool = FakePool(["a", "b"], {"a": 0.1, "b": 0.1}, revalidate_interval=0.05)
+    try:
+        await filled(pool, 2)
+        pool.latencies = {"a": 0.5}
+        stale = time.monotonic() - 1
+        for stats in pool._proxies.values():
+            stats.last_checked = stale
+        pool.candidates = []
+
+        async with asyncio.timeout(5):
+            while "b" in pool._proxies:
+                await asyncio.sleep(0.01)
+
+        assert discarded == ["b"]
+        assert pool._proxies["a"].latency == pytest.approx(0.3 * 0.5 + 0.7 * 0.1)
+        assert pool._proxies["a"].last_checked > stale
+    finally:
+        await pool.close()
+
+
+async def test_get_valid_proxy_keeps_test_url(discarded, monkeypatch):
+    monkeypatch.setattr(proxy_pool, "ProxyPool", lambda **options: FakePool(["a"], {"a": 0.1}, **options))
+    try:
+        assert await proxy_pool.get_valid_proxy("http://example.com/check") == "a"
+        assert proxy_pool.get_proxy_pool().test_url == "http://example.com/check"
+    finally:
+        await proxy_pool.close_proxy_pool()
@@ -0,0 +1,152 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from crawler import rate_limit
+from crawler.rate_limit import HostLimiter, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """替换 rate_limit 模块中的 time.monotonic，事件循环仍使用真实时间。"""
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=lambda: fake.now,
+                                                            perf_counter=time.perf_counter))
+    return fake
+
+
+def limiter(**options):
+    return HostLimiter(**{
+        "host": "example.com", "rate": 4.0, "burst": 4, "min_rate": 1.0, "max_rate": 8.0,
+        "min_concurrency": 1, "max_concurrency": 4, "initial_concurrency": 2,
+        "decrease_factor": 0.5, "backoff_window": 5.0, "ban_window": 30.0, "ban_min_count": 3,
+        "ban_ratio": 0.5, **options,
+    })
+
+
+def test_success_increases_additively_up_to_max(clock):
+    host = limiter()
+    host.feedback(200)
+    assert host.limit == 2.5
+    assert host.rate == pytest.approx(4.0 + 1 / 2.5)
+    # 404 同样算正常响应
+    host.feedback(404)
+    assert host.limit == pytest.approx(2.5 + 1 / 2.5)
+    for _ in range(100):
+        host.feedback(200)
+    assert (host.limit, host.rate) == (4, 8.0)
+
+
+def test_other_errors_leave_limits_unchanged(clock):
+    host = limiter()
+    for status in (403, 500, None):
+        host.feedback(status)
+    assert (host.limit, host.rate) == (2, 4.0)
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_overload_decreases_multiplicatively_once_per_window(clock, status):
+    host = limiter(initial_concurrency=4)
+    host.feedback(status)
+    assert (host.limit, host.rate) == (2, 2.0)
+    # 同一退避窗口内已发出的请求不会继续下调
+    clock.advance(4.9)
+    host.feedback(status)
+    assert (host.limit, host.rate) == (2, 2.0)
+    clock.advance(0.2)
+    host.feedback(status)
+    assert (host.limit, host.rate) == (1, 1.0)
+    clock.advance(5.1)
+    host.feedback(None, banned=True)
+    assert (host.limit, host.rate) == (1, 1.0)
+
+
+def test_park_and_parked_for(clock):
+    host = limiter()
+    assert host.parked_for() == 0
+    host.park(10)
+    assert host.parked_for() == 10
+    clock.advance(4)
+    assert host.parked_for() == 6
+    # 更短的暂停不会提前结束已有的暂停
+    host.park(2)
+    assert host.parked_for() == 6
+    host.park(8)
+    assert host.parked_for() == 8
+    clock.advance(8)
+    assert host.parked_for() == 0
+    assert host.snapshot()["parked_seconds"] == 0
+
+
+def test_record_response_needs_count_and_ratio_in_window(clock):
+    host = limiter()
+    for _ in range(6):
+        assert not host.record_response(False)
+    assert not host.record_response(True)
+    assert not host.record_response(True)
+    # 3 次被拒但只占 3/9
+    assert not host.record_response(True)
+    clock.advance(31)
+    # 窗口外的响应不再计入
+    assert not host.record_response(True)
+    assert not host.record_response(True)
+    assert host.record_response(True)
+
+
+async def test_slot_limits_concurrency():
+    host = limiter(rate=1000.0, burst=100, max_rate=1000.0)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with host.slot():
+            peak = max(peak, host.in_flight)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(request() for _ in range(10)))
+    assert peak == 2
+    assert host.in_flight == 0
+
+
+async def test_slot_waits_for_tokens():
+    host = limiter(rate=20.0, burst=2, max_rate=20.0, initial_concurrency=4)
+    start = time.monotonic()
+    for _ in range(4):
+        async with host.slot():
+            pass
+    # 前两个请求用掉突发额度，后两个按 20/s 等待令牌
+    assert time.monotonic() - start >= 0.09
+
+
+async def test_slot_waits_while_parked():
+    host = limiter()
+    host.park(0.05)
+    start = time.monotonic()
+    async with host.slot():
+        pass
+    assert time.monotonic() - start >= 0.05
+
+
+def test_rate_limiter_uses_per_host_config():
+    limits = {
+        "default": {"rate": 1.0, "burst": 1, "min_rate": 1.0, "max_rate": 1.0,
+                    "min_concurrency": 1, "max_concurrency": 1, "initial_concurrency": 1},
+        "movie.douban.com": {"rate": 2.0, "burst": 2, "min_rate": 1.0, "max_rate": 2.0,
+                             "min_concurrency": 1, "max_concurrency": 3, "initial_concurrency": 3},
+    }
+    limiters = RateLimiter(limits)
+    douban = limiters.for_url("https://movie.douban.com/subject/1/")
+    assert limiters.for_url("https://movie.douban.com/subject/2/") is douban
+    assert douban.limit == 3
+    assert limiters.for_url("https://example.com/").limit == 1
+    assert set(limiters.snapshot()) == {"movie.douban.com", "example.com"}
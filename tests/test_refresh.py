@@ -0,0 +1,75 @@
+import datetime
+
+import pytest
+from sqlalchemy import event, select, update
+
+from crawler import db
+from crawler.db import Movie, add_movies, refresh_movies, touch_movies
+
+OLD = datetime.datetime(2020, 1, 1)
+
+
+def movie(movie_id, **fields):
+    return {"id": movie_id, "title": f"电影{movie_id}", "year": "2001", "director": "导演", "rating": 7.0,
+            "url": f"https://movie.douban.com/subject/{movie_id}/", **fields}
+
+
+@pytest.fixture
+async def movies(database):
+    await add_movies([movie(1), movie(2), movie(3)])
+    async with db.AsyncSessionLocal() as session, session.begin():
+        await session.execute(update(Movie).values(update_at=OLD))
+
+
+@pytest.fixture
+def updates():
+    """记录执行的 UPDATE 语句及其参数。"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(db.engine.sync_engine, "before_cursor_execute", record)
+
+
+async def rows():
+    async with db.AsyncSessionLocal() as session:
+        return {row.id: row for row in (await session.execute(select(Movie))).scalars()}
+
+
+async def test_refresh_writes_only_changed_columns(movies, updates):
+    result = await refresh_movies([
+        movie(1, rating=8.5),
+        movie(2, director=None, rating=None),
+        movie(4),
+    ])
+
+    assert result == {"updated": 1, "unchanged": 1, "inserted": 1, "fail": 0}
+    set_clauses = sorted(statement.split(" SET ")[1].split(" WHERE ")[0] for statement, _ in updates)
+    assert set_clauses == ["rating=?, update_at=?", "update_at=?"]
+
+    current = await rows()
+    assert current[1].rating == 8.5 and current[1].update_at > OLD
+    # 新数据中为 None 的字段不覆盖已有值，未变化的电影也记录本次检查时间
+    assert current[2].director == "导演" and current[2].rating == 7.0 and current[2].update_at > OLD
+    assert current[3].update_at == OLD
+    assert current[4].title == "电影4"
+
+
+async def test_refresh_skips_items_without_id(movies):
+    result = await refresh_movies([{"id": None, "title": "x"}])
+    assert result == {"updated": 0, "unchanged": 0, "inserted": 0, "fail": 1}
+
+
+async def test_touch_updates_only_update_at(movies, updates):
+    await touch_movies([1, 3])
+    await touch_movies([])
+
+    assert [statement.split(" SET ")[1].split(" WHERE ")[0] for statement, _ in updates] == ["update_at=?"]
+    current = await rows()
+    assert current[1].update_at > OLD and current[3].update_at > OLD
+    assert current[2].update_at == OLD
+    assert current[1].rating == 7.0 and current[1].title == "电影1"
@@ -0,0 +1,91 @@
+import itertools
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from crawler import response_cache
+from crawler.response_cache import CacheEntry, ResponseCache
+
+HEADERS = {"etag": '"v1"', "last-modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """每次读取时间递增 1 秒，使访问顺序确定。"""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(tmp_path / "cache" / "responses.db")
+    yield cache
+    cache.close()
+
+
+def test_conditional_headers():
+    assert CacheEntry("u", '"v1"', "date", "h").conditional_headers() == {
+        "If-None-Match": '"v1"', "If-Modified-Since": "date",
+    }
+    assert CacheEntry("u", None, None, "h").conditional_headers() == {}
+
+
+async def test_store_and_lookup(cache):
+    assert await cache.lookup("u") is None
+
+    await cache.store("u", HEADERS, b"<html>page</html>")
+    entry = await cache.lookup("u")
+
+    assert entry is not None
+    assert (entry.etag, entry.last_modified) == ('"v1"', HEADERS["last-modified"])
+    assert entry.conditional_headers()["If-None-Match"] == '"v1"'
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1 and cache.stats()["stored"] == 1
+
+
+async def test_is_unchanged_compares_body_hash(cache):
+    await cache.store("u", {}, b"<html>page</html>")
+    entry = await cache.lookup("u")
+
+    assert await cache.is_unchanged(entry, b"<html>page</html>")
+    assert not await cache.is_unchanged(entry, b"<html>changed</html>")
+    assert not await cache.is_unchanged(None, b"<html>page</html>")
+    await cache.mark_not_modified("u")
+    assert cache.stats()["unchanged"] == 1 and cache.stats()["not_modified"] == 1
+
+
+async def test_store_replaces_entry_and_tracks_size(cache):
+    await cache.store("u", HEADERS, os.urandom(1000))
+    size = cache.stats()["bytes"]
+    await cache.store("u", {"etag": '"v2"'}, os.urandom(500))
+
+    entry = await cache.lookup("u")
+    assert (entry.etag, entry.last_modified) == ('"v2"', None)
+    assert cache.stats()["bytes"] < size
+
+
+async def test_evicts_least_recently_used(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "responses.db", max_bytes=3500)
+    try:
+        for url in ("a", "b", "c"):
+            await cache.store(url, {}, os.urandom(1000))
+        await cache.touch("a")
+        assert cache.stats()["evicted"] == 0
+
+        await cache.store("d", {}, os.urandom(1000))
+
+        # 淘汰最久未访问的条目，直到不超过上限的 90%
+        assert [url for url in "abcd" if await cache.lookup(url) is not None] == ["a", "c", "d"]
+        assert cache.stats()["evicted"] == 1
+        assert cache.stats()["bytes"] <= 3500 * 0.9
+    finally:
+        cache.close()
+
+
+async def test_total_size_survives_reopen(tmp_path):
+    with ResponseCache(tmp_path / "responses.db") as cache:
+        await cache.store("a", {}, os.urandom(1000))
+        size = cache.stats()["bytes"]
+    with ResponseCache(tmp_path / "responses.db") as cache:
+        assert cache.stats()["bytes"] == size
+        assert await cache.lookup("a") is not None
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from crawler.retry import FetchError, RetryPolicy, RetryScheduler, classify_exception
+
+POLICIES = {
+    "proxy": {"base_delay": 0.1, "max_delay": 1.0},
+    "banned": {"base_delay": 10.0, "max_delay": 60.0},
+    "parse": {"base_delay": 1.0, "max_delay": 5.0, "max_attempts": 2},
+}
+
+
+def test_backoff_doubles_up_to_max_delay():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    assert [policy.delay(attempt, jitter=0) for attempt in range(1, 6)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+
+def test_jitter_only_shortens_the_delay():
+    policy = RetryPolicy(base_delay=4.0, max_delay=60.0)
+    delays = [policy.delay(2, jitter=0.5) for _ in range(200)]
+    assert all(4.0 <= delay <= 8.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_backoff_uses_the_error_class_policy():
+    scheduler = RetryScheduler(POLICIES, jitter=0)
+    assert scheduler.backoff(FetchError.PROXY, 1) == 0.1
+    assert scheduler.backoff(FetchError.BANNED, 1) == 10.0
+    assert scheduler.backoff(FetchError.BANNED, 4) == 60.0
+
+
+def test_should_retry_respects_both_limits():
+    scheduler = RetryScheduler(POLICIES)
+    assert scheduler.should_retry(FetchError.PROXY, 2, max_attempts=3)
+    assert not scheduler.should_retry(FetchError.PROXY, 3, max_attempts=3)
+    # parse 类错误自身最多尝试 2 次
+    assert scheduler.should_retry(FetchError.PARSE, 1, max_attempts=5)
+    assert not scheduler.should_retry(FetchError.PARSE, 2, max_attempts=5)
+
+
+async def test_items_come_out_in_due_order():
+    scheduler: RetryScheduler[str] = RetryScheduler(POLICIES)
+    scheduler.schedule("late", 0.06)
+    scheduler.schedule("early", 0.02)
+    scheduler.schedule("now", 0)
+    scheduler.schedule("also-now", 0)
+    assert len(scheduler) == 4
+
+    start = time.monotonic()
+    order = [await scheduler.get() for _ in range(4)]
+
+    assert order == ["now", "also-now", "early", "late"]
+    assert time.monotonic() - start >= 0.05
+    assert len(scheduler) == 0
+
+
+async def test_get_wakes_for_an_earlier_item_scheduled_while_waiting():
+    scheduler: RetryScheduler[str] = RetryScheduler(POLICIES)
+    scheduler.schedule("slow", 5.0)
+    waiter = asyncio.create_task(scheduler.get())
+    await asyncio.sleep(0.01)
+
+    scheduler.schedule("fast", 0.01)
+
+    assert await asyncio.wait_for(waiter, timeout=1.0) == "fast"
+    assert len(scheduler) == 1
+
+
+@pytest.mark.parametrize(
+    ("exc", "proxy", "error"),
+    [
+        (httpx.ProxyError("x"), "1.2.3.4:80", FetchError.PROXY),
+        (httpx.ConnectTimeout("x"), "1.2.3.4:80", FetchError.PROXY),
+        (httpx.ConnectTimeout("x"), None, FetchError.TIMEOUT),
+        (httpx.ReadTimeout("x"), "1.2.3.4:80", FetchError.TIMEOUT),
+        (httpx.ConnectError("x"), "1.2.3.4:80", FetchError.PROXY),
+        (httpx.ConnectError("x"), None, FetchError.NETWORK),
+        (ValueError("x"), None, FetchError.ERROR),
+    ],
+)
+def test_classify_exception(exc, proxy, error):
+    assert classify_exception(exc, proxy) == error
@@ -0,0 +1,69 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from benchmarks.mock_server import MockConfig, sina_page
+from crawler.sina_us_stock import (
+    label_category,
+    parse_sina_us_stock_data,
+    parse_sina_us_stock_html,
+    parse_sina_us_stock_text,
+)
+
+EDGE_CASES = {
+    "empty": "",
+    "no_col_div": "<html><body><a href='x' title='A,B,C'>C(A)</a></body></html>",
+    "first_div_label_ignored": (
+        '<div class="col_div"><label>3家在美上市科技类知名公司:</label>'
+        '<a href="//x" title="BABA,Alibaba,阿里巴巴">阿里巴巴(BABA)</a></div>'
+    ),
+    "title_fallback": (
+        '<div class="col_div"></div><div class="col_div"><label>7家在美知名ETF:</label>'
+        '<a href="//x" title="SPY,SPDR,标普ETF(SPY)">标普</a></div>'
+    ),
+    "formatted_with_inner_divs": (
+        '<div class="col_div">\n  <a href="//x" title="A,B,甲" target="_blank">甲(A)</a>\n</div>\n'
+        '<div class="col_div">\n  <label> 3家在美上市医药类知名公司: </label><br>\n'
+        '  <div class="row"><a href="//y" title="B,C &amp; D,乙">乙(B)</a></div>\n'
+        '  <a href="//z" title="C,D,丙">\n丙(C)\n</a><img src="x">\n</div>'
+    ),
+    "entities_and_comments": (
+        '<div class="col_div"><a href="//x" title="A,B &amp; C,丙">丙<!-- ( -->&#40;A&#x29;</a></div>'
+    ),
+    "anchor_without_href": '<div class="col_div"><a title="A,B,C">C(A)</a><a href title="D,E,F">F(D)</a></div>',
+}
+
+
+def parse_with_bs4(text: str) -> list[dict[str, str]]:
+    return parse_sina_us_stock_data(BeautifulSoup(text, "html.parser"))
+
+
+def test_synthetic_listing_matches_bs4():
+    text = sina_page(MockConfig(sina_stocks=2000, seed=7))
+    expected = parse_with_bs4(text)
+    assert len(expected) == 2000
+    assert parse_sina_us_stock_text(text) == expected
+
+
+@pytest.mark.parametrize("name", sorted(EDGE_CASES))
+def test_edge_cases_match_bs4(name):
+    text = EDGE_CASES[name]
+    assert parse_sina_us_stock_text(text) == parse_with_bs4(text)
+
+
+def test_parse_from_bytes_replaces_invalid_utf8():
+    text = sina_page(MockConfig(sina_stocks=50, seed=1))
+    content = text.encode("utf-8") + b"\xff"
+    assert parse_sina_us_stock_html(content) == parse_with_bs4(text)
+
+
+@pytest.mark.parametrize(
+    ("label", "category"),
+    [
+        ("111家在美上市科技类知名公司:", "科技"),
+        ("7家在美知名ETF:", "ETF"),
+        ("其他:中概股", "中概股"),
+        ("没有标记", "没有标记"),
+    ],
+)
+def test_label_category(label, category):
+    assert label_category(label) == category
@@ -0,0 +1,85 @@
+from sqlalchemy import select
+
+from crawler import db
+from crawler.db import SinaUSStock, SinaUSStockHistory
+from crawler.sina_sync import SinaStockSync, diff_listing
+
+SNAPSHOT = {
+    "AAPL": ("苹果", "科技类"),
+    "JPM": ("摩根大通", "金融类"),
+    "KO": ("可口可乐", "食品类"),
+    "TSLA": ("特斯拉", "制造类"),
+}
+
+
+def stock(symbol, name, category):
+    return {"symbol": symbol, "name": name, "category": category}
+
+
+def listing(snapshot=SNAPSHOT):
+    return [stock(symbol, name, category) for symbol, (name, category) in snapshot.items()]
+
+
+def test_unchanged_listing_writes_nothing():
+    changeset, upserts, history = diff_listing(SNAPSHOT, listing())
+    assert not changeset.changed
+    assert changeset.unchanged == len(SNAPSHOT)
+    assert upserts == [] and history == []
+
+
+def test_listed_renamed_recategorised_and_delisted():
+    items = [
+        stock("AAPL", "苹果公司", "科技类"),
+        stock("JPM", "摩根大通", "银行类"),
+        stock("KO", "可口可乐", "食品类"),
+        stock("NVDA", "英伟达", "科技类"),
+    ]
+    changeset, upserts, history = diff_listing(SNAPSHOT, items, delist_guard_ratio=0.5)
+
+    assert changeset.listed == ["NVDA"]
+    assert changeset.renamed == ["AAPL"]
+    assert changeset.recategorised == ["JPM"]
+    assert changeset.delisted == ["TSLA"]
+    assert changeset.unchanged == 1
+    assert {entry["symbol"] for entry in upserts} == {"AAPL", "JPM", "NVDA"}
+    by_symbol = {entry["symbol"]: entry for entry in history}
+    assert by_symbol["AAPL"]["previous_name"] == "苹果" and by_symbol["AAPL"]["previous_category"] is None
+    assert by_symbol["JPM"]["previous_category"] == "金融类" and by_symbol["JPM"]["previous_name"] is None
+    assert by_symbol["NVDA"]["change"] == "listed"
+    assert by_symbol["TSLA"] == {"symbol": "TSLA", "name": "特斯拉", "category": "制造类", "change": "delisted"}
+
+
+def test_incomplete_listing_suppresses_delisting():
+    changeset, _, history = diff_listing(SNAPSHOT, listing()[:2], delist_guard_ratio=0.9)
+    assert changeset.delist_suppressed
+    assert changeset.delisted == [] and history == []
+
+
+def test_invalid_rows_are_skipped_and_last_duplicate_wins():
+    items = [*listing(), stock("", "无代码", "科技类"), stock("AAPL", "苹果公司", "科技类")]
+    changeset, upserts, _ = diff_listing(SNAPSHOT, items)
+    assert changeset.skipped == 1
+    assert upserts == [stock("AAPL", "苹果公司", "科技类")]
+
+
+async def test_delisted_stock_is_kept_and_relisting_clears_it(database):
+    await SinaStockSync(delist_guard_ratio=0.5).sync(listing())
+    changeset = await SinaStockSync(delist_guard_ratio=0.5).sync(listing()[:3])
+    assert changeset.delisted == ["TSLA"]
+
+    async with db.AsyncSessionLocal() as session:
+        tesla = (await session.execute(select(SinaUSStock).where(SinaUSStock.symbol == "TSLA"))).scalar_one()
+    assert tesla.delisted_at is not None and tesla.name == "特斯拉"
+    # 新的同步实例从数据库加载快照，下市的股票不在快照中
+    assert "TSLA" not in await db.load_sina_snapshot()
+
+    changeset = await SinaStockSync(delist_guard_ratio=0.5).sync(listing())
+    assert changeset.listed == ["TSLA"]
+    async with db.AsyncSessionLocal() as session:
+        tesla = (await session.execute(select(SinaUSStock).where(SinaUSStock.symbol == "TSLA"))).scalar_one()
+        changes = (await session.execute(
+            select(SinaUSStockHistory.change).where(SinaUSStockHistory.symbol == "TSLA")
+            .order_by(SinaUSStockHistory.id)
+        )).scalars().all()
+    assert tesla.delisted_at is None
+    assert changes == ["listed", "delisted", "listed"]
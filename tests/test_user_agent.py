@@ -0,0 +1,55 @@
+import itertools
+
+import fake_useragent
+import pytest
+
+from crawler.user_agent import FALLBACK_USER_AGENTS, UserAgentProvider, load_user_agents
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """每次抽取返回一个新的 UA（ua-0、ua-1……），便于判断是否换了 UA。"""
+    provider = UserAgentProvider(rotate_every=3, max_sessions=2)
+    counter = itertools.count()
+    monkeypatch.setattr(provider, "random", lambda: f"ua-{next(counter)}")
+    return provider
+
+
+def test_loads_filtered_dataset_once():
+    agents = load_user_agents(["Chrome", "Firefox"])
+    assert len(agents) > len(FALLBACK_USER_AGENTS)
+    assert all("Mozilla/5.0" in agent for agent in agents)
+
+
+def test_falls_back_when_dataset_format_changes(monkeypatch):
+    class ChangedUserAgent:
+        def __init__(self, browsers):
+            self.random = "Mozilla/5.0 (X11) Firefox"
+
+    monkeypatch.setattr(fake_useragent, "UserAgent", ChangedUserAgent)
+    assert load_user_agents() == FALLBACK_USER_AGENTS
+    assert len(UserAgentProvider()) == len(FALLBACK_USER_AGENTS)
+
+
+def test_session_keeps_agent_until_rotation(provider):
+    assert [provider.get("p1") for _ in range(4)] == ["ua-0", "ua-0", "ua-0", "ua-1"]
+    # 每个代理（None 为直连）有各自的会话
+    assert provider.get(None) == "ua-2"
+    assert provider.get("p1") == "ua-1"
+
+
+def test_rotate_discards_session(provider):
+    assert provider.get("p1") == "ua-0"
+    provider.rotate("p1")
+    assert provider.get("p1") == "ua-1"
+    provider.rotate("unknown")
+
+
+def test_least_recently_used_sessions_are_dropped(provider):
+    provider.get("p1")
+    provider.get("p2")
+    provider.get("p1")
+    provider.get("p3")
+    # 最多保留 2 个会话，p2 最久未使用
+    assert provider.get("p1") == "ua-0"
+    assert provider.get("p2") == "ua-3"
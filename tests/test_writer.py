@@ -0,0 +1,100 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from crawler import db
+from crawler.db import Movie, add_movies
+from crawler.writer import MovieWriter
+
+
+def movie(movie_id, **fields):
+    return {"id": movie_id, "title": f"电影{movie_id}", "url": f"https://movie.douban.com/subject/{movie_id}/",
+            **fields}
+
+
+class RecordingWrite:
+    """包装 add_movies，记录每次批量写入的行数。"""
+
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, items):
+        self.batches.append(len(items))
+        return await add_movies(items)
+
+
+async def stored_count():
+    async with db.AsyncSessionLocal() as session:
+        return await session.scalar(select(func.count()).select_from(Movie))
+
+
+async def test_flushes_when_batch_is_full(database):
+    write = RecordingWrite()
+    async with MovieWriter(batch_size=3, flush_interval=60, write_batch=write) as writer:
+        futures = [await writer.put(movie(i)) for i in range(1, 5)]
+        async with asyncio.timeout(5):
+            assert await asyncio.gather(*futures[:3]) == [True, True, True]
+        assert not futures[3].done()
+        assert write.batches == [3]
+        assert await stored_count() == 3
+    assert write.batches == [3, 1]
+
+
+async def test_flushes_on_timer(database):
+    write = RecordingWrite()
+    async with MovieWriter(batch_size=100, flush_interval=0.05, write_batch=write) as writer:
+        committed = await writer.put(movie(1))
+        async with asyncio.timeout(5):
+            assert await committed
+        assert write.batches == [1]
+
+
+async def test_close_drains_the_queue(database):
+    writer = MovieWriter(batch_size=100, flush_interval=60)
+    futures = [await writer.put(movie(i)) for i in range(1, 6)]
+
+    totals = await writer.close()
+
+    assert all(future.result() for future in futures)
+    assert totals == {"success": 5, "duplicate": 0, "fail": 0}
+    assert await stored_count() == 5
+
+
+async def test_failed_commit_resolves_false(database):
+    async def failing_write(items):
+        raise RuntimeError("disk full")
+
+    async with MovieWriter(batch_size=2, write_batch=failing_write) as writer:
+        futures = [await writer.put(movie(i)) for i in range(1, 4)]
+    assert [future.result() for future in futures] == [False, False, False]
+    assert writer.totals == {"fail": 3}
+
+
+async def test_each_row_resolves_from_its_own_outcome(database):
+    await add_movies([movie(1)])
+    async with MovieWriter(batch_size=10, flush_interval=60) as writer:
+        duplicate = await writer.put(movie(1))
+        stored = await writer.put(movie(2))
+        missing_title = await writer.put(movie(3, title=None))
+    # 重复的行已在库中，缺少必填字段的行不会写入
+    assert (duplicate.result(), stored.result(), missing_title.result()) == (True, True, False)
+    assert writer.totals == {"success": 1, "duplicate": 1, "fail": 1}
+
+
+async def test_counts_accumulate_across_batches(database):
+    async with MovieWriter(batch_size=2, flush_interval=60) as writer:
+        for item in (movie(1), movie(2), movie(1), movie(3, url=None), movie(4)):
+            await writer.put(item)
+    assert writer.totals == {"success": 3, "duplicate": 1, "fail": 1}
+
+
+async def test_cancelled_writer_resolves_pending_rows_false(database):
+    writer = MovieWriter(batch_size=100, flush_interval=60)
+    futures = [await writer.put(movie(i)) for i in range(1, 4)]
+    await asyncio.sleep(0)
+
+    writer._task.cancel()
+    await asyncio.gather(writer._task, return_exceptions=True)
+
+    assert [future.result() for future in futures] == [False, False, False]
+    assert await stored_count() == 0